@@ -0,0 +1,92 @@
+"""
+Rendering throughput of one shared DiffProcessor across 1..N threads.
+
+On a regular CPython build the GIL caps the speedup; run it on a
+free-threaded build (python3.13t and later) to see how far rendering
+scales with cores there.
+
+Usage:
+    python benchmarks/bench_threads.py --threads 8 --files 40 --lines 200
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import os
+import sys
+import sysconfig
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from diff2latex import DiffProcessor  # noqa: E402
+
+_SOURCES = {
+    "py": "    result = compute(value_{i}, factor={i}) if value_{i} else None  # step {i}",
+    "c": "    int total_{i} = compute(values[{i}], {i} * factor); /* step {i} */",
+    "go": "\ttotal{i} := compute(values[{i}], {i}*factor) // step {i}",
+    "rs": "    let total_{i}: u64 = compute(&values[{i}], {i} * factor); // step {i}",
+    "java": "        int total{i} = compute(values[{i}], {i} * factor); // step {i}",
+}
+
+
+def make_diffs(files: int, lines: int) -> list[str]:
+    """Build one synthetic single-file diff per file, cycling through languages."""
+    diffs = []
+    exts = list(_SOURCES)
+    for n in range(files):
+        ext = exts[n % len(exts)]
+        line = _SOURCES[ext]
+        body = []
+        for i in range(lines):
+            if i % 3 == 0:
+                body.append("-" + line.format(i=i))
+                body.append("+" + line.format(i=i + 1))
+            else:
+                body.append(" " + line.format(i=i))
+        old_len = sum(1 for b in body if not b.startswith("+"))
+        new_len = sum(1 for b in body if not b.startswith("-"))
+        header = f"--- a/file{n}.{ext}\n+++ b/file{n}.{ext}\n@@ -1,{old_len} +1,{new_len} @@\n"
+        diffs.append(header + "\n".join(body) + "\n")
+    return diffs
+
+
+def run(processor: DiffProcessor, diffs: list[str], threads: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for _ in pool.map(lambda diff: processor.process(diff, standalone=False), diffs):
+            pass
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1, help="Highest thread count to try")
+    parser.add_argument("--files", type=int, default=40, help="Diffs rendered per run")
+    parser.add_argument("--lines", type=int, default=200, help="Lines per diff")
+    parser.add_argument("--style", default="monokai", help="Pygments style")
+    parser.add_argument("--highlighter", default="pygments", help="Highlighting backend")
+    args = parser.parse_args()
+
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    free_threaded = bool(sysconfig.get_config_var("Py_GIL_DISABLED"))
+    print(f"Python {sys.version.split()[0]}, free-threaded build: {free_threaded}, GIL enabled: {gil}")
+
+    processor = DiffProcessor(highlight_style=args.style, highlighter=args.highlighter)
+    diffs = make_diffs(args.files, args.lines)
+    total_lines = args.files * args.lines
+    run(processor, diffs[:5], 1)  # warm the caches
+
+    print(f"{'threads':>7} {'seconds':>9} {'lines/s':>10} {'speedup':>8}")
+    baseline = None
+    threads = 1
+    while True:
+        seconds = run(processor, diffs, threads)
+        baseline = baseline or seconds
+        print(f"{threads:>7} {seconds:>9.3f} {total_lines / seconds:>10.0f} {baseline / seconds:>7.2f}x")
+        if threads >= args.threads:
+            break
+        threads = min(threads * 2, args.threads)
+
+
+if __name__ == "__main__":
+    main()
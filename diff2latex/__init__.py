@@ -6,14 +6,18 @@ __author__ = "divadiahim"
 # Import main classes for easy access
 from .cli import main
 from .core.diff2latex import Diff2Latex
-from .core.models import CodeBlock, Cell, Line
+from .core.models import CodeBlock, Cell, Line, Banner
 from .core.utils import CharColorizer, ColorMap
 
 # Import convenience API
 from .api import (
     diff_to_latex,
+    diff_to_latex_styles,
+    diff_to_html,
     diff_file_to_latex,
+    compare_to_latex,
     create_diff_pdf,
+    create_diff_pdfs,
     DiffProcessor,
 )
 
@@ -30,13 +34,18 @@ __all__ = [
     "CodeBlock",
     "Cell", 
     "Line",
+    "Banner",
     # Utility classes
     "CharColorizer",
     "ColorMap",
     # Convenience API
     "diff_to_latex",
+    "diff_to_latex_styles",
+    "diff_to_html",
     "diff_file_to_latex", 
+    "compare_to_latex",
     "create_diff_pdf",
+    "create_diff_pdfs",
     "DiffProcessor",
 ]
 
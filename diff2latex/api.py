@@ -4,13 +4,47 @@ Convenience module for common diff2latex operations.
 This module provides high-level functions for the most common use cases.
 """
 
-from typing import TextIO, Optional
+from typing import Iterable, TextIO, Optional
 from pathlib import Path
 import tempfile
 import os
 
+from .compiler import compile_tex, track_sources
 from .core.diff2latex import Diff2Latex
-from .core.utils import CharColorizer
+from .core.models import RowSource
+from .core.utils import CharColorizer, RenderBudget
+from .document import get_template
+from .scheduler import CompileScheduler, CostModel, ScheduleReport
+from .sidecar import ByteRanges, MacroRanges, build_sidecar, track_offsets, write_sidecar
+from .streams import open_diff
+
+
+def render_document(
+    latex_content: str,
+    font_family: str = "Fira Code",
+    font_size: str = "10pt",
+    template: Optional[str] = None,
+    layout: str = "split"
+) -> str:
+    """
+    Wrap LaTeX table rows into a document template.
+    
+    Args:
+        latex_content: Table rows as produced by Diff2Latex.to_latex()
+        font_family: Font family for the LaTeX document
+        font_size: Font size for the LaTeX document
+        template: Registered template name or path to a .tex template;
+            the package template by default
+        layout: Table layout the rows were written in, 'split' or
+            'unified' (see Diff2Latex.table_layout)
+    
+    Returns:
+        The complete LaTeX document
+    
+    Raises:
+        ValueError: If the template is unknown or invalid
+    """
+    return get_template(template).render(latex_content, font_family, font_size, layout)
 
 
 def diff_to_latex(
@@ -19,7 +53,20 @@ def diff_to_latex(
     font_family: str = "Fira Code",
     font_size: str = "10pt",
     highlight_style: Optional[str] = None,
-    file_extension: Optional[str] = None
+    file_extension: Optional[str] = None,
+    colorizer: Optional[CharColorizer] = None,
+    standalone: bool = True,
+    budget: Optional[RenderBudget] = None,
+    report_path: Optional[str] = None,
+    detect_moves: bool = True,
+    hide_whitespace: bool = False,
+    repeated_hunks: str = "reuse",
+    template: Optional[str] = None,
+    fold_context: Optional[int] = None,
+    source_map: Optional[dict[int, RowSource]] = None,
+    layout: str = "split",
+    sidecar_path: Optional[str] = None,
+    inline_granularity: str = "token"
 ) -> str:
     """
     Convert diff content to LaTeX format.
@@ -31,10 +78,46 @@ def diff_to_latex(
         font_size: Font size for the LaTeX document  
         highlight_style: Pygments style for syntax highlighting
         file_extension: File extension to determine lexer for highlighting
+        colorizer: Optional pre-built colorizer; overrides highlight_style
+            and file_extension when given
+        standalone: If False, only the table rows are produced, without the
+            document template, so fragments can be merged later
+        budget: Optional limits; lines over them skip the inline diff, then
+            highlighting, and are finally truncated
+        report_path: Optional path to write a JSON report of everything the
+            budget degraded
+        detect_moves: Mark moved blocks with their own colors instead of
+            showing them as unrelated deletions and additions
+        hide_whitespace: Show lines whose only change is whitespace as
+            unchanged
+        repeated_hunks: How hunks that occur more than once are emitted:
+            'reuse' (typeset from one macro), 'collapse' (first copy plus a
+            "same change" row) or 'expand' (every copy in full)
+        template: Registered template name or path to a .tex template for
+            standalone documents; checked before anything is rendered
+        fold_context: Keep this many unchanged lines around each change and
+            fold longer unchanged runs into one "unchanged lines" row; by
+            default every line is shown
+        source_map: If given, filled with the diff row of every line of the
+            returned LaTeX, so compile errors can be traced back to the diff
+            (see compile_latex())
+        layout: 'split' (old and new side by side), 'unified' (one code
+            column, unchanged lines once) or 'auto' (unified if no line has
+            a changed partner, e.g. only added or deleted files)
+        sidecar_path: Optional path to write a JSON sidecar with per-file and
+            per-hunk statistics and the byte range of every hunk in the
+            returned LaTeX, recorded while it is rendered
+        inline_granularity: What the inline diff of a changed line compares:
+            'token' (words and punctuation), 'char', 'chunk' (runs of
+            non-whitespace) or 'auto' (chosen per line pair from its length,
+            refining only the changed regions)
     
     Returns:
         The LaTeX content as a string
     
+    Raises:
+        ValueError: If the template is unknown or invalid
+    
     Example:
         >>> diff_content = '''
         ... --- file1.txt
@@ -49,39 +132,199 @@ def diff_to_latex(
         >>> print(latex[:50])
     """
     from io import StringIO
-    from string import Template
     
-    # Create colorizer
-    colorizer = CharColorizer(
-        style_name=highlight_style,
-        ext=file_extension
-    )
+    document = get_template(template) if standalone else None
+    
+    # Create colorizer unless a warm one was handed in
+    if colorizer is None:
+        colorizer = CharColorizer(
+            style_name=highlight_style,
+            ext=file_extension
+        )
     
     # Convert diff to LaTeX
     diff_io = StringIO(diff_content)
-    differ = Diff2Latex.build(diff_io, colorizer=colorizer)
-    latex_content = differ.to_latex()
+    differ = Diff2Latex.build(
+        diff_io,
+        colorizer=colorizer,
+        budget=budget,
+        detect_moves=detect_moves,
+        hide_whitespace=hide_whitespace,
+        repeated_hunks=repeated_hunks,
+        fold_context=fold_context,
+        layout=layout,
+        inline_granularity=inline_granularity,
+    )
+    table_layout = differ.table_layout
+    rows = differ.iter_sourced_rows()
+    ranges: ByteRanges = {}
+    macros: MacroRanges = {}
+    if sidecar_path:
+        first_offset = len(document.head(font_family, font_size, table_layout).encode("utf-8")) if document else 0
+        rows = track_offsets(rows, first_offset, ranges, macros)
+    if source_map is not None:
+        first_line = document.content_line(font_family, font_size, table_layout) if document else 1
+        latex_content = "\n".join(track_sources(rows, first_line, source_map))
+    elif sidecar_path:
+        latex_content = "\n".join(chunk for chunk, _ in rows)
+    else:
+        latex_content = differ.to_latex()
     
-    # Load template
-    template_path = os.path.join(os.path.dirname(__file__), "templates", "template.tex")
-    with open(template_path, "r") as f:
-        template = Template(f.read())
+    if report_path:
+        with open(report_path, "w") as f:
+            f.write(differ.report.model_dump_json(indent=2))
     
-    # Generate final LaTeX
-    final_latex = template.substitute(
-        font=font_family,
-        fontsize=font_size,
-        content=latex_content,
+    final_latex = (
+        document.render(latex_content, font_family, font_size, table_layout) if document else latex_content
     )
     
     # Write to file if requested
     if output_path:
-        with open(output_path, "w") as f:
+        with open(output_path, "w", encoding="utf-8", newline="") as f:
             f.write(final_latex)
+    if sidecar_path:
+        output_name = os.path.basename(output_path) if output_path else ""
+        write_sidecar(build_sidecar(differ, output_name, ranges, macros), sidecar_path)
     
     return final_latex
 
 
+def diff_to_latex_styles(
+    diff_content: str,
+    styles: list[str],
+    font_family: str = "Fira Code",
+    font_size: str = "10pt",
+    file_extension: Optional[str] = None,
+    standalone: bool = True,
+    budget: Optional[RenderBudget] = None,
+    detect_moves: bool = True,
+    hide_whitespace: bool = False,
+    repeated_hunks: str = "reuse",
+    template: Optional[str] = None,
+    fold_context: Optional[int] = None,
+    layout: str = "split",
+    inline_granularity: str = "token"
+) -> dict[str, str]:
+    """
+    Convert diff content to LaTeX once per highlight style.
+    
+    The diff is parsed, inline-diffed and lexed once; every further style
+    only applies its colors, see Diff2Latex.restyled().
+    
+    Args:
+        diff_content: The diff content as a string
+        styles: Pygments styles to render, e.g. ["default", "monokai", "bw"]
+        **: The remaining arguments are those of diff_to_latex()
+    
+    Returns:
+        The LaTeX content for each style, keyed by style name
+    
+    Raises:
+        ValueError: If no style is given, a style is unknown, or the template
+            is unknown or invalid
+    
+    Example:
+        >>> latex = diff_to_latex_styles(diff_content, ["default", "monokai"])
+        >>> light, dark = latex["default"], latex["monokai"]
+    """
+    from io import StringIO
+    from pygments.styles import get_all_styles
+    
+    if not styles:
+        raise ValueError("At least one style is required.")
+    unknown = [style for style in styles if style not in set(get_all_styles())]
+    if unknown:
+        raise ValueError(f"Unknown highlight style(s): {', '.join(unknown)}")
+    document = get_template(template) if standalone else None
+    
+    differ = Diff2Latex.build(
+        StringIO(diff_content),
+        colorizer=CharColorizer(style_name=styles[0], ext=file_extension),
+        budget=budget,
+        detect_moves=detect_moves,
+        hide_whitespace=hide_whitespace,
+        repeated_hunks=repeated_hunks,
+        fold_context=fold_context,
+        layout=layout,
+        inline_granularity=inline_granularity,
+    )
+    results = {}
+    for style in dict.fromkeys(styles):
+        latex_content = (differ if style == styles[0] else differ.restyled(style)).to_latex()
+        results[style] = (
+            document.render(latex_content, font_family, font_size, differ.table_layout) if document else latex_content
+        )
+    return results
+
+
+def diff_to_html(
+    diff_content: str,
+    output_path: Optional[str] = None,
+    font_family: str = "Fira Code",
+    font_size: str = "10pt",
+    highlight_style: Optional[str] = None,
+    file_extension: Optional[str] = None,
+    colorizer: Optional[CharColorizer] = None,
+    standalone: bool = True,
+    budget: Optional[RenderBudget] = None,
+    detect_moves: bool = True,
+    hide_whitespace: bool = False,
+    repeated_hunks: str = "reuse",
+    template: Optional[str] = None,
+    fold_context: Optional[int] = None,
+    layout: str = "split",
+    inline_granularity: str = "token"
+) -> str:
+    """
+    Convert diff content to an HTML preview.
+    
+    The diff goes through the same parsing and highlighting as
+    diff_to_latex() and is shown with the same layout and colors, but needs
+    no lualatex run, so it is suited to interactive review.
+    
+    Args:
+        diff_content: The diff content as a string
+        output_path: Optional path to write the HTML page
+        template: LaTeX template whose colors the preview uses
+        **: The remaining arguments are those of diff_to_latex()
+    
+    Returns:
+        The HTML page, or only the table rows if standalone is False
+    
+    Raises:
+        ValueError: If the template is unknown or invalid
+    
+    Example:
+        >>> html = diff_to_html(diff_content, "preview.html", highlight_style="github")
+    """
+    from io import StringIO
+    from .preview import HtmlDocument
+    
+    page = HtmlDocument.from_template(get_template(template)) if standalone else None
+    if colorizer is None:
+        colorizer = CharColorizer(style_name=highlight_style, ext=file_extension)
+    
+    differ = Diff2Latex.build(
+        StringIO(diff_content),
+        colorizer=colorizer,
+        budget=budget,
+        detect_moves=detect_moves,
+        hide_whitespace=hide_whitespace,
+        repeated_hunks=repeated_hunks,
+        fold_context=fold_context,
+        layout=layout,
+        inline_granularity=inline_granularity,
+    )
+    html_content = differ.to_html()
+    final_html = page.render(html_content, font_family, font_size, differ.table_layout) if page else html_content
+    
+    if output_path:
+        with open(output_path, "w", encoding="utf-8", newline="") as f:
+            f.write(final_html)
+    
+    return final_html
+
+
 def diff_file_to_latex(
     diff_file_path: str,
     output_path: Optional[str] = None,
@@ -91,7 +334,8 @@ def diff_file_to_latex(
     Convert a diff file to LaTeX format.
     
     Args:
-        diff_file_path: Path to the diff file
+        diff_file_path: Path to the diff file, which may be gzip, xz or
+            bz2 compressed, or "-" for standard input
         output_path: Optional path to write the LaTeX output
         **kwargs: Additional arguments passed to diff_to_latex()
     
@@ -101,12 +345,107 @@ def diff_file_to_latex(
     Example:
         >>> latex = diff_file_to_latex("my_changes.diff", "output.tex")
     """
-    with open(diff_file_path, "r") as f:
+    with open_diff(diff_file_path) as f:
         diff_content = f.read()
     
     return diff_to_latex(diff_content, output_path, **kwargs)
 
 
+def compare_to_latex(
+    old_path: str,
+    new_path: str,
+    output_path: Optional[str] = None,
+    font_family: str = "Fira Code",
+    font_size: str = "10pt",
+    highlight_style: Optional[str] = None,
+    file_extension: Optional[str] = None,
+    context: int = 3,
+    jobs: Optional[int] = None,
+    standalone: bool = True,
+    budget: Optional[RenderBudget] = None,
+    detect_moves: bool = True,
+    hide_whitespace: bool = False,
+    template: Optional[str] = None,
+    layout: str = "split",
+    fold_context: Optional[int] = None,
+    inline_granularity: str = "token",
+    repeated_hunks: str = "reuse",
+    report_path: Optional[str] = None,
+) -> str:
+    """
+    Compare two files or directory trees and convert the differences to LaTeX.
+    
+    No intermediate unified diff is produced: the files are diffed in-process
+    and the opcodes are fed straight into the model builder. Directory trees
+    are paired by relative path and diffed across a process pool, and a hunk
+    repeated across their files is handled like one repeated in a diff.
+    
+    Args:
+        old_path: Old file or directory
+        new_path: New file or directory
+        output_path: Optional path to write the LaTeX output
+        font_family: Font family for the LaTeX document
+        font_size: Font size for the LaTeX document
+        highlight_style: Pygments style for syntax highlighting
+        file_extension: File extension to determine lexer for highlighting;
+            defaults to each compared file's own extension
+        context: Number of unchanged lines shown around each change
+        jobs: Worker processes for tree comparison (default: CPU count)
+        standalone: If False, only the table rows are produced
+        budget: Optional limits applied to every compared file; its
+            deadline counts from the start of the whole comparison
+        detect_moves: Mark moved blocks with their own colors
+        hide_whitespace: Show lines whose only change is whitespace as
+            unchanged
+        template: Registered template name or path to a .tex template
+        layout: 'split' or 'unified' table layout, see diff_to_latex()
+        fold_context: Keep this many unchanged lines around each change and
+            fold longer unchanged runs, see diff_to_latex()
+        inline_granularity: Unit of the inline diff, see diff_to_latex()
+        repeated_hunks: How hunks repeated across the compared files are
+            emitted, see diff_to_latex()
+        report_path: Optional path to write a JSON report of everything the
+            budget degraded, across all compared files
+    
+    Returns:
+        The LaTeX content as a string
+    
+    Raises:
+        ValueError: If there are no differences, a file is compared with a
+            directory, the layout is 'auto', or the template is unknown or
+            invalid
+    
+    Example:
+        >>> latex = compare_to_latex("v1/", "v2/", "changes.tex", highlight_style="github")
+    """
+    from .compare import compare_paths
+    
+    if layout not in ("split", "unified"):
+        raise ValueError(f"Layout '{layout}' cannot be used to compare, choose split or unified")
+    document = get_template(template) if standalone else None
+    colorizer = CharColorizer(style_name=highlight_style, ext=file_extension)
+    differ = compare_paths(
+        old_path, new_path, colorizer, context=context, jobs=jobs, budget=budget,
+        detect_moves=detect_moves, hide_whitespace=hide_whitespace, layout=layout, fold_context=fold_context,
+        inline_granularity=inline_granularity, repeated_hunks=repeated_hunks,
+    )
+    if differ is None:
+        raise ValueError(f"No differences between {old_path} and {new_path}.")
+    latex_content = differ.to_latex()
+    
+    if report_path:
+        with open(report_path, "w") as f:
+            f.write(differ.report.model_dump_json(indent=2))
+    
+    final_latex = document.render(latex_content, font_family, font_size, layout) if document else latex_content
+    
+    if output_path:
+        with open(output_path, "w", encoding="utf-8", newline="") as f:
+            f.write(final_latex)
+    
+    return final_latex
+
+
 def create_diff_pdf(
     diff_content: str,
     output_pdf_path: str,
@@ -122,36 +461,99 @@ def create_diff_pdf(
     
     Raises:
         RuntimeError: If lualatex is not found in PATH
+        CompileError: If lualatex stops on an error; the message names the
+            diff file, hunk and line of the failing row
     
     Example:
         >>> create_diff_pdf(diff_content, "my_diff.pdf", highlight_style="github")
     """
-    import shutil
-    import subprocess
+    source_map: dict[int, RowSource] = {}
+    latex_content = diff_to_latex(diff_content, source_map=source_map, **kwargs)
+    compile_latex(latex_content, output_pdf_path, source_map=source_map)
+
+
+def create_diff_pdfs(
+    diffs: Iterable[tuple[str, str]],
+    workers: Optional[int] = None,
+    cost_model: Optional[CostModel] = None,
+    report_path: Optional[str] = None,
+    **kwargs
+) -> ScheduleReport:
+    """
+    Create many PDFs, compiling the most expensive documents first.
+    
+    Every diff is rendered to LaTeX up front; its compile time is then
+    predicted from the document (rows, highlighted runs, longest line) and
+    lualatex is run on the longest jobs first, on a bounded number of
+    processes, so one huge document cannot be left to compile alone at the
+    end of the batch.
+    
+    Args:
+        diffs: (diff content, output PDF path) pairs
+        workers: Concurrent lualatex processes, defaults to the CPU count
+        cost_model: Model predicting compile times; see
+            CostModel.calibrated() to fit it to earlier reports
+        report_path: Optional path to write the JSON report of predicted
+            and measured times
+        **kwargs: Additional arguments passed to diff_to_latex()
+    
+    Returns:
+        A ScheduleReport; failed documents are recorded there instead of
+        stopping the other compilations
+    
+    Raises:
+        RuntimeError: If lualatex is not found in PATH
+    
+    Example:
+        >>> report = create_diff_pdfs([(diff1, "a.pdf"), (diff2, "b.pdf")], workers=4)
+        >>> model = CostModel().calibrated(report.results)
+    """
+    with CompileScheduler(workers, cost_model) as scheduler:
+        for diff_content, output_pdf_path in diffs:
+            source_map: dict[int, RowSource] = {}
+            latex_content = diff_to_latex(diff_content, source_map=source_map, **kwargs)
+            scheduler.add(latex_content, output_pdf_path, source_map)
+        report = scheduler.run()
+    
+    if report_path:
+        with open(report_path, "w") as f:
+            f.write(report.model_dump_json(indent=2))
+    return report
+
+
+def compile_latex(
+    latex_content: str,
+    output_pdf_path: str,
+    passes: int = 2,
+    source_map: Optional[dict[int, RowSource]] = None
+) -> None:
+    """
+    Compile a complete LaTeX document to PDF using lualatex.
+    
+    Compilation stops at the first error and no further pass is run.
+    
+    Args:
+        latex_content: The LaTeX document as a string
+        output_pdf_path: Path where the PDF should be saved
+        passes: Number of lualatex runs (tabularx needs two to settle)
+        source_map: Document line -> diff row, as filled by diff_to_latex(),
+            used to report errors against the diff
     
-    if shutil.which("lualatex") is None:
-        raise RuntimeError("lualatex not found in PATH. Please install it.")
+    Raises:
+        RuntimeError: If lualatex is not found in PATH
+        CompileError: If lualatex stops on an error
+    """
+    import shutil
     
     with tempfile.TemporaryDirectory() as tmpdir:
-        # Generate LaTeX
         tex_path = os.path.join(tmpdir, "temp.tex")
-        latex_content = diff_to_latex(diff_content, tex_path, **kwargs)
+        with open(tex_path, "w", encoding="utf-8", newline="") as f:
+            f.write(latex_content)
         
-        # Compile to PDF
-        subprocess.run(
-            ["lualatex", "-interaction=nonstopmode", tex_path],
-            cwd=tmpdir,
-            check=True
-        )
-        subprocess.run(
-            ["lualatex", "-interaction=nonstopmode", tex_path], 
-            cwd=tmpdir,
-            check=True
-        )
+        pdf_path = compile_tex(tex_path, passes, source_map)
         
         # Move PDF to final location
-        temp_pdf = os.path.join(tmpdir, "temp.pdf")
-        shutil.move(temp_pdf, output_pdf_path)
+        shutil.move(pdf_path, output_pdf_path)
 
 
 class DiffProcessor:
@@ -159,6 +561,8 @@ class DiffProcessor:
     A class-based interface for processing diffs.
     
     This provides a more object-oriented approach for repeated diff processing.
+    A processor may be shared by many threads; process() and create_pdf()
+    only read its settings, and all caches behind it are thread-safe.
     
     Example:
         >>> processor = DiffProcessor(
@@ -168,13 +572,28 @@ class DiffProcessor:
         >>> latex1 = processor.process(diff_content1)
         >>> latex2 = processor.process(diff_content2)
     """
+
+    # What settings() holds, every constructor argument that is plain data
+    SETTINGS = (
+        "font_family", "font_size", "highlight_style", "file_extension", "detect_moves", "hide_whitespace",
+        "repeated_hunks", "template", "fold_context", "layout", "inline_granularity", "highlighter",
+    )
     
     def __init__(
         self,
         font_family: str = "Fira Code",
         font_size: str = "10pt",
         highlight_style: Optional[str] = None,
-        file_extension: Optional[str] = None
+        file_extension: Optional[str] = None,
+        budget: Optional[RenderBudget] = None,
+        detect_moves: bool = True,
+        hide_whitespace: bool = False,
+        repeated_hunks: str = "reuse",
+        template: Optional[str] = None,
+        fold_context: Optional[int] = None,
+        layout: str = "split",
+        inline_granularity: str = "token",
+        highlighter: str = "pygments"
     ):
         """
         Initialize the diff processor with default settings.
@@ -184,18 +603,83 @@ class DiffProcessor:
             font_size: Default font size
             highlight_style: Default highlighting style
             file_extension: Default file extension for lexer detection
+            budget: Default render budget for pathological inputs
+            detect_moves: Mark moved blocks with their own colors
+            hide_whitespace: Show whitespace-only changes as unchanged lines
+            repeated_hunks: How repeated hunks are emitted, see diff_to_latex()
+            template: Template name or path for standalone documents
+            fold_context: Unchanged lines kept around each change, see
+                diff_to_latex()
+            layout: Table layout, see diff_to_latex()
+            inline_granularity: Unit of the inline diff, see diff_to_latex()
+            highlighter: Highlighting backend, 'pygments', 'auto' or 'regex'
+        
+        Raises:
+            ValueError: If the template is unknown or invalid
         """
         self.font_family = font_family
         self.font_size = font_size
         self.highlight_style = highlight_style
         self.file_extension = file_extension
+        self.budget = budget
+        self.detect_moves = detect_moves
+        self.hide_whitespace = hide_whitespace
+        self.repeated_hunks = repeated_hunks
+        self.template = template
+        self.fold_context = fold_context
+        self.layout = layout
+        self.inline_granularity = inline_granularity
+        self.highlighter = highlighter
+        get_template(template)  # fail now rather than on the first diff
         
         # Create colorizer
         self.colorizer = CharColorizer(
             style_name=highlight_style,
-            ext=file_extension
+            ext=file_extension,
+            highlighter=highlighter
         )
     
+    def settings(self) -> dict:
+        """
+        Our settings as a plain, picklable dict.
+
+        Worker processes rebuild the processor from it with from_settings(),
+        and batch manifests record it to tell when outputs are stale.
+        """
+        return {name: getattr(self, name) for name in self.SETTINGS}
+
+    @classmethod
+    def from_settings(cls, settings: dict, budget: Optional[RenderBudget] = None) -> "DiffProcessor":
+        """
+        Build a processor from a settings() dict.
+
+        Missing settings take their defaults and unknown keys (e.g. a batch's
+        pdf_output) are ignored.
+
+        Raises:
+            ValueError: If the template is unknown or invalid
+        """
+        return cls(budget=budget, **{name: settings[name] for name in cls.SETTINGS if name in settings})
+
+    def _settings(self, kwargs: dict) -> dict:
+        """Our defaults, overridden by any provided kwargs."""
+        settings = self.settings()
+        settings['budget'] = self.budget
+        settings.update(kwargs)
+        
+        # Reuse our colorizer unless the caller changed what it depends on
+        highlighter = settings.pop('highlighter')
+        if 'colorizer' not in settings:
+            if {'highlight_style', 'file_extension', 'highlighter'} & kwargs.keys():
+                settings['colorizer'] = CharColorizer(
+                    style_name=settings['highlight_style'],
+                    ext=settings['file_extension'],
+                    highlighter=highlighter
+                )
+            else:
+                settings['colorizer'] = self.colorizer
+        return settings
+    
     def process(
         self,
         diff_content: str,
@@ -213,32 +697,25 @@ class DiffProcessor:
         Returns:
             LaTeX content as string
         """
-        # Override defaults with any provided kwargs
-        settings = {
-            'font_family': self.font_family,
-            'font_size': self.font_size,
-            'highlight_style': self.highlight_style,
-            'file_extension': self.file_extension,
-        }
-        settings.update(kwargs)
-        
-        return diff_to_latex(diff_content, output_path, **settings)
+        return diff_to_latex(diff_content, output_path, **self._settings(kwargs))
     
     def process_file(self, diff_file_path: str, output_path: Optional[str] = None, **kwargs) -> str:
-        """Process a diff file to LaTeX."""
-        with open(diff_file_path, "r") as f:
+        """Process a (possibly compressed) diff file to LaTeX."""
+        with open_diff(diff_file_path) as f:
             diff_content = f.read()
         return self.process(diff_content, output_path, **kwargs)
     
     def create_pdf(self, diff_content: str, output_pdf_path: str, **kwargs) -> None:
         """Create a PDF from diff content."""
-        # Override defaults
-        settings = {
-            'font_family': self.font_family,
-            'font_size': self.font_size,
-            'highlight_style': self.highlight_style,
-            'file_extension': self.file_extension,
-        }
-        settings.update(kwargs)
-        
-        create_diff_pdf(diff_content, output_pdf_path, **settings)
+        create_diff_pdf(diff_content, output_pdf_path, **self._settings(kwargs))
+    
+    def create_pdfs(
+        self,
+        diffs: Iterable[tuple[str, str]],
+        workers: Optional[int] = None,
+        cost_model: Optional[CostModel] = None,
+        report_path: Optional[str] = None,
+        **kwargs
+    ) -> ScheduleReport:
+        """Create many PDFs, longest compilation first; see create_diff_pdfs()."""
+        return create_diff_pdfs(diffs, workers, cost_model, report_path, **self._settings(kwargs))
@@ -0,0 +1,313 @@
+"""
+Batch processing of many diff files.
+
+Inputs are rendered across a process pool with one warm DiffProcessor per
+worker. A summary manifest is kept in the output directory so that an
+interrupted run can be resumed and up-to-date outputs are skipped.
+"""
+
+from typing import Callable, Iterable, Optional
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+import glob
+import hashlib
+import json
+import os
+import time
+
+from pydantic import BaseModel, Field
+
+from .api import DiffProcessor
+
+MANIFEST_NAME = "batch-manifest.json"
+MANIFEST_VERSION = 1
+DIFF_SUFFIXES = (".diff", ".patch")
+
+# How often (in seconds) the manifest is flushed to disk while a run is going
+_SAVE_INTERVAL = 1.0
+
+
+class BatchInput(BaseModel):
+    """A single diff file scheduled for rendering."""
+
+    path: str = Field(..., description="Path of the input diff file.")
+    output: str = Field(..., description="Output path, relative to the output directory.")
+
+
+class BatchResult(BaseModel):
+    """Outcome of rendering (or skipping) one input."""
+
+    input: BatchInput
+    status: str = Field(..., description="One of 'ok', 'skipped' or 'failed'.")
+    seconds: float = Field(default=0.0, description="Wall time spent rendering.")
+    size: int = Field(default=0, description="Size of the input in bytes.")
+    error: Optional[str] = Field(default=None, description="Error message for failed inputs.")
+
+
+class BatchSummary(BaseModel):
+    """Totals for a finished (or interrupted) batch run."""
+
+    rendered: int = 0
+    skipped: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+    manifest_path: str = ""
+
+
+def _output_name(path: Path, root: Optional[Path], ext: str) -> str:
+    rel = path.relative_to(root) if root else Path(path.name)
+    return rel.with_suffix(ext).as_posix()
+
+
+def _read_manifest_list(manifest_path: str) -> list[str]:
+    """Read a list of inputs, one per line, relative to the list itself."""
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    paths = []
+    with open(manifest_path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                paths.append(line if os.path.isabs(line) else os.path.join(base, line))
+    return paths
+
+
+def collect_inputs(
+    sources: Iterable[str],
+    manifest: Optional[str] = None,
+    pdf: bool = False,
+) -> list[BatchInput]:
+    """
+    Expand directories, glob patterns and manifest files into batch inputs.
+
+    Directories are searched recursively for ``*.diff`` and ``*.patch`` files
+    and keep their relative layout in the output directory; everything else is
+    written flat under its file name.
+
+    Raises:
+        ValueError: If two inputs would be written to the same output
+    """
+    ext = ".pdf" if pdf else ".tex"
+    found: list[tuple[Path, Optional[Path]]] = []
+
+    for source in sources:
+        if os.path.isdir(source):
+            root = Path(source)
+            for path in sorted(root.rglob("*")):
+                if path.is_file() and path.suffix in DIFF_SUFFIXES:
+                    found.append((path, root))
+        elif glob.has_magic(source):
+            found.extend((Path(p), None) for p in sorted(glob.glob(source, recursive=True)) if os.path.isfile(p))
+        else:
+            found.append((Path(source), None))
+
+    if manifest:
+        found.extend((Path(p), None) for p in _read_manifest_list(manifest))
+
+    inputs: list[BatchInput] = []
+    seen: dict[str, str] = {}
+    for path, root in found:
+        output = _output_name(path, root, ext)
+        if output in seen:
+            if os.path.abspath(seen[output]) == os.path.abspath(path):
+                continue
+            raise ValueError(f"Inputs {seen[output]} and {path} both map to output {output}")
+        seen[output] = str(path)
+        inputs.append(BatchInput(path=str(path), output=output))
+    return inputs
+
+
+def _file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_manifest(path: str) -> dict:
+    """Load a batch manifest, returning an empty one if it is missing or unreadable."""
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {"version": MANIFEST_VERSION, "settings": {}, "entries": {}}
+    if data.get("version") != MANIFEST_VERSION:
+        return {"version": MANIFEST_VERSION, "settings": {}, "entries": {}}
+    return data
+
+
+def save_manifest(path: str, data: dict) -> None:
+    """Atomically write a batch manifest."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _is_up_to_date(item: BatchInput, entry: Optional[dict], output_dir: str) -> bool:
+    if not entry or entry.get("status") != "ok" or entry.get("input") != item.path:
+        return False
+    if not os.path.exists(item.path) or not os.path.exists(os.path.join(output_dir, item.output)):
+        return False
+
+    st = os.stat(item.path)
+    if entry.get("mtime_ns") == st.st_mtime_ns and entry.get("size") == st.st_size:
+        return True
+
+    # Touched but possibly unchanged, fall back to comparing contents
+    if entry.get("sha256") != _file_digest(item.path):
+        return False
+    entry["mtime_ns"] = st.st_mtime_ns
+    entry["size"] = st.st_size
+    return True
+
+
+def _input_size(item: BatchInput) -> int:
+    try:
+        return os.path.getsize(item.path)
+    except OSError:
+        return 0
+
+
+_processor: Optional[DiffProcessor] = None
+_pdf_output = False
+_fragments = False
+
+
+def _init_worker(settings: dict) -> None:
+    """Build the per-worker processor (and its colorizer) once."""
+    global _processor, _pdf_output, _fragments
+    _pdf_output = settings.get("pdf_output", False)
+    _fragments = settings.get("fragments", False)
+    _processor = DiffProcessor.from_settings(settings)
+
+
+def _render_one(item: BatchInput, output_dir: str) -> BatchResult:
+    assert _processor is not None, "worker not initialised"
+    start = time.perf_counter()
+    size = 0
+    try:
+        size = os.path.getsize(item.path)
+        with open(item.path, "r") as f:
+            diff_content = f.read()
+
+        output_path = os.path.join(output_dir, item.output)
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        if _pdf_output:
+            _processor.create_pdf(diff_content, output_path)
+        else:
+            _processor.process(diff_content, output_path, standalone=not _fragments)
+    except Exception as e:
+        return BatchResult(
+            input=item, status="failed", seconds=time.perf_counter() - start, size=size, error=str(e)
+        )
+    return BatchResult(input=item, status="ok", seconds=time.perf_counter() - start, size=size)
+
+
+def run_batch(
+    inputs: list[BatchInput],
+    output_dir: str,
+    settings: dict,
+    jobs: Optional[int] = None,
+    force: bool = False,
+    manifest_name: str = MANIFEST_NAME,
+    progress: Optional[Callable[[BatchResult, int, int], None]] = None,
+    shard: Optional[tuple[int, int]] = None,
+) -> BatchSummary:
+    """
+    Render a list of inputs into ``output_dir``.
+
+    Args:
+        inputs: Inputs as returned by collect_inputs()
+        output_dir: Directory receiving outputs and the summary manifest
+        settings: Rendering settings, a DiffProcessor.settings() dict plus
+            pdf_output and fragments; a change invalidates earlier results
+        jobs: Number of worker processes, defaults to the CPU count; 1 renders
+            in the calling process
+        force: Re-render inputs even if their outputs are up to date
+        manifest_name: File name of the summary manifest inside output_dir
+        progress: Called as progress(result, done, total) after each input
+        shard: Optional (index, count) recorded in the manifest so that
+            shard results can be merged later
+
+    Returns:
+        A BatchSummary with the totals of the run
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, manifest_name)
+    manifest = load_manifest(manifest_path)
+    if manifest.get("settings") != settings:
+        manifest = {"version": MANIFEST_VERSION, "settings": dict(settings), "entries": {}}
+    if shard:
+        manifest["shard"] = {"index": shard[0], "count": shard[1]}
+    # Forget inputs that are no longer part of the run
+    wanted = {item.output for item in inputs}
+    entries: dict = {k: v for k, v in manifest["entries"].items() if k in wanted}
+    manifest["entries"] = entries
+
+    summary = BatchSummary(manifest_path=manifest_path)
+    start = time.perf_counter()
+    total = len(inputs)
+    done = 0
+
+    pending: list[BatchInput] = []
+    for item in inputs:
+        if not force and _is_up_to_date(item, entries.get(item.output), output_dir):
+            done += 1
+            summary.skipped += 1
+            if progress:
+                progress(BatchResult(input=item, status="skipped"), done, total)
+        else:
+            pending.append(item)
+
+    last_save = time.monotonic()
+
+    def record(result: BatchResult) -> None:
+        nonlocal done, last_save
+        done += 1
+        item = result.input
+        entry = {
+            "input": item.path,
+            "label": item.path,
+            "status": result.status,
+            "seconds": round(result.seconds, 4),
+        }
+        if result.status == "ok":
+            st = os.stat(item.path)
+            entry.update(mtime_ns=st.st_mtime_ns, size=st.st_size, sha256=_file_digest(item.path))
+            summary.rendered += 1
+        else:
+            entry["error"] = result.error
+            summary.failed += 1
+        entries[item.output] = entry
+        if progress:
+            progress(result, done, total)
+        if time.monotonic() - last_save >= _SAVE_INTERVAL:
+            save_manifest(manifest_path, manifest)
+            last_save = time.monotonic()
+
+    try:
+        workers = jobs or os.cpu_count() or 1
+        if workers <= 1 or len(pending) <= 1:
+            _init_worker(settings)
+            for item in pending:
+                record(_render_one(item, output_dir))
+        else:
+            with ProcessPoolExecutor(
+                max_workers=min(workers, len(pending)),
+                initializer=_init_worker,
+                initargs=(settings,),
+            ) as pool:
+                # Largest inputs first, so no big render is left to run alone at the end
+                futures = [
+                    pool.submit(_render_one, item, output_dir)
+                    for item in sorted(pending, key=_input_size, reverse=True)
+                ]
+                for future in as_completed(futures):
+                    record(future.result())
+    finally:
+        summary.seconds = time.perf_counter() - start
+        manifest["finished"] = summary.failed == 0 and done == total
+        save_manifest(manifest_path, manifest)
+
+    return summary
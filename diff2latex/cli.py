@@ -1,24 +1,146 @@
 # pyright: basic
 # fuck strict typing ong
-from typing import TextIO
+from typing import Iterable
 import click
+from click.core import ParameterSource
 from .core import Diff2Latex
-from .core.utils import CharColorizer
+from .core.models import RowSource
+from .core.utils import CharColorizer, RenderBudget
+from .api import DiffProcessor
+from .compiler import CompileError, compile_tex, track_sources
+from .compare import compare_paths
+from .batch import MANIFEST_NAME, BatchResult, collect_inputs, run_batch
+from .document import get_template
+from .preview import HtmlDocument
+from .gitlog import LogResult, iter_commits, render_log
+from .indexer import load_index, parse_hunk_ranges, read_selection, select, sidecar_path
+from .sidecar import ByteRanges, MacroRanges, build_sidecar, render_sidecar_path, track_offsets, write_sidecar
+from .streams import STDIO, file_compression, open_diff
+from .shard import build_shard, merge_manifests, parse_shard, select_shard, shard_manifest_name
+import gzip
+import lzma
 import os
-from string import Template
 import shutil
 import tempfile
-import subprocess
-from . import __file__ as package_root
+import time
 from . import __version__
 
-TEMPLATE_PATH = os.path.join(os.path.dirname(package_root), "templates/template.tex")
 
+def _parse_shard_option(ctx, param, value: str | None) -> tuple[int, int] | None:
+    if value is None:
+        return None
+    try:
+        return parse_shard(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
 
-def _load_template() -> Template:
-    """Load the LaTeX template from the package."""
-    with open(TEMPLATE_PATH, "r") as template_file:
-        return Template(template_file.read())
+
+def _parse_hunks_option(ctx, param, value: str | None) -> list[tuple[int, int | None]] | None:
+    if value is None:
+        return None
+    try:
+        return parse_hunk_ranges(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
+def _parse_styles_option(ctx, param, value: str | None) -> list[str] | None:
+    if value is None:
+        return None
+    from pygments.styles import get_all_styles
+
+    styles = [style.strip() for style in value.split(",") if style.strip()]
+    unknown = [style for style in styles if style not in set(get_all_styles())]
+    if not styles:
+        raise click.BadParameter("No highlight style given.")
+    if unknown:
+        raise click.BadParameter(f"Unknown highlight style(s): {', '.join(unknown)}")
+    return list(dict.fromkeys(styles))
+
+
+def _write_output(
+    ctx,
+    rows: Iterable[tuple[str, list[RowSource | None]]],
+    output_dir: str,
+    base_name: str = "diff_output",
+    layout: str = "split",
+    sidecar_of: Diff2Latex | None = None,
+) -> None:
+    """
+    Stream rendered rows through the template into the .tex (or compile the
+    .pdf). An output_dir of "-" writes the document to standard output.
+    With sidecar_of, the model the rows come from, a JSON sidecar with its
+    hunk statistics and their byte ranges is written next to the output.
+    """
+    to_stdout = output_dir == STDIO
+    ranges: ByteRanges = {}
+    macros: MacroRanges = {}
+
+    def write_render_sidecar(output_path: str, offsets: bool = True) -> None:
+        if sidecar_of is not None:
+            sidecar = build_sidecar(
+                sidecar_of, os.path.basename(output_path), ranges if offsets else None, macros if offsets else None
+            )
+            write_sidecar(sidecar, render_sidecar_path(output_path))
+            click.echo(f"Sidecar written to: {render_sidecar_path(output_path)}")
+
+    if ctx.obj["output_format"] == "html":
+        page = HtmlDocument.from_template(ctx.obj["document"])
+        fonts = (ctx.obj["font_family"], ctx.obj["font_size"], layout)
+        if to_stdout:
+            page.write(click.get_text_stream("stdout"), (chunk for chunk, _ in rows), *fonts)
+            return
+        html_path = os.path.join(output_dir, f"{base_name}.html")
+        if sidecar_of is not None:
+            rows = track_offsets(rows, len(page.head(*fonts).encode("utf-8")), ranges, macros)
+        with open(html_path, "w", encoding="utf-8", newline="") as html_file:
+            page.write(html_file, (chunk for chunk, _ in rows), *fonts)
+        click.echo(f"HTML written to: {html_path}")
+        write_render_sidecar(html_path)
+        return
+
+    tex_path = os.path.join(output_dir, f"{base_name}.tex")
+    pdf_path = os.path.join(output_dir, f"{base_name}.pdf")
+    document = ctx.obj["document"]
+    fonts = (ctx.obj["font_family"], ctx.obj["font_size"], layout)
+
+    if not ctx.obj.get("pdf_output", False):
+        if to_stdout:
+            document.write(click.get_text_stream("stdout"), (chunk for chunk, _ in rows), *fonts)
+            return
+        if sidecar_of is not None:
+            rows = track_offsets(rows, len(document.head(*fonts).encode("utf-8")), ranges, macros)
+        with open(tex_path, "w", encoding="utf-8", newline="") as tex_file:
+            document.write(tex_file, (chunk for chunk, _ in rows), *fonts)
+
+    if ctx.obj.get("pdf_output", False):
+        if shutil.which("lualatex") is None:
+            raise RuntimeError("lualatex not found in PATH. Please install it.")
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp_tex = os.path.join(tmpdir, "temp.tex")
+            # Document line -> diff row, to report TeX errors against the diff
+            source_map: dict[int, RowSource] = {}
+            with open(tmp_tex, "w", encoding="utf-8", newline="") as f:
+                document.write(f, track_sources(rows, document.content_line(*fonts), source_map), *fonts)
+
+            try:
+                tmp_pdf = compile_tex(tmp_tex, passes=2, source_map=source_map)
+            except CompileError as e:
+                raise click.ClickException(str(e))
+            if to_stdout:
+                with open(tmp_pdf, "rb") as pdf_file:
+                    shutil.copyfileobj(pdf_file, click.get_binary_stream("stdout"))
+                return
+            shutil.move(tmp_pdf, pdf_path)
+
+    click.echo(f"LaTeX written to: {tex_path}")
+    if ctx.obj.get("pdf_output", False):
+        click.echo(f"PDF written to: {pdf_path}")
+        # Byte offsets into a PDF are meaningless, only the statistics are kept
+        write_render_sidecar(pdf_path, offsets=False)
+    else:
+        write_render_sidecar(tex_path)
 
 
 @click.group()
@@ -26,58 +148,462 @@ def _load_template() -> Template:
 @click.option("--font-family", default="Fira Code", help="Font family for the LaTeX document")
 @click.option("--font-size", default="10pt", help="Font size for the LaTeX document")
 @click.option("--highlight", default="none", help="Colorizer style for syntax highlighting")
+@click.option(
+    "--highlighter",
+    type=click.Choice(["pygments", "auto", "regex"]),
+    default="pygments",
+    help="Highlighting backend; 'auto' uses the fast built-in one for Python, C/C++ and Java",
+)
 @click.option("--pdf-output", is_flag=True, help="Generate PDF output instead of LaTeX")
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["latex", "html"]),
+    default="latex",
+    show_default=True,
+    help="Output LaTeX, or a self-contained HTML preview that needs no TeX run (build and compare)",
+)
+@click.option(
+    "--moves/--no-moves",
+    "detect_moves",
+    default=True,
+    help="Mark moved blocks with their own colors; off by default for compressed or piped diffs to build",
+)
+@click.option("-w", "--hide-whitespace", is_flag=True, help="Show whitespace-only changes as unchanged lines")
+@click.option(
+    "--repeated-hunks",
+    type=click.Choice(["reuse", "collapse", "expand"]),
+    default="reuse",
+    show_default=True,
+    help="Typeset repeated hunks from one macro, collapse them into a summary row, or write every copy",
+)
+@click.option(
+    "--inline-diff",
+    "inline_granularity",
+    type=click.Choice(["token", "char", "chunk", "auto"]),
+    default="token",
+    show_default=True,
+    help="Unit the inline diff of a changed line compares; 'auto' picks one per line from its length",
+)
+@click.option(
+    "--fold-context",
+    type=click.IntRange(min=0),
+    help="Keep N unchanged lines around each change and fold longer unchanged runs into one row",
+)
+@click.option(
+    "--layout",
+    type=click.Choice(["split", "unified", "auto"]),
+    default="split",
+    show_default=True,
+    help="Old and new code side by side, one code column with unchanged lines once, or unified for diffs without modified lines",
+)
+@click.option("--template", help="Registered template name or path to a .tex template with $content")
 @click.pass_context
 def cli(ctx, **kwargs) -> None:
     """diff2latex - Output diffs in latex"""
     ctx.ensure_object(dict)
     ctx.obj.update(kwargs)
+    if kwargs["output_format"] == "html" and kwargs["pdf_output"]:
+        raise click.UsageError("--pdf-output cannot be combined with --format html.")
+    try:
+        # Checked up front, so a broken template fails before any rendering
+        ctx.obj["document"] = get_template(kwargs["template"])
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--template")
+
+
+_BUDGET_OPTIONS = [
+    click.option("--deadline", type=float, help="Seconds after which remaining lines are rendered without inline diff or highlighting"),
+    click.option("--max-inline-chars", type=int, help="Skip the inline diff for longer lines"),
+    click.option("--max-line-tokens", type=int, help="Skip the inline diff for lines with more tokens"),
+    click.option("--max-highlight-chars", type=int, help="Skip syntax highlighting for longer lines"),
+    click.option("--max-line-chars", type=int, help="Truncate longer lines with a marker"),
+    click.option("--max-file-chars", type=int, help="Render the rest of a file plainly after this many characters"),
+    click.option("--max-file-tokens", type=int, help="Render the rest of a file plainly after this many tokens"),
+    click.option("--budget-report", type=click.Path(dir_okay=False, writable=True), help="Write a JSON report of degraded lines"),
+]
+
+
+def _budget_options(command):
+    """The render budget limits and --budget-report, shared by build and compare."""
+    for option in reversed(_BUDGET_OPTIONS):
+        command = option(command)
+    return command
+
+
+def _render_budget(limits: dict) -> RenderBudget | None:
+    return RenderBudget(**limits) if any(v is not None for v in limits.values()) else None
+
+
+def _processor(ctx: click.Context) -> DiffProcessor:
+    """The processor the global options describe."""
+    return DiffProcessor(
+        font_family=ctx.obj["font_family"],
+        font_size=ctx.obj["font_size"],
+        highlight_style=ctx.obj["highlight"] if ctx.obj["highlight"] != "none" else None,
+        detect_moves=ctx.obj["detect_moves"],
+        hide_whitespace=ctx.obj["hide_whitespace"],
+        repeated_hunks=ctx.obj["repeated_hunks"],
+        template=ctx.obj["template"],
+        fold_context=ctx.obj["fold_context"],
+        layout=ctx.obj["layout"],
+        inline_granularity=ctx.obj["inline_granularity"],
+        highlighter=ctx.obj["highlighter"],
+    )
+
+
+def _write_budget_report(differ: Diff2Latex, budget_report: str | None, output_dir: str) -> None:
+    if budget_report:
+        with open(budget_report, "w") as report_file:
+            report_file.write(differ.report.model_dump_json(indent=2))
+        click.echo(
+            f"Budget report written to: {budget_report} ({len(differ.report.degradations)} degradations)",
+            err=output_dir == STDIO,
+        )
+
+
+@cli.command()
+@click.pass_context
+@click.argument("diff_path", type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.argument("output_dir", type=click.Path(file_okay=False, dir_okay=True, writable=True, allow_dash=True))
+@click.option("--shard", callback=_parse_shard_option, help="Only render the files of shard INDEX/COUNT of a multi-file diff")
+@_budget_options
+@click.option("--files", "file_patterns", multiple=True, help="Only render files whose path matches this glob (repeatable)")
+@click.option("--hunks", callback=_parse_hunks_option, help="Only render these hunks of each file, e.g. 1-3,7,10-")
+@click.option("--no-index", is_flag=True, help="Neither read nor write the index sidecar next to the diff")
+@click.option(
+    "--styles",
+    callback=_parse_styles_option,
+    help="Comma-separated highlight styles, each written to diff_output-STYLE; the diff is lexed only once",
+)
+@click.option("--sidecar", is_flag=True, help="Write per-hunk statistics and byte offsets to OUTPUT.d2l.json")
+def build(
+    ctx,
+    diff_path: str,
+    output_dir: str,
+    shard: tuple[int, int] | None,
+    budget_report: str | None,
+    file_patterns: tuple[str, ...],
+    hunks: list[tuple[int, int | None]] | None,
+    no_index: bool,
+    styles: list[str] | None,
+    sidecar: bool,
+    **limits,
+) -> None:
+    """
+    Build LaTeX from a diff file.
+
+    The diff may be gzip, xz or bz2 compressed, or "-" for standard input;
+    an OUTPUT_DIR of "-" writes the document to standard output. Such diffs
+    are parsed as they stream, without move detection unless --moves is given.
+    """
+    to_stdout = output_dir == STDIO
+    if to_stdout and (shard or styles):
+        raise click.UsageError("--shard and --styles write several files and need an output directory.")
+    if to_stdout and sidecar:
+        raise click.UsageError("--sidecar needs an output directory to write next to.")
+    if shard and styles:
+        raise click.UsageError("--styles cannot be combined with --shard.")
+    if shard and sidecar:
+        raise click.UsageError("--sidecar cannot be combined with --shard.")
+    if shard and ctx.obj["output_format"] == "html":
+        raise click.UsageError("--format html cannot be combined with --shard.")
+    if shard and ctx.obj["layout"] == "auto":
+        raise click.UsageError("--layout auto cannot be combined with --shard.")
+    if not to_stdout:
+        os.makedirs(output_dir, exist_ok=True)
+
+    if file_patterns or hunks:
+        # Decode only the selected slices, located through the byte index
+        if diff_path == STDIO or file_compression(diff_path):
+            raise click.UsageError("--files and --hunks need an uncompressed diff file on disk.")
+        index = load_index(diff_path, sidecar=not no_index)
+        selection = select(index, list(file_patterns) or None, hunks)
+        if not selection:
+            raise click.UsageError("No files or hunks match the selection.")
+        _build(ctx, read_selection(diff_path, selection), output_dir, shard, budget_report, styles, sidecar, limits)
+        return
+
+    streamed = diff_path == STDIO or file_compression(diff_path)
+    if streamed and ctx.parent.get_parameter_source("detect_moves") == ParameterSource.DEFAULT:
+        # Moves are found across the whole diff, which would hold all of it in
+        # memory; only --moves asks for that on a stream
+        ctx.obj["detect_moves"] = False
+    try:
+        with open_diff(diff_path) as diff_file:
+            # Streamed into the parser, decompressing as it goes
+            _build(ctx, diff_file, output_dir, shard, budget_report, styles, sidecar, limits)
+    except (EOFError, lzma.LZMAError, gzip.BadGzipFile) as e:
+        raise click.FileError(diff_path, f"corrupt or truncated compressed diff: {e}")
+
+
+def _build(
+    ctx,
+    diff_lines: Iterable[str],
+    output_dir: str,
+    shard: tuple[int, int] | None,
+    budget_report: str | None,
+    styles: list[str] | None,
+    sidecar: bool,
+    limits: dict,
+) -> None:
+    if shard:
+        settings = _processor(ctx).settings()
+        manifest_path = build_shard(list(diff_lines), output_dir, *shard, settings)
+        click.echo(f"Shard manifest written to: {manifest_path}")
+        return
+
+    budget = _render_budget(limits)
+
+    colorizer = CharColorizer(
+        style_name=styles[0] if styles else ctx.obj["highlight"] if ctx.obj["highlight"] != "none" else None, #?
+        highlighter=ctx.obj["highlighter"],
+    )
+    differ = Diff2Latex(
+        colorizer=colorizer,
+        budget=budget,
+        detect_moves=ctx.obj["detect_moves"],
+        hide_whitespace=ctx.obj["hide_whitespace"],
+        repeated_hunks=ctx.obj["repeated_hunks"],
+        fold_context=ctx.obj["fold_context"],
+        layout=ctx.obj["layout"],
+        inline_granularity=ctx.obj["inline_granularity"],
+    )
+    differ.parse(diff_lines)
+    if styles:
+        # Parsed and lexed once, then only recolored for every other style
+        for style in styles:
+            styled = differ if style == styles[0] else differ.restyled(style)
+            _write_output(
+                ctx, styled.iter_sourced_rows(html=ctx.obj["output_format"] == "html"), output_dir,
+                f"diff_output-{style}", differ.table_layout, styled if sidecar else None,
+            )
+    else:
+        _write_output(
+            ctx, differ.iter_sourced_rows(html=ctx.obj["output_format"] == "html"), output_dir,
+            layout=differ.table_layout, sidecar_of=differ if sidecar else None,
+        )
+    _write_budget_report(differ, budget_report, output_dir)
 
 
 @cli.command()
 @click.pass_context
-@click.argument("diff_file_path", type=click.File("r"))
+@click.argument("sources", nargs=-1)
 @click.argument("output_dir", type=click.Path(file_okay=False, dir_okay=True, writable=True))
-def build(ctx, diff_file_path: TextIO, output_dir: str) -> None:
-    """Build LaTeX from a diff file."""
-    os.makedirs(output_dir, exist_ok=True)
+@click.option("-m", "--manifest", "input_list", type=click.Path(exists=True, dir_okay=False), help="File listing input diffs, one per line")
+@click.option("-j", "--jobs", type=int, default=None, help="Number of worker processes (default: CPU count)")
+@click.option("--force", is_flag=True, help="Re-render inputs even if their outputs are up to date")
+@click.option("--shard", callback=_parse_shard_option, help="Only render shard INDEX/COUNT of the inputs")
+@click.option("--fragments", is_flag=True, help="Write table fragments for 'merge' instead of full documents")
+def batch(
+    ctx,
+    sources: tuple[str, ...],
+    output_dir: str,
+    input_list: str | None,
+    jobs: int | None,
+    force: bool,
+    shard: tuple[int, int] | None,
+    fragments: bool,
+) -> None:
+    """Build many diffs from directories, globs or a manifest file."""
+    if ctx.obj["output_format"] != "latex":
+        raise click.UsageError("batch only writes LaTeX, use build for HTML previews.")
+    pdf_output = ctx.obj.get("pdf_output", False)
+    if pdf_output and fragments:
+        raise click.UsageError("--fragments cannot be combined with --pdf-output.")
+    if fragments and ctx.obj["layout"] == "auto":
+        raise click.UsageError("--fragments cannot be combined with --layout auto.")
+    if pdf_output and shutil.which("lualatex") is None:
+        raise RuntimeError("lualatex not found in PATH. Please install it.")
 
-    colorizer = CharColorizer(style_name=ctx.obj["highlight"] if ctx.obj["highlight"] != "none" else None) #?
-    differ = Diff2Latex.build(diff_file_path, colorizer=colorizer)
-    lines = differ.to_latex()
+    try:
+        inputs = collect_inputs(sources, manifest=input_list, pdf=pdf_output)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    if not inputs:
+        raise click.UsageError("No input diffs found.")
+    manifest_name = MANIFEST_NAME
+    if shard:
+        inputs = select_shard(inputs, *shard)
+        manifest_name = shard_manifest_name(MANIFEST_NAME, *shard)
 
-    base_name = "diff_output"
-    tex_path = os.path.join(output_dir, f"{base_name}.tex")
-    pdf_path = os.path.join(output_dir, f"{base_name}.pdf")
+    settings = {**_processor(ctx).settings(), "pdf_output": pdf_output, "fragments": fragments}
+    start = time.perf_counter()
+    processed_bytes = 0
+
+    def report(result: BatchResult, done: int, total: int) -> None:
+        nonlocal processed_bytes
+        processed_bytes += result.size
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        line = f"[{done}/{total}] {result.input.path}: {result.status}"
+        if result.status != "skipped":
+            line += f" ({result.seconds:.2f}s)"
+        if result.error:
+            line += f" - {result.error}"
+        click.echo(f"{line} | {done / elapsed:.1f} files/s, {processed_bytes / elapsed / 1e6:.2f} MB/s")
 
-    template = _load_template().substitute(
-        font=ctx.obj["font_family"],
-        fontsize=ctx.obj["font_size"],
-        content=lines,
+    summary = run_batch(
+        inputs,
+        output_dir,
+        settings,
+        jobs=jobs,
+        force=force,
+        manifest_name=manifest_name,
+        progress=report,
+        shard=shard,
     )
-    if not ctx.obj.get("pdf_output", False):
-        with open(tex_path, "w") as tex_file:
-            tex_file.write(template)
 
-    if ctx.obj.get("pdf_output", False):
-        if shutil.which("lualatex") is None:
-            raise RuntimeError("lualatex not found in PATH. Please install it.")
+    click.echo(
+        f"{summary.rendered} rendered, {summary.skipped} up to date, {summary.failed} failed "
+        f"in {summary.seconds:.2f}s"
+    )
+    click.echo(f"Manifest written to: {summary.manifest_path}")
+    if summary.failed:
+        ctx.exit(1)
 
-        with tempfile.TemporaryDirectory() as tmpdir:
-            tmp_tex = os.path.join(tmpdir, "temp.tex")
-            with open(tmp_tex, "w") as f:
-                f.write(template)
 
-            subprocess.run(["lualatex", "-interaction=nonstopmode", tmp_tex], cwd=tmpdir, check=True)
-            subprocess.run(["lualatex", "-interaction=nonstopmode", tmp_tex], cwd=tmpdir, check=True)
+@cli.command()
+@click.pass_context
+@click.argument("manifests", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.argument("output_path", type=click.Path(dir_okay=False, writable=True))
+def merge(ctx, manifests: tuple[str, ...], output_path: str) -> None:
+    """Merge the results of sharded runs into one document."""
+    try:
+        merge_manifests(
+            list(manifests),
+            output_path,
+            font_family=ctx.obj["font_family"],
+            font_size=ctx.obj["font_size"],
+            pdf_output=ctx.obj.get("pdf_output", False),
+            template=ctx.obj["template"],
+        )
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    click.echo(f"Merged output written to: {output_path}")
 
-            tmp_pdf = os.path.join(tmpdir, "temp.pdf")
-            shutil.move(tmp_pdf, pdf_path)
 
-    click.echo(f"LaTeX written to: {tex_path}")
-    if ctx.obj.get("pdf_output", False):
-        click.echo(f"PDF written to: {pdf_path}")
-    
+@cli.command()
+@click.pass_context
+@click.argument("old_path", type=click.Path(exists=True))
+@click.argument("new_path", type=click.Path(exists=True))
+@click.argument("output_dir", type=click.Path(file_okay=False, dir_okay=True, writable=True, allow_dash=True))
+@click.option("-U", "--context", type=int, default=3, show_default=True, help="Unchanged lines shown around each change")
+@click.option("-j", "--jobs", type=int, default=None, help="Worker processes for tree comparison (default: CPU count)")
+@_budget_options
+def compare(
+    ctx, old_path: str, new_path: str, output_dir: str, context: int, jobs: int | None, budget_report: str | None, **limits
+) -> None:
+    """
+    Build LaTeX by comparing two files or directory trees directly.
+
+    The render budget applies to the whole comparison: its deadline counts
+    from the start, across all files.
+    """
+    if ctx.obj["layout"] == "auto":
+        raise click.UsageError("compare needs --layout split or unified.")
+    if output_dir != STDIO:
+        os.makedirs(output_dir, exist_ok=True)
+
+    colorizer = CharColorizer(
+        style_name=ctx.obj["highlight"] if ctx.obj["highlight"] != "none" else None,
+        highlighter=ctx.obj["highlighter"],
+    )
+    try:
+        differ = compare_paths(
+            old_path,
+            new_path,
+            colorizer,
+            context=context,
+            jobs=jobs,
+            budget=_render_budget(limits),
+            detect_moves=ctx.obj["detect_moves"],
+            hide_whitespace=ctx.obj["hide_whitespace"],
+            layout=ctx.obj["layout"],
+            fold_context=ctx.obj["fold_context"],
+            inline_granularity=ctx.obj["inline_granularity"],
+            repeated_hunks=ctx.obj["repeated_hunks"],
+        )
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    if differ is None:
+        click.echo(f"No differences between {old_path} and {new_path}.", err=output_dir == STDIO)
+        return
+    _write_output(
+        ctx, differ.iter_sourced_rows(html=ctx.obj["output_format"] == "html"), output_dir, layout=ctx.obj["layout"]
+    )
+    _write_budget_report(differ, budget_report, output_dir)
+
+
+@cli.command("log")
+@click.pass_context
+@click.argument("revision_range")
+@click.argument("output_dir", type=click.Path(file_okay=False, dir_okay=True, writable=True))
+@click.argument("paths", nargs=-1)
+@click.option("-C", "--repo", type=click.Path(exists=True, file_okay=False), help="Repository to read (default: current directory)")
+@click.option("-j", "--jobs", type=int, default=1, show_default=True, help="Number of worker processes")
+@click.option("--combined", is_flag=True, help="Write all commits into one document, each introduced by a header row")
+@click.option("--reverse", is_flag=True, help="Render the oldest commit first")
+def log(
+    ctx,
+    revision_range: str,
+    output_dir: str,
+    paths: tuple[str, ...],
+    repo: str | None,
+    jobs: int,
+    combined: bool,
+    reverse: bool,
+) -> None:
+    """Build one document per commit of a range (e.g. v1.0..HEAD), read from git log -p."""
+    if ctx.obj["output_format"] != "latex":
+        raise click.UsageError("log only writes LaTeX, use build for HTML previews.")
+    if combined and ctx.obj["layout"] == "auto":
+        raise click.UsageError("--combined cannot be combined with --layout auto.")
+    pdf_output = ctx.obj.get("pdf_output", False)
+    if pdf_output and shutil.which("lualatex") is None:
+        raise RuntimeError("lualatex not found in PATH. Please install it.")
+
+    settings = {**_processor(ctx).settings(), "pdf_output": pdf_output}
+
+    def report(result: LogResult, done: int) -> None:
+        line = f"[{done}] {result.commit[:12]}: {result.status}"
+        if result.output:
+            line += f" -> {result.output}"
+        if result.status != "empty":
+            line += f" ({result.seconds:.2f}s)"
+        if result.error:
+            line += f" - {result.error}"
+        click.echo(line)
+
+    commits = iter_commits(revision_range, repo=repo, paths=paths, reverse=reverse)
+    try:
+        summary = render_log(commits, output_dir, settings, jobs=jobs, combined=combined, progress=report)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+
+    click.echo(
+        f"{summary.rendered} rendered, {summary.empty} without changes, {summary.failed} failed "
+        f"in {summary.seconds:.2f}s"
+    )
+    if combined:
+        click.echo(f"Document written to: {os.path.join(output_dir, 'diff_output' + ('.pdf' if pdf_output else '.tex'))}")
+    if summary.failed:
+        ctx.exit(1)
+
+
+@cli.command("index")
+@click.argument("diff_path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--list", "list_files", is_flag=True, help="List the indexed files and their hunk counts")
+def index_diff(diff_path: str, list_files: bool) -> None:
+    """Index the files and hunks of a diff into a sidecar for fast --files/--hunks queries."""
+    if file_compression(diff_path):
+        raise click.UsageError("Only uncompressed diffs can be indexed.")
+    index = load_index(diff_path)
+    if list_files:
+        for file in index.files:
+            click.echo(f"{file.path}\t{len(file.hunks)} hunks\t{file.end - file.start} bytes")
+    hunk_count = sum(len(file.hunks) for file in index.files)
+    click.echo(f"{len(index.files)} files, {hunk_count} hunks indexed in: {sidecar_path(diff_path)}")
+
 
 def main():
     """Main entry point for the CLI."""
@@ -0,0 +1,233 @@
+"""
+In-process comparison of files and directory trees.
+
+Instead of writing a unified diff to disk and parsing it back, the two
+versions are diffed with difflib and the opcodes are fed straight into the
+model builder. For trees, each file pair is diffed in a worker process and
+the models are joined into one, so hunks repeated across files are shared.
+"""
+
+from typing import Literal, Optional
+from concurrent.futures import ProcessPoolExecutor
+import os
+import time
+
+from .api import DiffProcessor
+from .core.diff2latex import Diff2Latex
+from .core.models import Banner
+from .core.utils import CharColorizer, RenderBudget
+
+# Bytes sniffed for NUL characters to tell binary files apart
+_BINARY_SNIFF = 8192
+
+
+def _read_bytes(path: Optional[str]) -> bytes:
+    """The contents of a file, empty if it is missing."""
+    if path is None or not os.path.exists(path):
+        return b""
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def read_lines(path: Optional[str]) -> Optional[list[str]]:
+    """
+    Read a file as a list of lines for comparison.
+
+    Returns an empty list for a missing file and None for a binary one.
+    """
+    data = _read_bytes(path)
+    if b"\0" in data[:_BINARY_SNIFF]:
+        return None
+    return data.decode("utf-8", errors="replace").splitlines()
+
+
+def compare_files(
+    old_path: Optional[str],
+    new_path: Optional[str],
+    colorizer: CharColorizer,
+    context: int = 3,
+    budget: Optional[RenderBudget] = None,
+    detect_moves: bool = True,
+    hide_whitespace: bool = False,
+    layout: Literal["split", "unified"] = "split",
+    fold_context: Optional[int] = None,
+    inline_granularity: Literal["token", "char", "chunk", "auto"] = "token",
+    repeated_hunks: Literal["reuse", "collapse", "expand"] = "reuse",
+    display_path: Optional[str] = None,
+) -> Optional[Diff2Latex]:
+    """
+    Diff two files and return the model of their differences.
+
+    Either path may be None (or missing) for an added or deleted file; the
+    file is reported as display_path, by default new_path or old_path.
+    Returns None if the files are identical and raises ValueError for
+    binary files that differ.
+    """
+    old_lines = read_lines(old_path)
+    new_lines = read_lines(new_path)
+    if old_lines is None or new_lines is None:
+        if _read_bytes(old_path) == _read_bytes(new_path):
+            return None
+        raise ValueError("Binary files differ")
+    if old_lines == new_lines:
+        return None
+
+    return Diff2Latex.compare(
+        old_lines, new_lines, colorizer=colorizer, context=context, budget=budget,
+        path=display_path or new_path or old_path or "", detect_moves=detect_moves,
+        hide_whitespace=hide_whitespace, repeated_hunks=repeated_hunks, layout=layout,
+        fold_context=fold_context, inline_granularity=inline_granularity,
+    )
+
+
+def _tree_files(root: str) -> set[str]:
+    found = set()
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d != ".git"]
+        for name in filenames:
+            found.add(os.path.relpath(os.path.join(dirpath, name), root).replace(os.sep, "/"))
+    return found
+
+
+_worker_processor: Optional[DiffProcessor] = None
+# Wall-clock start of the comparison, which the budget's deadline counts from
+_worker_started: float = 0.0
+
+
+def _init_worker(settings: dict, budget: Optional[RenderBudget] = None, started: Optional[float] = None) -> None:
+    """Build the per-worker processor (and its colorizer) once."""
+    global _worker_processor, _worker_started
+    _worker_processor = DiffProcessor.from_settings(settings, budget)
+    _worker_started = time.time() if started is None else started
+
+
+def _remaining_budget() -> Optional[RenderBudget]:
+    """The worker's budget, with only what is left of the shared deadline."""
+    assert _worker_processor is not None, "worker not initialised"
+    budget = _worker_processor.budget
+    if budget is None or budget.deadline is None:
+        return budget
+    remaining = budget.deadline - (time.time() - _worker_started)
+    return budget.model_copy(update={"deadline": max(0.0, remaining)})
+
+
+def _compare_pair(
+    rel: str, old_path: Optional[str], new_path: Optional[str], context: int
+) -> tuple[str, Optional[Diff2Latex], Optional[str]]:
+    """(rel, model or None if unchanged, error message) of one file pair."""
+    processor = _worker_processor
+    assert processor is not None, "worker not initialised"
+    try:
+        differ = compare_files(
+            old_path, new_path, processor.colorizer, context, _remaining_budget(), display_path=rel,
+            detect_moves=processor.detect_moves, hide_whitespace=processor.hide_whitespace,
+            layout=processor.layout, fold_context=processor.fold_context,
+            inline_granularity=processor.inline_granularity,
+        )
+    except ValueError as e:
+        return rel, None, str(e)
+    return rel, differ, None
+
+
+def compare_trees(
+    old_root: str,
+    new_root: str,
+    colorizer: CharColorizer,
+    context: int = 3,
+    jobs: Optional[int] = None,
+    budget: Optional[RenderBudget] = None,
+    detect_moves: bool = True,
+    hide_whitespace: bool = False,
+    layout: Literal["split", "unified"] = "split",
+    fold_context: Optional[int] = None,
+    inline_granularity: Literal["token", "char", "chunk", "auto"] = "token",
+    repeated_hunks: Literal["reuse", "collapse", "expand"] = "reuse",
+) -> Optional[Diff2Latex]:
+    """
+    Diff two directory trees and return one model of all differences.
+
+    Files are paired by relative path and diffed across a process pool;
+    each changed file is introduced by a header row. The per-file models
+    are joined in path order, so a hunk repeated across files (e.g. the
+    same license header change) is emitted according to repeated_hunks.
+    The budget's deadline counts from the start of the whole comparison,
+    and the model's report lists the degradations of every file.
+    Returns None if the trees have no differences.
+    """
+    old_files = _tree_files(old_root)
+    new_files = _tree_files(new_root)
+    pairs = [
+        (
+            rel,
+            os.path.join(old_root, rel) if rel in old_files else None,
+            os.path.join(new_root, rel) if rel in new_files else None,
+            context,
+        )
+        for rel in sorted(old_files | new_files)
+    ]
+
+    options = {
+        "detect_moves": detect_moves, "hide_whitespace": hide_whitespace, "layout": layout,
+        "fold_context": fold_context, "inline_granularity": inline_granularity,
+    }
+    settings = {
+        "highlight_style": colorizer.style_name, "file_extension": colorizer.ext,
+        "highlighter": colorizer.highlighter, **options,
+    }
+    started = time.time()
+    workers = min(jobs or os.cpu_count() or 1, len(pairs))
+    if workers <= 1:
+        _init_worker(settings, budget, started)
+        results = [_compare_pair(*pair) for pair in pairs]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(settings, budget, started)
+        ) as pool:
+            results = list(pool.map(_compare_pair, *zip(*pairs), chunksize=max(1, len(pairs) // (workers * 4))))
+
+    tree = Diff2Latex(
+        colorizer=colorizer, budget=budget, repeated_hunks=repeated_hunks, **options,
+    )
+    changed = False
+    for rel, differ, error in results:
+        if differ is None and error is None:
+            continue
+        changed = True
+        tree.add_banner(Banner(text=rel))
+        if differ is None:
+            tree.add_banner(Banner(text=error, bold=False))
+        else:
+            tree.extend(differ)
+    return tree if changed else None
+
+
+def compare_paths(
+    old_path: str,
+    new_path: str,
+    colorizer: CharColorizer,
+    context: int = 3,
+    jobs: Optional[int] = None,
+    budget: Optional[RenderBudget] = None,
+    detect_moves: bool = True,
+    hide_whitespace: bool = False,
+    layout: Literal["split", "unified"] = "split",
+    fold_context: Optional[int] = None,
+    inline_granularity: Literal["token", "char", "chunk", "auto"] = "token",
+    repeated_hunks: Literal["reuse", "collapse", "expand"] = "reuse",
+) -> Optional[Diff2Latex]:
+    """
+    Diff two files or two directory trees and return the model of their
+    differences, None if there are none.
+
+    Raises:
+        ValueError: If one path is a directory and the other is not
+    """
+    if os.path.isdir(old_path) != os.path.isdir(new_path):
+        raise ValueError("Cannot compare a directory with a file")
+    options = dict(
+        budget=budget, detect_moves=detect_moves, hide_whitespace=hide_whitespace, layout=layout,
+        fold_context=fold_context, inline_granularity=inline_granularity, repeated_hunks=repeated_hunks,
+    )
+    if os.path.isdir(old_path):
+        return compare_trees(old_path, new_path, colorizer, context, jobs, **options)
+    return compare_files(old_path, new_path, colorizer, context, **options)
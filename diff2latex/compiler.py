@@ -0,0 +1,129 @@
+"""
+Fail-fast lualatex driver.
+
+Every pass runs with ``-halt-on-error``, so a bad row stops TeX at once
+instead of after the whole document, and no further pass is started after
+a failure. The first error is read from the ``.log`` and, through the map
+of document lines to diff rows recorded while the document was written,
+reported against the diff file, hunk and line it came from.
+"""
+
+from typing import Iterable, Iterator, Optional
+import os
+import re
+import shutil
+import subprocess
+
+from .core.models import RowSource
+
+# "./temp.tex:123: Undefined control sequence." with -file-line-error
+_FILE_LINE_ERROR = re.compile(r"^(.*?):(\d+): (.+)$", re.MULTILINE)
+# Classic "! Message." ... "l.123 <context>" errors
+_BANG_ERROR = re.compile(r"^! (.+)$", re.MULTILINE)
+_ERROR_LINE = re.compile(r"^l\.(\d+) (.*)$", re.MULTILINE)
+
+
+class CompileError(RuntimeError):
+    """
+    lualatex stopped on an error. Carries the TeX message, the line of the
+    document it occurred on and, if known, the diff row of that line.
+    """
+
+    def __init__(
+        self,
+        message: str,
+        tex_line: Optional[int] = None,
+        source: Optional[RowSource] = None,
+        context: str = "",
+    ) -> None:
+        self.message = message
+        self.tex_line = tex_line
+        self.source = source
+        self.context = context
+        where = f"{source}: " if source else f"line {tex_line} of the document: " if tex_line else ""
+        super().__init__(f"LaTeX error at {where}{message}" + (f"\n  {context}" if context else ""))
+
+
+def track_sources(
+    rows: Iterable[tuple[str, list[Optional[RowSource]]]],
+    first_line: int,
+    source_map: dict[int, RowSource],
+) -> Iterator[str]:
+    """
+    Pass row chunks through (joined by newlines, starting at first_line of
+    the document) while recording the diff row of every document line in
+    source_map.
+    """
+    line = first_line
+    for chunk, sources in rows:
+        for offset, source in enumerate(sources):
+            if source is not None:
+                source_map[line + offset] = source
+        line += chunk.count("\n") + 1
+        yield chunk
+
+
+def parse_log(log: str, tex_name: str) -> tuple[str, Optional[int], str]:
+    """
+    Find the first error in a TeX log.
+
+    Returns:
+        The message, the line of tex_name it occurred on (None if it was
+        elsewhere, e.g. in a package) and the input TeX was reading
+    """
+    for match in _FILE_LINE_ERROR.finditer(log):
+        if os.path.basename(match.group(1)) == tex_name:
+            context = _ERROR_LINE.search(log, match.end())
+            return match.group(3).strip(), int(match.group(2)), context.group(2).strip() if context else ""
+    bang = _BANG_ERROR.search(log)
+    if bang is None:
+        return "lualatex failed without reporting an error", None, ""
+    context = _ERROR_LINE.search(log, bang.end())
+    if context is None:
+        return bang.group(1).strip(), None, ""
+    return bang.group(1).strip(), int(context.group(1)), context.group(2).strip()
+
+
+def compile_tex(
+    tex_path: str,
+    passes: int = 2,
+    source_map: Optional[dict[int, RowSource]] = None,
+) -> str:
+    """
+    Compile a ``.tex`` file in its directory, stopping at the first error.
+
+    Args:
+        tex_path: The document to compile
+        passes: Number of lualatex runs (tabularx needs two to settle)
+        source_map: Document line -> diff row, see track_sources()
+
+    Returns:
+        Path of the produced PDF
+
+    Raises:
+        RuntimeError: If lualatex is not found in PATH
+        CompileError: If a pass fails; later passes are not run
+    """
+    if shutil.which("lualatex") is None:
+        raise RuntimeError("lualatex not found in PATH. Please install it.")
+
+    workdir, tex_name = os.path.split(os.path.abspath(tex_path))
+    for _ in range(passes):
+        result = subprocess.run(
+            ["lualatex", "-interaction=nonstopmode", "-halt-on-error", "-file-line-error", tex_name],
+            cwd=workdir,
+            capture_output=True,
+            text=True,
+            errors="replace",
+        )
+        if result.returncode != 0:
+            log_path = os.path.join(workdir, os.path.splitext(tex_name)[0] + ".log")
+            try:
+                with open(log_path, "r", errors="replace") as f:
+                    log = f.read()
+            except OSError:
+                log = result.stdout
+            message, tex_line, context = parse_log(log, tex_name)
+            source = (source_map or {}).get(tex_line) if tex_line is not None else None
+            raise CompileError(message, tex_line, source, context)
+    return os.path.splitext(os.path.abspath(tex_path))[0] + ".pdf"
@@ -1,134 +1,718 @@
 # pyright: reportUnknownMemberType=false, reportUnknownVariableType=false
-from pydantic import BaseModel, PrivateAttr
-from typing import TextIO
-from .models import Line, Cell, CodeBlock
-from .utils import CharColorizer
+from pydantic import BaseModel, Field, PrivateAttr
+from typing import Iterable, Iterator, Literal, TextIO
+from collections import Counter
+from .models import Banner, Line, Cell, CodeBlock, HunkSummary, RowSource
+from .utils import CharColorizer, RenderBudget, BudgetReport
+from .utils.budget import BudgetTracker
+from .utils.granularity import SPLITTERS, Segment, adaptive_segments, diff_segments
+from .utils.moves import MovedLines, detect_moves, normalize_whitespace
+from .utils.patch import header_path, parse_hunk_header
 from difflib import SequenceMatcher
+import bisect
+import hashlib
 import re
 
+# Line numbers of a reused hunk, relative to its macro's #1 (old) and #2 (new)
+# start, see \dhdef in template.tex
+_RELATIVE_NR = re.compile(r"\\the\\numexpr#([12])\+(-?\d+)\\relax")
+
+# Files named in a "same change" row before the rest is elided
+_MAX_REPEAT_NAMES = 3
+
+# A fold row must hide at least this many lines, or the lines are shown
+_MIN_FOLDED_LINES = 2
+
 
 class Diff2Latex(BaseModel):
-    _parsed_lines: list[Line] = PrivateAttr(default_factory=list)
+    """
+    Builds the table model of a diff.
+
+    An instance holds the state of one render and must not be shared between
+    threads; the colorizer and budget it is given can be.
+    """
+
+    _parsed_lines: list[Line | Banner] = PrivateAttr(default_factory=list)
+    _tracker: BudgetTracker | None = PrivateAttr(default=None)
+    _file_colorizer: CharColorizer | None = PrivateAttr(default=None)
+    _moves: MovedLines | None = PrivateAttr(default=None)
+    _changed: tuple[int, int] = PrivateAttr(default=(0, 0))
+    # (first row, old start, new start, path) of every hunk, in order
+    _hunks: list[tuple[int, int, int, str | None]] = PrivateAttr(default_factory=list)
+    # Row of every fold banner -> number of lines it hides
+    _folded: dict[int, int] = PrivateAttr(default_factory=dict)
+    # Rows that belong to no hunk, such as the file headers of a tree comparison
+    _between: set[int] = PrivateAttr(default_factory=set)
     colorizer: CharColorizer
+    budget: RenderBudget | None = None
+    detect_moves: bool = Field(default=True, description="Mark moved blocks instead of diffing them.")
+    hide_whitespace: bool = Field(default=False, description="Show whitespace-only changes as unchanged lines.")
+    repeated_hunks: Literal["reuse", "collapse", "expand"] = Field(
+        default="reuse",
+        description=(
+            "How hunks repeated in the diff are emitted: 'reuse' typesets them from one TeX macro, "
+            "'collapse' shows the first and a 'same change' row, 'expand' writes every copy out."
+        ),
+    )
+    fold_context: int | None = Field(
+        default=None,
+        ge=0,
+        description=(
+            "Unchanged lines kept next to each change; longer unchanged runs become one "
+            "'unchanged lines' row. None shows every line."
+        ),
+    )
+    inline_granularity: Literal["token", "char", "chunk", "auto"] = Field(
+        default="token",
+        description=(
+            "Unit the inline diff of a changed line pair compares: single characters, tokens, or "
+            "whitespace-separated chunks; 'auto' picks one per pair from its length and refines "
+            "only the regions that changed."
+        ),
+    )
+    layout: Literal["split", "unified", "auto"] = Field(
+        default="split",
+        description=(
+            "'split' shows old and new code side by side, 'unified' shows one code column with "
+            "unchanged lines once and removed lines above added ones, 'auto' picks unified when "
+            "no line is paired with a changed partner, e.g. for added or deleted files."
+        ),
+    )
 
-    @staticmethod
-    def _clean_diff_file(lines: list[str]) -> list[str]:
-        return [line for line in lines if not line.startswith(("---", "+++", "@@"))]
+    @property
+    def report(self) -> BudgetReport:
+        """What the render budget degraded, and why. Empty without a budget."""
+        return self._tracker.report if self._tracker else BudgetReport()
+
+    @property
+    def table_layout(self) -> Literal["split", "unified"]:
+        """The layout the rows are written in, with 'auto' resolved."""
+        if self.layout != "auto":
+            return self.layout
+        for line in self._parsed_lines:
+            if isinstance(line, Line) and not line.is_context and all(cell.line_nr for cell in line.content):
+                return "split"
+        return "unified"
 
     @staticmethod
     def _tokenize(line: str) -> list[str]:
-        return re.findall(r"\s+|\w+|[^\w\s]", line)
+        return SPLITTERS["token"](line)
+
+
+    @property
+    def _active_colorizer(self) -> CharColorizer:
+        """The colorizer for the file being parsed, see CharColorizer.for_file()."""
+        return self._file_colorizer or self.colorizer
+
+    def _start_render(self, groups: list[tuple[list[str], list[str]]]) -> None:
+        self._tracker = BudgetTracker(budget=self.budget) if self.budget else None
+        self._file_colorizer = None
+        self._moves = detect_moves(groups) if self.detect_moves else None
+        self._changed = (0, 0)
 
+    def _finish_render(self) -> None:
+        if self._tracker:
+            self._tracker.finish()
+
+    def _plan(self, line: str, line_nr: int, side: str | None = None) -> tuple[str, bool, bool]:
+        """Apply the render budget to a line, see BudgetTracker.plan()."""
+        if self._tracker is None:
+            return line, True, True
+        token_count = len(self._tokenize(line)) if self._tracker.needs_tokens else None
+        return self._tracker.plan(line, token_count, line_nr, side)
 
     def _inline_diff(self, old_line: str, new_line: str) -> tuple[list[CodeBlock], list[CodeBlock]]:
-        old_tokens = self._tokenize(old_line)
-        new_tokens = self._tokenize(new_line)
-        matcher = SequenceMatcher(None, old_tokens, new_tokens)
+        segments: list[Segment]
+        if self.inline_granularity == "auto":
+            segments = adaptive_segments(old_line, new_line)
+        else:
+            segments = diff_segments(old_line, new_line, self.inline_granularity)
 
         old_chunks = []
         new_chunks = []
+        # Neighbouring pieces of one kind (e.g. of refined regions) become one block
+        runs: list[Segment] = []
+        for equal, old_part, new_part in segments:
+            if runs and runs[-1][0] == equal:
+                _, old_run, new_run = runs.pop()
+                old_part, new_part = old_run + old_part, new_run + new_part
+            runs.append((equal, old_part, new_part))
 
-        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
-            old_part = "".join(old_tokens[i1:i2])
-            new_part = "".join(new_tokens[j1:j2])
-
-            if tag == "equal":
+        for equal, old_part, new_part in runs:
+            if equal:
                 old_chunks.append(CodeBlock(content=old_part))
-                new_chunks.append(CodeBlock(content=old_part))
-            elif tag == "replace":
+                new_chunks.append(CodeBlock(content=new_part))
+            else:
                 if old_part:
                     old_chunks.append(CodeBlock(content=old_part, bg_color="diffcharred"))
                 if new_part:
                     new_chunks.append(CodeBlock(content=new_part, bg_color="diffchargreen"))
-            elif tag == "delete":
-                old_chunks.append(CodeBlock(content=old_part, bg_color="diffcharred"))
-            elif tag == "insert":
-                new_chunks.append(CodeBlock(content=new_part, bg_color="diffchargreen"))
 
         return old_chunks, new_chunks
 
-    def _process_hunk(self, hunk: list[str], line_start: tuple[int, int]) -> list[Line] | tuple[int, int]:
+    @staticmethod
+    def _split_hunk(hunk: list[str]) -> tuple[list[str], list[str]]:
         deletions = [line[1:].rstrip() for line in hunk if line.startswith("-")]
         additions = [line[1:].rstrip() for line in hunk if line.startswith("+")]
+        return deletions, additions
+
+    @classmethod
+    def _change_groups(cls, lines: list[str]) -> list[tuple[list[str], list[str]]]:
+        """The (deletions, additions) of every hunk, split exactly like parse() does."""
+        groups = []
+        hunk: list[str] = []
+        for line in lines:
+            if line.startswith(("-", "+")) and not line.startswith(("---", "+++")):
+                hunk.append(line)
+            elif hunk:
+                groups.append(cls._split_hunk(hunk))
+                hunk = []
+        if hunk:
+            groups.append(cls._split_hunk(hunk))
+        return groups
+
+    def _process_hunk(self, hunk: list[str], line_start: tuple[int, int]) -> tuple[list[Line], tuple[int, int]]:
+        deletions, additions = self._split_hunk(hunk)
+        return self._process_changes(deletions, additions, line_start)
+
+    def _process_changes(
+        self, deletions: list[str], additions: list[str], line_start: tuple[int, int]
+    ) -> tuple[list[Line], tuple[int, int]]:
         max_len = max(len(deletions), len(additions))
 
         lines = []
         old_lineno, new_lineno = line_start
+        # Position of these lines among all changed lines, see detect_moves()
+        old_base, new_base = self._changed
+        self._changed = (old_base + len(deletions), new_base + len(additions))
+        moves = self._moves
 
         for i in range(max_len):
-            old_line = deletions[i] if i < len(deletions) else ""
-            new_line = additions[i] if i < len(additions) else ""
-            
-            old_line_colormap = self.colorizer.get_colormap(old_line)
-            new_line_colormap = self.colorizer.get_colormap(new_line)
-
-            if old_line and new_line:
-                old_diff, new_diff = self._inline_diff(old_line, new_line)
+            # None marks a missing partner, "" is a genuinely blank line
+            old_line = deletions[i] if i < len(deletions) else None
+            new_line = additions[i] if i < len(additions) else None
+            old_moved = old_line is not None and moves is not None and old_base + i in moves.old
+            new_moved = new_line is not None and moves is not None and new_base + i in moves.new
+            whitespace_only = (
+                old_line is not None and new_line is not None and not (old_moved or new_moved)
+                and normalize_whitespace(old_line) == normalize_whitespace(new_line)
+            )
+            if whitespace_only and self.hide_whitespace:
+                lines.append(self._context_line(old_line, old_lineno, new_lineno, new_line))
+                old_lineno += 1
+                new_lineno += 1
+                continue
+
+            old_bg = "movedfrom" if old_moved else "wsonly" if whitespace_only else "remred"
+            new_bg = "movedto" if new_moved else "wsonly" if whitespace_only else "addgreen"
+            old_highlight = new_highlight = old_inline = new_inline = False
+            if old_line is not None:
+                old_line, old_highlight, old_inline = self._plan(old_line, old_lineno, "old")
+            if new_line is not None:
+                new_line, new_highlight, new_inline = self._plan(new_line, new_lineno, "new")
+
+            style = self._active_colorizer.style_name
+            old_line_tokens = self._active_colorizer.get_tokens(old_line) if old_line is not None and old_highlight else None
+            new_line_tokens = self._active_colorizer.get_tokens(new_line) if new_line is not None and new_highlight else None
+
+            if old_line is not None and new_line is not None:
+                # Moved and whitespace-only lines have nothing worth an inline diff
+                if old_inline and new_inline and not (old_moved or new_moved or whitespace_only):
+                    old_diff, new_diff = self._inline_diff(old_line, new_line)
+                else:
+                    old_diff, new_diff = [CodeBlock(content=old_line)], [CodeBlock(content=new_line)]
                 lines.append(Line(
                     content=(
-                        Cell(content=old_diff, line_nr=old_lineno, bg_color="remred").attach_colormap(old_line_colormap),
-                        Cell(content=new_diff, line_nr=new_lineno, bg_color="addgreen").attach_colormap(new_line_colormap)
+                        Cell(content=old_diff, line_nr=old_lineno, bg_color=old_bg).attach_tokens(old_line_tokens, style),
+                        Cell(content=new_diff, line_nr=new_lineno, bg_color=new_bg).attach_tokens(new_line_tokens, style)
                     ),
                 ))
                 old_lineno += 1
                 new_lineno += 1
-            elif old_line:
+            elif old_line is not None:
                 lines.append(Line(
                     content=(
-                        Cell(content=[CodeBlock(content=old_line)], line_nr=old_lineno, bg_color="remred").attach_colormap(old_line_colormap),
+                        Cell(content=[CodeBlock(content=old_line)], line_nr=old_lineno, bg_color=old_bg).attach_tokens(old_line_tokens, style),
                         Cell(content=[], line_nr=None)
                     ),
                 ))
                 old_lineno += 1
-            elif new_line:
+            elif new_line is not None:
                 lines.append(Line(
                     content=(
                         Cell(content=[], line_nr=None),
-                        Cell(content=[CodeBlock(content=new_line)], line_nr=new_lineno, bg_color="addgreen").attach_colormap(new_line_colormap)
+                        Cell(content=[CodeBlock(content=new_line)], line_nr=new_lineno, bg_color=new_bg).attach_tokens(new_line_tokens, style)
                     ),
                 ))
                 new_lineno += 1
 
         return lines, (old_lineno, new_lineno)
 
-    def parse(self, lines: list[str]) -> None:
-        clean_lines = self._clean_diff_file(lines)
+    def _context_line(self, line: str, old_line_nr: int, new_line_nr: int, new_line: str | None = None) -> Line:
+        """An unchanged line; new_line is given when only its whitespace changed."""
+        line, highlight, _ = self._plan(line, new_line_nr)
+        style = self._active_colorizer.style_name
+        line_tokens = self._active_colorizer.get_tokens(line) if highlight else None
+        new_cell = Cell(content=[CodeBlock(content=line)], line_nr=new_line_nr).attach_tokens(line_tokens, style)
+        if new_line is not None and new_line != line:
+            new_line, new_highlight, _ = self._plan(new_line, new_line_nr)
+            new_tokens = self._active_colorizer.get_tokens(new_line) if new_highlight else None
+            new_cell = Cell(content=[CodeBlock(content=new_line)], line_nr=new_line_nr).attach_tokens(new_tokens, style)
+        return Line(
+            content=(
+                Cell(content=[CodeBlock(content=line)], line_nr=old_line_nr).attach_tokens(line_tokens, style),
+                new_cell,
+            ),
+        )
+
+    def _add_context(self, run: list[str], old_line_nr: int, new_line_nr: int, after_change: bool, before_change: bool) -> None:
+        """
+        Add a run of unchanged lines. With fold_context only that many lines
+        next to a change are kept, and the rest is replaced by a single row;
+        folded lines are neither highlighted nor turned into cells.
+        """
+        head = len(run)
+        folded = 0
+        if self.fold_context is not None:
+            head = self.fold_context if after_change else 0
+            tail = self.fold_context if before_change else 0
+            folded = len(run) - head - tail
+            if folded < _MIN_FOLDED_LINES:
+                head, folded = len(run), 0
+
+        for offset, line in enumerate(run[:head]):
+            self._parsed_lines.append(self._context_line(line, old_line_nr + offset, new_line_nr + offset))
+        if folded:
+            self._folded[len(self._parsed_lines)] = folded
+            self._parsed_lines.append(Banner(text=f"⋯ {folded} unchanged lines", bold=False))
+        for offset in range(head + folded, len(run)):
+            self._parsed_lines.append(self._context_line(run[offset], old_line_nr + offset, new_line_nr + offset))
+
+    def parse(self, lines: Iterable[str]) -> None:
+        """
+        Build the model from the lines of a unified diff.
+
+        Without move detection the lines are consumed in a single pass, so
+        they may come straight from a (decompressing) stream. Moves are
+        found across the whole diff first, which needs all lines at once.
+        """
+        groups: list[tuple[list[str], list[str]]] = []
+        if self.detect_moves:
+            lines = list(lines)
+            groups = self._change_groups(lines)
+        self._start_render(groups)
         hunk: list[str] = []
+        # Unchanged lines since the last change, added once we know whether
+        # another change follows them (see _add_context)
+        context: list[str] = []
+        after_change = False
         old_line_nr = 1
         new_line_nr = 1
+        old_path: str | None = None
+        path: str | None = None
+        sniff_shebang = False
+
+        def flush_context(before_change: bool) -> None:
+            nonlocal old_line_nr, new_line_nr
+            if context:
+                self._add_context(context, old_line_nr, new_line_nr, after_change, before_change)
+                old_line_nr += len(context)
+                new_line_nr += len(context)
+                context.clear()
+
+        for line in lines:
+            if line.startswith(("---", "+++", "@@")):
+                # Headers are not rendered, but they end the current hunk and
+                # tell the render budget which file we are in
+                if hunk:
+                    processed_lines, (old_line_nr, new_line_nr) = self._process_hunk(hunk, (old_line_nr, new_line_nr))
+                    self._parsed_lines.extend(processed_lines)
+                    hunk = []
+                flush_context(before_change=False)
+                after_change = False
+                if line.startswith("@@"):
+                    numbers = parse_hunk_header(line)
+                    if numbers:
+                        old_line_nr, _, new_line_nr, _ = numbers
+                        self._hunks.append((len(self._parsed_lines), old_line_nr, new_line_nr, path))
+                elif line.startswith("--- "):
+                    old_path = header_path(line)
+                elif line.startswith("+++ "):
+                    path = header_path(line) or old_path
+                    if self._tracker:
+                        self._tracker.start_file(path)
+                    self._file_colorizer = self.colorizer.for_file(path)
+                    sniff_shebang = True
+                continue
+
+            if sniff_shebang:
+                # A "#!" on the first line of a file picks the lexer for
+                # scripts without a recognisable name
+                sniff_shebang = False
+                if line[1:].startswith("#!"):
+                    self._file_colorizer = self._active_colorizer.for_file(
+                        self._active_colorizer.filename, line[1:].rstrip()
+                    )
 
-        for line in clean_lines:
             if line.startswith(("-", "+")):
+                flush_context(before_change=True)
                 hunk.append(line)
             else:
                 if hunk:
                     processed_lines, (old_line_nr, new_line_nr) = self._process_hunk(hunk, (old_line_nr, new_line_nr))
                     self._parsed_lines.extend(processed_lines)
                     hunk = []
+                    after_change = True
 
-                line = line[1:].rstrip() if line.startswith(" ") else line.rstrip()
-                line_colormap = self.colorizer.get_colormap(line)
-
-                self._parsed_lines.append(Line(
-                    content=(
-                        Cell(content=[CodeBlock(content=line)], line_nr=old_line_nr).attach_colormap(line_colormap),    
-                        Cell(content=[CodeBlock(content=line)], line_nr=new_line_nr).attach_colormap(line_colormap)
-                    ),
-                ))
-                old_line_nr += 1
-                new_line_nr += 1
+                if line.strip() and not line.startswith(" "):
+                    # "diff --git", "index ..." and "\ No newline at end of file"
+                    continue
+                context.append(line[1:].rstrip() if line.startswith(" ") else line.rstrip())
 
         if hunk:
             self._parsed_lines.extend(self._process_hunk(hunk, (old_line_nr, new_line_nr))[0])
+        flush_context(before_change=False)
+        self._finish_render()
 
     @classmethod
-    def build(cls, file: TextIO, colorizer: CharColorizer) -> "Diff2Latex":
-        instance = cls(colorizer=colorizer)
-        instance.parse(file.readlines())
+    def build(
+        cls,
+        file: TextIO,
+        colorizer: CharColorizer,
+        budget: RenderBudget | None = None,
+        detect_moves: bool = True,
+        hide_whitespace: bool = False,
+        repeated_hunks: Literal["reuse", "collapse", "expand"] = "reuse",
+        fold_context: int | None = None,
+        layout: Literal["split", "unified", "auto"] = "split",
+        inline_granularity: Literal["token", "char", "chunk", "auto"] = "token",
+    ) -> "Diff2Latex":
+        instance = cls(
+            colorizer=colorizer,
+            budget=budget,
+            detect_moves=detect_moves,
+            hide_whitespace=hide_whitespace,
+            repeated_hunks=repeated_hunks,
+            fold_context=fold_context,
+            layout=layout,
+            inline_granularity=inline_granularity,
+        )
+        instance.parse(file)
         return instance
 
+    def parse_opcodes(
+        self, old_lines: list[str], new_lines: list[str], context: int = 3, path: str | None = None
+    ) -> None:
+        """
+        Build the model straight from two versions of a file, without going
+        through a textual unified diff.
+        """
+        old_lines = [line.rstrip() for line in old_lines]
+        new_lines = [line.rstrip() for line in new_lines]
+        matcher = SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+        groups = list(matcher.get_grouped_opcodes(context))
+
+        self._start_render([
+            (old_lines[i1:i2], new_lines[j1:j2])
+            for group in groups for tag, i1, i2, j1, j2 in group if tag != "equal"
+        ])
+        if self._tracker:
+            self._tracker.start_file(path)
+        first_lines = new_lines or old_lines
+        self._file_colorizer = self.colorizer.for_file(path, first_lines[0] if first_lines else None)
+
+        for group in groups:
+            self._hunks.append((len(self._parsed_lines), group[0][1] + 1, group[0][3] + 1, path))
+            for n, (tag, i1, i2, j1, j2) in enumerate(group):
+                if tag == "equal":
+                    self._add_context(old_lines[i1:i2], i1 + 1, j1 + 1, n > 0, n < len(group) - 1)
+                else:
+                    processed_lines, _ = self._process_changes(
+                        old_lines[i1:i2], new_lines[j1:j2], (i1 + 1, j1 + 1)
+                    )
+                    self._parsed_lines.extend(processed_lines)
+        self._finish_render()
+
+    @classmethod
+    def compare(
+        cls,
+        old_lines: list[str],
+        new_lines: list[str],
+        colorizer: CharColorizer,
+        context: int = 3,
+        budget: RenderBudget | None = None,
+        path: str | None = None,
+        detect_moves: bool = True,
+        hide_whitespace: bool = False,
+        repeated_hunks: Literal["reuse", "collapse", "expand"] = "reuse",
+        layout: Literal["split", "unified", "auto"] = "split",
+        fold_context: int | None = None,
+        inline_granularity: Literal["token", "char", "chunk", "auto"] = "token",
+    ) -> "Diff2Latex":
+        instance = cls(
+            colorizer=colorizer,
+            budget=budget,
+            detect_moves=detect_moves,
+            hide_whitespace=hide_whitespace,
+            repeated_hunks=repeated_hunks,
+            layout=layout,
+            fold_context=fold_context,
+            inline_granularity=inline_granularity,
+        )
+        instance.parse_opcodes(old_lines, new_lines, context, path)
+        return instance
+
+    def add_banner(self, banner: Banner) -> None:
+        """Add a row that belongs to no hunk, e.g. the header of a file."""
+        self._between.add(len(self._parsed_lines))
+        self._parsed_lines.append(banner)
+
+    def extend(self, other: "Diff2Latex") -> None:
+        """
+        Append the rows of another model, e.g. of the next file of a tree
+        comparison. Hunks repeated across both are then emitted according to
+        repeated_hunks, like the repeated hunks of a single diff, and the
+        other model's budget report is added to this one's.
+        """
+        offset = len(self._parsed_lines)
+        self._parsed_lines.extend(other._parsed_lines)
+        self._hunks.extend(
+            (start + offset, old_start, new_start, path) for start, old_start, new_start, path in other._hunks
+        )
+        self._folded.update((row + offset, count) for row, count in other._folded.items())
+        self._between.update(row + offset for row in other._between)
+        if other._tracker is not None:
+            if self._tracker is None:
+                self._tracker = BudgetTracker(budget=self.budget or other._tracker.budget)
+            report, other_report = self._tracker.report, other._tracker.report
+            report.degradations.extend(other_report.degradations)
+            report.deadline_hit = report.deadline_hit or other_report.deadline_hit
+            report.elapsed += other_report.elapsed
+
+    def _line_rows(
+        self, start: int, end: int, unified: bool, html: bool = False, relative_to: tuple[int, int] | None = None
+    ) -> Iterator[tuple[str, int]]:
+        """
+        The table rows of _parsed_lines[start:end], each with the index of
+        the parsed line it comes from. With relative_to (the old and new
+        start of a hunk) line numbers are relative to the #1 and #2 of its
+        \\dhdef macro.
+        """
+        columns = 3 if unified else 4
+        # Unified layout: a run of changes shows its removed lines first
+        removed: list[tuple[str, int]] = []
+        added: list[tuple[str, int]] = []
+        for row in range(start, end):
+            line = self._parsed_lines[row]
+            if isinstance(line, Banner) or (unified and line.is_context):
+                yield from removed
+                yield from added
+                removed, added = [], []
+            if isinstance(line, Banner):
+                yield line.to_html(columns) if html else line.to_latex(columns), row
+                continue
+            old_nr = new_nr = None
+            if relative_to is not None:
+                old_cell, new_cell = line.content
+                if old_cell.line_nr:
+                    old_nr = f"\\the\\numexpr#1+{old_cell.line_nr - relative_to[0]}\\relax"
+                if new_cell.line_nr:
+                    new_nr = f"\\the\\numexpr#2+{new_cell.line_nr - relative_to[1]}\\relax"
+            if not unified:
+                yield line.to_html() if html else line.to_latex(old_nr, new_nr), row
+                continue
+            old_rows, new_rows = line.to_unified(old_nr, new_nr, html)
+            if line.is_context:
+                yield new_rows[0], row
+            else:
+                removed.extend((text, row) for text in old_rows)
+                added.extend((text, row) for text in new_rows)
+        yield from removed
+        yield from added
+
+    @staticmethod
+    def _absolute_rows(rows: str, old_start: int, new_start: int) -> str:
+        starts = {"1": old_start, "2": new_start}
+        return _RELATIVE_NR.sub(lambda m: str(starts[m.group(1)] + int(m.group(2))), rows)
+
+    def restyled(self, style_name: str) -> "Diff2Latex":
+        """
+        A copy of the parsed diff highlighted with another Pygments style.
+
+        Parsing, inline diffs and lexing are reused; only the colors are
+        applied again, so rendering one diff in several styles costs little
+        more than rendering it once. The copy shares nothing mutable with
+        this instance.
+        """
+        restyled = self.model_copy(update={"colorizer": self.colorizer.model_copy(update={"style_name": style_name})})
+        restyled._parsed_lines = [
+            line if isinstance(line, Banner) else line.restyle(style_name) for line in self._parsed_lines
+        ]
+        restyled._hunks = list(self._hunks)
+        restyled._between = set(self._between)
+        return restyled
+
     def to_latex(self) -> str:
+        """
+        Convert the parsed diff to LaTeX table rows.
+
+        Hunks that occur more than once, e.g. the same header change in many
+        files, are handled according to repeated_hunks. With 'reuse' the
+        first copy defines a macro with \\dhdef and every copy is typeset by
+        \\dhuse with its own starting line numbers.
+        """
+        return "\n".join(self.iter_rows())
+
+    def to_html(self) -> str:
+        """
+        Convert the parsed diff to HTML table rows with the same layout and
+        colors as to_latex(), for previews that need no TeX run. Repeated
+        hunks are written out in full unless repeated_hunks is 'collapse'.
+        """
+        return "\n".join(self.iter_rows(html=True))
+
+    def iter_rows(self, html: bool = False) -> Iterator[str]:
+        """
+        The rows of to_latex() (or to_html()) one chunk at a time, for
+        streaming them to a file without joining them first.
+
+        Raises:
+            ValueError: If nothing was parsed (raised here, not on iteration)
+        """
         if not self._parsed_lines:
             raise ValueError("No lines to convert to LaTeX.")
+        return (chunk for chunk, _ in self._rows(html))
+
+    def iter_sourced_rows(self, html: bool = False) -> Iterator[tuple[str, list[RowSource | None]]]:
+        """
+        Like iter_rows(), with the diff location of every line of each chunk
+        (None for rows that belong to no diff line, such as macro
+        definitions). A reused hunk is located at its first row.
+
+        Raises:
+            ValueError: If nothing was parsed (raised here, not on iteration)
+        """
+        if not self._parsed_lines:
+            raise ValueError("No lines to convert to LaTeX.")
+        starts = [hunk[0] for hunk in self._hunks]
+        numbers = self._hunk_numbers()
+
+        def source(row: int | None) -> RowSource | None:
+            if row is None or row in self._between:
+                return None
+            line = self._parsed_lines[row]
+            old_line, new_line = (None, None) if isinstance(line, Banner) else (c.line_nr for c in line.content)
+            k = bisect.bisect_right(starts, row) - 1
+            if k < 0:
+                return RowSource(old_line=old_line, new_line=new_line)
+            return RowSource(path=self._hunks[k][3], hunk=numbers[k], old_line=old_line, new_line=new_line)
+
+        return ((chunk, [source(row) for row in rows]) for chunk, rows in self._rows(html))
+
+    def _hunk_numbers(self) -> list[int]:
+        """Number of every hunk within its file, counted from 1 like build --hunks."""
+        numbers: list[int] = []
+        for k, (*_, path) in enumerate(self._hunks):
+            numbers.append(numbers[-1] + 1 if k and self._hunks[k - 1][3] == path else 1)
+        return numbers
+
+    def hunk_summaries(self) -> list[HunkSummary]:
+        """
+        Line ranges and counts of added, removed and changed lines of every
+        hunk, read off the parsed model without looking at the diff again.
+        """
+        ends = self._hunk_ends()
+        summaries = []
+        for (start, old_start, new_start, path), end, number in zip(self._hunks, ends, self._hunk_numbers()):
+            summary = HunkSummary(path=path, number=number, old_start=old_start, new_start=new_start)
+            for row in range(start, end):
+                line = self._parsed_lines[row]
+                if isinstance(line, Banner):
+                    summary.old_lines += self._folded.get(row, 0)
+                    summary.new_lines += self._folded.get(row, 0)
+                    continue
+                old_cell, new_cell = line.content
+                summary.old_lines += bool(old_cell.line_nr)
+                summary.new_lines += bool(new_cell.line_nr)
+                if line.is_context:
+                    continue
+                if old_cell.line_nr and new_cell.line_nr:
+                    summary.changed += 1
+                elif old_cell.line_nr:
+                    summary.removed += 1
+                elif new_cell.line_nr:
+                    summary.added += 1
+            summaries.append(summary)
+        return summaries
+
+    def _rows(self, html: bool = False) -> Iterator[tuple[str, list[int | None]]]:
+        """Chunks of rows, each with the index in _parsed_lines of every line it has."""
+        unified = self.table_layout == "unified"
+
+        def render(start: int, end: int) -> tuple[str, list[int | None]]:
+            rows = list(self._line_rows(start, end, unified, html))
+            return "\n".join(text for text, _ in rows), [row for _, row in rows]
+
+        # Reused hunks look exactly like expanded ones, HTML has no macros
+        if self.repeated_hunks == "expand" or len(self._hunks) < 2 or (html and self.repeated_hunks == "reuse"):
+            for text, row in self._line_rows(0, len(self._parsed_lines), unified, html):
+                yield text, [row]
+            return
+
+        ends = self._hunk_ends()
+        relative_rows = [
+            list(self._line_rows(start, end, unified, relative_to=(old_start, new_start)))
+            for (start, old_start, new_start, _), end in zip(self._hunks, ends)
+        ]
+        bodies = ["\n".join(text for text, _ in rows) for rows in relative_rows]
+        counts = Counter(bodies)
+        paths: dict[str, list[str]] = {}
+        for body, (*_, path) in zip(bodies, self._hunks):
+            paths.setdefault(body, []).append(path or "?")
+
+        seen: set[str] = set()
+        # End of the last hunk; rows up to the next one belong to no hunk
+        last_end = 0
+        for body, hunk_rows, (start, old_start, new_start, _), end in zip(bodies, relative_rows, self._hunks, ends):
+            for text, row in self._line_rows(last_end, start, unified, html):
+                yield text, [row]
+            last_end = end
+            if start == end:
+                continue
+            rows: list[int | None] = [row for _, row in hunk_rows]
+            if counts[body] == 1:
+                yield render(start, end) if html else (self._absolute_rows(body, old_start, new_start), rows)
+            elif self.repeated_hunks == "collapse":
+                if body not in seen:
+                    others = paths[body][1:]
+                    names = list(dict.fromkeys(others))
+                    shown = ", ".join(names[:_MAX_REPEAT_NAMES]) + (", …" if len(names) > _MAX_REPEAT_NAMES else "")
+                    banner = Banner(text=f"Same change {len(others)} more time(s) in {shown}", bold=False)
+                    if html:
+                        yield render(start, end)
+                        yield banner.to_html(3 if unified else 4), [None]
+                    else:
+                        yield self._absolute_rows(body, old_start, new_start), rows
+                        yield banner.to_latex(3 if unified else 4), [None]
+            else:
+                key = hashlib.sha1(body.encode("utf-8")).hexdigest()[:12]
+                if body not in seen:
+                    # TeX reports errors in the body where \dhuse expands it
+                    yield f"\\dhdef{{{key}}}{{{body}}}", [None] * len(rows)
+                yield f"\\dhuse{{{key}}}{{{old_start}}}{{{new_start}}}", [start]
+            seen.add(body)
+        for text, row in self._line_rows(last_end, len(self._parsed_lines), unified, html):
+            yield text, [row]
 
-        return "\n".join(line.to_latex() for line in self._parsed_lines)
+    def _hunk_ends(self) -> list[int]:
+        """
+        The row after the last one of every hunk: the first row of the next
+        hunk, or the first row before it that belongs to no hunk.
+        """
+        between = sorted(self._between)
+        nexts = [hunk[0] for hunk in self._hunks[1:]] + [len(self._parsed_lines)]
+        ends = []
+        for (start, *_), end in zip(self._hunks, nexts):
+            k = bisect.bisect_left(between, start)
+            ends.append(between[k] if k < len(between) and between[k] < end else end)
+        return ends
@@ -1,5 +1,8 @@
 from .code import CodeBlock
 from .cell import Cell
 from .line import Line
+from .banner import Banner
+from .source import RowSource
+from .summary import HunkSummary
 
-__all__ = ["CodeBlock", "Cell", "Line"]
\ No newline at end of file
+__all__ = ["CodeBlock", "Cell", "Line", "Banner", "RowSource", "HunkSummary"]
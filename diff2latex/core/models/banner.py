@@ -0,0 +1,31 @@
+from pydantic import BaseModel, Field
+from html import escape
+from .code import CodeBlock
+
+
+class Banner(BaseModel):
+    """
+    A full-width row in the diff table, used for file headers and notes.
+    """
+
+    text: str = Field(..., description="The text shown in the row.")
+    bold: bool = Field(default=True, description="Whether the text is set in bold.")
+
+    def to_latex(self, columns: int = 4) -> str:
+        """
+        Convert the banner to a LaTeX row spanning the whole table of the
+        given number of columns (3 in the unified layout).
+        """
+        text = CodeBlock(content=self.text).to_latex()
+        if self.bold:
+            text = f"\\textbf{{{text}}}"
+        return f"\\multicolumn{{{columns}}}{{l}}{{{text}}} \\\\"
+
+    def to_html(self, columns: int = 4) -> str:
+        """
+        Convert the banner to an HTML row spanning the whole table.
+        """
+        text = escape(self.text, quote=False)
+        if self.bold:
+            text = f"<b>{text}</b>"
+        return f'<tr><td colspan="{columns}" class="banner">{text}</td></tr>'
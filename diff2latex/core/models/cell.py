@@ -1,6 +1,8 @@
 from pydantic import BaseModel, Field, PrivateAttr
+from pygments.token import _TokenType
 from . import CodeBlock
 from ..utils import ColorMap
+from ..utils.colorizer import apply_style
 
 
 class Cell(BaseModel):
@@ -12,6 +14,8 @@ class Cell(BaseModel):
     line_nr: int | None = Field(..., description="Line number in the diff.")
     bg_color: str | None = Field(default=None, description="Color of the cell, if applicable.")
     _colormap: ColorMap | None = PrivateAttr(default=None)
+    # Lexed runs of the whole cell, kept so it can be restyled without lexing
+    _tokens: list[tuple[_TokenType, str]] | None = PrivateAttr(default=None)
 
     def attach_colormap(self, colormap: ColorMap | None) -> "Cell":
         """
@@ -44,12 +48,29 @@ class Cell(BaseModel):
         c._colormap = colormap
         return c
 
-    def to_latex(self) -> str:
+    def attach_tokens(self, tokens: list[tuple[_TokenType, str]] | None, style_name: str | None) -> "Cell":
+        """
+        Colorize the cell from lexed runs (see CharColorizer.get_tokens())
+        and remember them for restyle().
+        """
+        if tokens is None or not style_name:
+            return self
+        c = self.attach_colormap(apply_style(tokens, style_name))
+        c._tokens = tokens
+        return c
+
+    def restyle(self, style_name: str) -> "Cell":
+        """The same cell colored with another style, without lexing again."""
+        return self.attach_tokens(self._tokens, style_name)
+
+    def to_latex(self, line_nr: str | None = None) -> str:
         """
         Convert the cell content to LaTeX format.
+
+        line_nr replaces the printed line number, e.g. with a TeX expression.
         """
 
-        line_nr_str = self.line_nr if bool(self.line_nr) else " "
+        line_nr_str = line_nr if line_nr is not None else self.line_nr if bool(self.line_nr) else " "
 
         if self.bg_color:
             return (
@@ -60,6 +81,35 @@ class Cell(BaseModel):
             f"{code.to_latex()}" for code in self.content
         )
 
+    def to_html(self, line_nr: str | None = None) -> str:
+        """
+        Convert the cell to two HTML table cells, line number and code.
+        """
+        line_nr_str = line_nr if line_nr is not None else self.line_nr if bool(self.line_nr) else ""
+        bg = f" {self.bg_color}" if self.bg_color else ""
+        code = "".join(code.to_html() for code in self.content)
+        return f'<td class="nr{bg}">{line_nr_str}</td><td class="code{bg}">{code}</td>'
+
+    def to_unified_latex(self, old_nr: str, new_nr: str) -> str:
+        """
+        Convert the cell to a row of the unified layout: both line number
+        columns and one code column.
+        """
+        color = f"\\cellcolor{{{self.bg_color}}}" if self.bg_color else ""
+        code = "".join(code.to_latex() for code in self.content)
+        return f"{color}\\linenr{{{old_nr}}} & {color}\\linenr{{{new_nr}}} & {color}{code} \\\\"
+
+    def to_unified_html(self, old_nr: str, new_nr: str) -> str:
+        """
+        Convert the cell to an HTML row of the unified layout.
+        """
+        bg = f" {self.bg_color}" if self.bg_color else ""
+        code = "".join(code.to_html() for code in self.content)
+        return (
+            f'<tr><td class="nr{bg}">{old_nr}</td><td class="nr{bg}">{new_nr}</td>'
+            f'<td class="code{bg}">{code}</td></tr>'
+        )
+
     def add_code_block(self, code_block: CodeBlock) -> None:
         """
         Add a code block to the cell.
@@ -1,8 +1,32 @@
 from pydantic import BaseModel, Field
+from html import escape
 from itertools import groupby
 from operator import itemgetter
 from ..utils import ColorMap
 
+# Translation table for str.translate(): one pass, built once and only ever
+# read, so it is shared freely between threads. The backslash keeps the
+# escaped space it used to pick up from the old chain of replace() calls.
+_LATEX_ESCAPES = str.maketrans({
+    "\\": "\\textbackslash\\ ",
+    "%": "\\%",
+    "$": "\\$",
+    "&": "\\&",
+    " ": "\\ ",
+    "_": "\\_",
+    "{": "\\{",
+    "}": "\\}",
+    "#": "\\#",
+    "~": "\\~",
+    "^": "\\^",
+    "<": "\\textless{}",
+    ">": "\\textgreater{}",
+    "|": "\\textbar{}",
+    "\"": "\\textquotedbl{}",
+    "\'": "\\textquotesingle{}",
+    "`": "\\textasciigrave{}",
+})
+
 
 class CodeBlock(BaseModel):
     """
@@ -19,25 +43,7 @@ class CodeBlock(BaseModel):
 
     def _sanitize(self, s: str) -> str:
         """Sanitize string for LaTeX."""
-        return (
-            s.replace("\\", "\\textbackslash ")
-            .replace("%", "\\%")
-            .replace("$", "\\$")
-            .replace("&", "\\&")
-            .replace(" ", "\\ ")
-            .replace("_", "\\_")
-            .replace("{", "\\{")
-            .replace("}", "\\}")
-            .replace("#", "\\#")
-            .replace("~", "\\~")
-            .replace("^", "\\^")
-            .replace("<", "\\textless{}")
-            .replace(">", "\\textgreater{}")
-            .replace("|", "\\textbar{}")
-            .replace("\"", "\\textquotedbl{}")
-            .replace("\'", "\\textquotesingle{}")
-            .replace("`", "\\textasciigrave{}")
-        )
+        return s.translate(_LATEX_ESCAPES)
 
     def to_latex(self) -> str:
         """
@@ -62,3 +68,17 @@ class CodeBlock(BaseModel):
         if self.bg_color:
             return f"\\boxx{{{'000000'}}}{{{self.bg_color}}}{{{self._sanitize(self.content)}}}"
         return f"\\code{{{'000000'}}}{{{self._sanitize(self.content)}}}"
+
+    def to_html(self) -> str:
+        """
+        Convert the code block to HTML: one colored span per run, inside a
+        span classed with the box color (see diff2latex.preview).
+        """
+        if self.colormap:
+            text = "".join(
+                f'<span style="color:#{color}">{escape("".join(char for char, _ in group), quote=False)}</span>'
+                for color, group in groupby(self.colormap.root, key=itemgetter(1))
+            )
+        else:
+            text = escape(self.content, quote=False)
+        return f'<span class="{self.bg_color}">{text}</span>' if self.bg_color else text
@@ -12,9 +12,55 @@ class Line(BaseModel):
         description="The content of the line, consisting of two cells: old and new.",
     )
 
-    def to_latex(self) -> str:
+    @property
+    def is_context(self) -> bool:
+        """Whether the line is shown as unchanged on both sides."""
+        old_cell, new_cell = self.content
+        return bool(old_cell.line_nr and new_cell.line_nr) and old_cell.bg_color is None and new_cell.bg_color is None
+
+    def restyle(self, style_name: str) -> "Line":
+        """The same line colored with another style, see Cell.restyle()."""
+        old_cell, new_cell = self.content
+        return Line(content=(old_cell.restyle(style_name), new_cell.restyle(style_name)))
+
+    def to_latex(self, old_nr: str | None = None, new_nr: str | None = None) -> str:
         """
         Convert the line to its LaTeX representation.
+
+        old_nr and new_nr replace the printed line numbers, see Cell.to_latex().
+        """
+        old_cell, new_cell = self.content
+        return f"{old_cell.to_latex(old_nr)} & {new_cell.to_latex(new_nr)} \\\\"
+
+    def to_html(self) -> str:
+        """
+        Convert the line to an HTML table row.
+        """
+        old_cell, new_cell = self.content
+        return f"<tr>{old_cell.to_html()}{new_cell.to_html()}</tr>"
+
+    def to_unified(
+        self, old_nr: str | None = None, new_nr: str | None = None, html: bool = False
+    ) -> tuple[list[str], list[str]]:
+        """
+        Convert the line to rows of the unified layout.
+
+        An unchanged line is a single row showing both line numbers. A
+        changed line gives a row for its old side and one for its new side,
+        returned apart so a run of changes can show all removed lines before
+        all added ones.
+
+        Returns:
+            The removed rows and the added (or unchanged) rows
         """
         old_cell, new_cell = self.content
-        return f"{old_cell.to_latex()} & {new_cell.to_latex()} \\\\"
+        blank = "" if html else " "
+        old_nr = old_nr if old_nr is not None else str(old_cell.line_nr) if old_cell.line_nr else blank
+        new_nr = new_nr if new_nr is not None else str(new_cell.line_nr) if new_cell.line_nr else blank
+        to_row = Cell.to_unified_html if html else Cell.to_unified_latex
+        if self.is_context:
+            # Whitespace-only changes shown as unchanged keep the new text
+            return [], [to_row(new_cell, old_nr, new_nr)]
+        removed = [to_row(old_cell, old_nr, blank)] if old_cell.line_nr else []
+        added = [to_row(new_cell, blank, new_nr)] if new_cell.line_nr else []
+        return removed, added
@@ -0,0 +1,23 @@
+from pydantic import BaseModel, Field
+
+
+class RowSource(BaseModel):
+    """
+    Where a row of the table comes from in the diff, so errors found while
+    compiling the document can be reported against the diff.
+    """
+
+    path: str | None = Field(default=None, description="File the row belongs to, if known.")
+    hunk: int | None = Field(default=None, description="Hunk number within the file, counted from 1.")
+    old_line: int | None = Field(default=None, description="Line number on the old side, if any.")
+    new_line: int | None = Field(default=None, description="Line number on the new side, if any.")
+
+    def __str__(self) -> str:
+        parts = [self.path or "<diff>"]
+        if self.hunk is not None:
+            parts.append(f"hunk {self.hunk}")
+        if self.old_line is not None:
+            parts.append(f"old line {self.old_line}")
+        if self.new_line is not None:
+            parts.append(f"new line {self.new_line}")
+        return ", ".join(parts)
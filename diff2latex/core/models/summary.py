@@ -0,0 +1,17 @@
+from pydantic import BaseModel, Field
+
+
+class HunkSummary(BaseModel):
+    """
+    Line ranges and change counts of one hunk, taken from the parsed model.
+    """
+
+    path: str | None = Field(default=None, description="File the hunk belongs to, if known.")
+    number: int = Field(..., description="Hunk number within the file, counted from 1.")
+    old_start: int = Field(..., description="First line on the old side.")
+    old_lines: int = Field(default=0, description="Lines the hunk spans on the old side, folded ones included.")
+    new_start: int = Field(..., description="First line on the new side.")
+    new_lines: int = Field(default=0, description="Lines the hunk spans on the new side, folded ones included.")
+    added: int = Field(default=0, description="Added lines without a removed partner.")
+    removed: int = Field(default=0, description="Removed lines without an added partner.")
+    changed: int = Field(default=0, description="Removed lines shown next to the added line that replaced them.")
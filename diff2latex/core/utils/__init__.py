@@ -1,4 +1,24 @@
 from .colorizer import CharColorizer
 from .colormap import ColorMap
+from .highlighters import Highlighter, register_highlighter
+from .lexers import LexerIndex, find_lexer_name
+from .budget import BudgetReport, Degradation, RenderBudget
+from .moves import MovedLines, detect_moves
+from .patch import PatchFile, parse_hunk_header, split_files
 
-__all__ = ["CharColorizer", "ColorMap"]
\ No newline at end of file
+__all__ = [
+    "CharColorizer",
+    "ColorMap",
+    "Highlighter",
+    "register_highlighter",
+    "LexerIndex",
+    "find_lexer_name",
+    "RenderBudget",
+    "BudgetReport",
+    "Degradation",
+    "MovedLines",
+    "detect_moves",
+    "PatchFile",
+    "parse_hunk_header",
+    "split_files",
+]
\ No newline at end of file
@@ -0,0 +1,155 @@
+from pydantic import BaseModel, Field, PrivateAttr
+import time
+
+TRUNCATION_MARKER = " [… {} more characters]"
+
+
+class RenderBudget(BaseModel):
+    """
+    Limits that keep pathological inputs from blowing up render time.
+
+    When a limit is hit the renderer steps down gracefully: first the inline
+    diff is skipped, then syntax highlighting, and finally the line is
+    truncated with a marker. Every limit is optional.
+    """
+
+    deadline: float | None = Field(
+        default=None, description="Seconds after which all remaining lines are rendered plainly."
+    )
+    max_inline_chars: int | None = Field(
+        default=None, description="Longest line (in characters) that still gets an inline diff."
+    )
+    max_line_tokens: int | None = Field(
+        default=None, description="Most tokens a line may have to still get an inline diff."
+    )
+    max_highlight_chars: int | None = Field(
+        default=None, description="Longest line (in characters) that is still syntax highlighted."
+    )
+    max_line_chars: int | None = Field(
+        default=None, description="Lines longer than this are truncated with a marker."
+    )
+    max_file_chars: int | None = Field(
+        default=None, description="Characters per file after which its remaining lines are rendered plainly."
+    )
+    max_file_tokens: int | None = Field(
+        default=None, description="Tokens per file after which its remaining lines are rendered plainly."
+    )
+
+
+class Degradation(BaseModel):
+    """
+    A single step down taken because a budget limit was hit.
+    """
+
+    file: str | None = Field(default=None, description="File the line belongs to, if known.")
+    line: int | None = Field(default=None, description="Number of the affected line on its own side of the diff.")
+    side: str | None = Field(default=None, description="'old' or 'new' for changed lines, None for context lines.")
+    action: str = Field(..., description="One of 'no_inline', 'no_highlight' or 'truncated'.")
+    reason: str = Field(..., description="Name of the limit that was hit.")
+    value: float = Field(..., description="Measured value that exceeded the limit.")
+    limit: float = Field(..., description="The configured limit.")
+
+
+class BudgetReport(BaseModel):
+    """
+    Machine-readable account of everything that was degraded and why.
+
+    File-wide and deadline degradations are reported once, at the line where
+    they kicked in; they apply to every later line of that file (or render).
+    """
+
+    degradations: list[Degradation] = Field(default_factory=list)
+    deadline_hit: bool = Field(default=False, description="Whether the global deadline expired.")
+    elapsed: float = Field(default=0.0, description="Seconds spent building the model.")
+
+
+class BudgetTracker(BaseModel):
+    """
+    Keeps the running counters for a RenderBudget while a diff is parsed.
+    """
+
+    budget: RenderBudget = Field(default_factory=RenderBudget)
+    report: BudgetReport = Field(default_factory=BudgetReport)
+    _start: float = PrivateAttr(default_factory=time.perf_counter)
+    _file: str | None = PrivateAttr(default=None)
+    _file_chars: int = PrivateAttr(default=0)
+    _file_tokens: int = PrivateAttr(default=0)
+    _file_exhausted: bool = PrivateAttr(default=False)
+
+    def start_file(self, path: str | None) -> None:
+        self._file = path
+        self._file_chars = 0
+        self._file_tokens = 0
+        self._file_exhausted = False
+
+    def finish(self) -> BudgetReport:
+        self.report.elapsed = time.perf_counter() - self._start
+        return self.report
+
+    def _record(
+        self, line: int | None, side: str | None, action: str, reason: str, value: float, limit: float
+    ) -> None:
+        self.report.degradations.append(
+            Degradation(file=self._file, line=line, side=side, action=action, reason=reason, value=value, limit=limit)
+        )
+
+    def _plain_from_now(self, line: int | None, side: str | None) -> bool:
+        """Whether file-wide or global limits force plain rendering."""
+        b = self.budget
+        if self.report.deadline_hit:
+            return True
+        if b.deadline is not None:
+            elapsed = time.perf_counter() - self._start
+            if elapsed > b.deadline:
+                self.report.deadline_hit = True
+                self._record(line, side, "no_highlight", "deadline", round(elapsed, 3), b.deadline)
+                return True
+        if self._file_exhausted:
+            return True
+        for reason, value, limit in (
+            ("max_file_chars", self._file_chars, b.max_file_chars),
+            ("max_file_tokens", self._file_tokens, b.max_file_tokens),
+        ):
+            if limit is not None and value > limit:
+                self._file_exhausted = True
+                self._record(line, side, "no_highlight", reason, value, limit)
+                return True
+        return False
+
+    def plan(
+        self, text: str, token_count: int | None, line: int | None, side: str | None = None
+    ) -> tuple[str, bool, bool]:
+        """
+        Decide how to render one line.
+
+        Returns:
+            (text, highlight, inline): the possibly truncated text and whether
+            highlighting and an inline diff are still allowed
+        """
+        b = self.budget
+        length = len(text)
+        self._file_chars += length
+        if token_count is not None:
+            self._file_tokens += token_count
+
+        highlight = inline = not self._plain_from_now(line, side)
+
+        if inline and b.max_inline_chars is not None and length > b.max_inline_chars:
+            inline = False
+            self._record(line, side, "no_inline", "max_inline_chars", length, b.max_inline_chars)
+        if inline and b.max_line_tokens is not None and token_count is not None and token_count > b.max_line_tokens:
+            inline = False
+            self._record(line, side, "no_inline", "max_line_tokens", token_count, b.max_line_tokens)
+        if highlight and b.max_highlight_chars is not None and length > b.max_highlight_chars:
+            highlight = inline = False
+            self._record(line, side, "no_highlight", "max_highlight_chars", length, b.max_highlight_chars)
+        if b.max_line_chars is not None and length > b.max_line_chars:
+            inline = False
+            text = text[:b.max_line_chars] + TRUNCATION_MARKER.format(length - b.max_line_chars)
+            self._record(line, side, "truncated", "max_line_chars", length, b.max_line_chars)
+
+        return text, highlight, inline
+
+    @property
+    def needs_tokens(self) -> bool:
+        return self.budget.max_line_tokens is not None or self.budget.max_file_tokens is not None
@@ -1,33 +1,96 @@
 # pyright:basic
 # ^ cuz pygments have not type hinted their shit and my ide is crying
-from pydantic import BaseModel, Field
-from pygments import lex
-from pygments.lexers import PythonLexer, CppLexer, JavaLexer, HaskellLexer
-from pygments.styles import get_style_by_name  
+from functools import lru_cache
+from itertools import repeat
+from pydantic import BaseModel, ConfigDict, Field
+import os
+from pygments.styles import get_style_by_name
+from pygments.token import _TokenType
 from .colormap import ColorMap
+from .highlighters import Highlighter, get_highlighter
+from .lexers import find_lexer_name, get_lexer
+
+DEFAULT_LEXER = "CppLexer"
+FALLBACK_LEXER = "TextLexer"
+
+# C sources and headers have always been highlighted as C++
+_EXTENSION_LEXERS = {
+    ".c": "CppLexer",
+    ".h": "CppLexer",
+}
+
+
+@lru_cache(maxsize=None)
+def _lexer_name(ext: str | None, filename: str | None = None, shebang: str | None = None) -> str:
+    if ext:
+        filename = "file" + (ext if ext.startswith(".") else "." + ext)
+    elif not filename and not shebang:
+        return DEFAULT_LEXER
+    suffix = os.path.splitext(filename or "")[1].lower()
+    if suffix in _EXTENSION_LEXERS:
+        return _EXTENSION_LEXERS[suffix]
+    return find_lexer_name(filename, shebang) or FALLBACK_LEXER
+
+
+@lru_cache(maxsize=None)
+def _style_colors(style_name: str) -> dict:
+    style = get_style_by_name(style_name)
+    return CharColorizer._get_token_colors(style)
+
+
+def apply_style(tokens: list[tuple[_TokenType, str]], style_name: str) -> ColorMap:
+    """
+    Color lexed runs with a Pygments style. This is the cheap half of
+    highlighting: the runs from CharColorizer.get_tokens() can be colored
+    with any number of styles without lexing the code again.
+    """
+    token_colors = _style_colors(style_name)
+    char_colors = []
+    for ttype, value in tokens:
+        color = token_colors.get(ttype) or CharColorizer._resolve_color(ttype, token_colors)
+        char_colors.extend(zip(value, repeat(color)))
+    # Built from known-good tuples, validating every character is wasted work
+    return ColorMap.model_construct(root=char_colors)
 
 
 class CharColorizer(BaseModel):
+    """
+    Colors each character of a line of code by its syntax token.
+
+    Colorizers are immutable and may be shared by any number of threads;
+    styles, lexers and highlighters are cached process-wide.
+    """
+
+    model_config = ConfigDict(frozen=True)
+
     style_name: str | None = Field(description="Pygments style to use for coloring.")
     ext: str | None = Field(default=None, description="File extension to determine lexer.")
+    filename: str | None = Field(
+        default=None, description="File name (or path) to determine the lexer when no ext is given."
+    )
+    shebang: str | None = Field(
+        default=None, description="First line of the file, used when the file name is not recognised."
+    )
+    highlighter: str = Field(
+        default="pygments",
+        description="Highlighting backend: 'pygments', 'auto' (fast built-in where available) or 'regex'.",
+    )
 
     def _get_lexer(self):
-        if not self.ext:
-            return CppLexer() # default
-            
-        ext_map = {
-            '.py': PythonLexer(),
-            '.cpp': CppLexer(),
-            '.c': CppLexer(),
-            '.cc': CppLexer(),
-            '.cxx': CppLexer(),
-            '.h': CppLexer(),
-            '.hpp': CppLexer(),
-            '.java': JavaLexer(),
-            '.hs': HaskellLexer(), 
-        }
-        
-        return ext_map.get(self.ext.lower(), PythonLexer())
+        return get_lexer(_lexer_name(self.ext, self.filename, self.shebang))
+
+    def _get_highlighter(self) -> Highlighter:
+        return get_highlighter(self.highlighter, self._get_lexer())
+
+    def for_file(self, path: str | None, first_line: str | None = None) -> "CharColorizer":
+        """
+        Return a colorizer whose lexer is picked from the file name, or the
+        shebang in first_line. An explicit ext always wins.
+        """
+        if self.ext or not self.style_name or (path is None and first_line is None):
+            return self
+        shebang = first_line if first_line and first_line.startswith("#!") else None
+        return self.model_copy(update={"filename": path, "shebang": shebang})
 
     def _get_style(self):
         if not self.style_name:
@@ -36,8 +99,10 @@ class CharColorizer(BaseModel):
 
     @staticmethod
     def _get_token_colors(style):
+        # style_for_token resolves inheritance, so e.g. Comment.Single gets
+        # Comment's color instead of falling back to black
         return {
-            token: f"{style.styles[token]}" if style.styles[token] else "#000000"
+            token: style.style_for_token(token)["color"] or "000000"
             for token in style.styles
         }
 
@@ -45,18 +110,17 @@ class CharColorizer(BaseModel):
     def _resolve_color(ttype, token_colors):
         while ttype not in token_colors:
             ttype = ttype.parent
-        return token_colors.get(ttype, "#000000")
+        return token_colors.get(ttype, "000000")
 
-    def get_colormap(self, code: str) -> "ColorMap | None":
-        style = self._get_style()
-        if style is None:
+    def get_tokens(self, code: str) -> list[tuple[_TokenType, str]] | None:
+        """
+        Lex a line into (token type, text) runs, independent of the style.
+        None when highlighting is off.
+        """
+        if not self.style_name:
             return None
-        token_colors = self._get_token_colors(style)
-        char_colors = []
-        lexer = self._get_lexer()
-        for ttype, value in lex(code, lexer):
-            color = self._resolve_color(ttype, token_colors)
-            for char in value:
-                if char != '\n':
-                    char_colors.append((char, color[color.find('#'):].strip("#"))) # Temp solution to remove the text attibutes
-        return ColorMap(root=char_colors)
+        return [(ttype, value.replace("\n", "")) for ttype, value in self._get_highlighter().tokens(code)]
+
+    def get_colormap(self, code: str) -> "ColorMap | None":
+        tokens = self.get_tokens(code)
+        return apply_style(tokens, self.style_name) if tokens is not None and self.style_name else None
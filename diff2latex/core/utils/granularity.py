@@ -0,0 +1,197 @@
+"""
+Granularity of the inline diff between a removed line and its replacement.
+
+A line pair can be compared character by character, token by token (words,
+runs of whitespace and single punctuation) or chunk by chunk (runs of
+non-whitespace with the whitespace after them). Characters give the most
+precise highlight on short lines, but SequenceMatcher is quadratic in the
+worst case, so on long lines they are far too slow; chunks keep very long
+lines cheap.
+
+The adaptive mode skips pairs that an upper bound on their similarity
+shows to be unrelated, strips the common prefix and suffix, picks the
+granularity from the length of what is left, and then only refines the
+regions that changed, one level finer at a time. A pair that changed in
+many places is not refined, so it costs little more than a single pass.
+"""
+from typing import Callable, Literal, Optional
+from collections import Counter
+from difflib import SequenceMatcher
+import re
+
+Granularity = Literal["char", "token", "chunk"]
+
+# (is equal, old text, new text) of one piece of a line pair
+Segment = tuple[bool, str, str]
+
+_TOKEN_RE = re.compile(r"\s+|\w+|[^\w\s]")
+# Whitespace goes with the chunk before it: as elements of their own, the
+# ever repeating spaces would dominate the matcher's work
+_CHUNK_RE = re.compile(r"\S+\s*|\s+")
+_WORD_CHAR = re.compile(r"\w+")
+_WORD_END = re.compile(r"\w+$")
+
+SPLITTERS: dict[Granularity, Callable[[str], list[str]]] = {
+    "char": list,
+    "token": _TOKEN_RE.findall,
+    "chunk": _CHUNK_RE.findall,
+}
+
+# Pairs up to this many characters are compared by character
+CHAR_MAX_CHARS = 48
+# Pairs from this many characters on are compared by chunk
+CHUNK_MIN_CHARS = 200
+# Changed regions up to this many characters are refined one level finer
+REFINE_MAX_CHARS: dict[Granularity, int] = {"chunk": 200, "token": 32}
+# Comparisons with more changed regions than this are not refined: every
+# refinement is a matcher run of its own, and a line changed all over reads
+# no better for a finer highlight
+REFINE_MAX_REGIONS = 8
+# Pairs whose similarity cannot reach this are shown as replaced outright
+MIN_SIMILARITY = 0.4
+# Characters an unchanged run needs between two changes to be shown as such
+MIN_EQUAL_CHARS = 3
+
+_FINER: dict[Granularity, Granularity] = {"chunk": "token", "token": "char"}
+
+
+def pick_granularity(old_line: str, new_line: str) -> Granularity:
+    """The granularity the adaptive mode compares a line pair at."""
+    length = max(len(old_line), len(new_line))
+    if length <= CHAR_MAX_CHARS:
+        return "char"
+    if length >= CHUNK_MIN_CHARS:
+        return "chunk"
+    return "token"
+
+
+def _absorb_short_equals(segments: list[Segment], edges: bool = False) -> list[Segment]:
+    """
+    Fold unchanged runs too short to read into the changes around them, so
+    a character diff of two unrelated words is not a confetti of matches.
+    With edges, runs at either end go too, as they do inside a changed region.
+    """
+    result: list[Segment] = []
+    for n, (equal, old_part, new_part) in enumerate(segments):
+        between_changes = edges or 0 < n < len(segments) - 1
+        if equal and between_changes and len(old_part) < MIN_EQUAL_CHARS:
+            equal = False
+        if result and not equal and not result[-1][0]:
+            _, old_prev, new_prev = result.pop()
+            old_part, new_part = old_prev + old_part, new_prev + new_part
+        result.append((equal, old_part, new_part))
+    return result
+
+
+def quick_similarity(old_line: str, new_line: str) -> float:
+    """
+    Characters the two lines have in common, regardless of order, as a
+    share of both lengths: an upper bound on SequenceMatcher.ratio() that
+    costs one linear pass.
+    """
+    if not old_line and not new_line:
+        return 1.0
+    common = sum((Counter(old_line) & Counter(new_line)).values())
+    return 2 * common / (len(old_line) + len(new_line))
+
+
+def _common_affixes(old: str, new: str) -> tuple[int, int]:
+    """
+    Lengths of the common prefix and, of the rest, the common suffix, both
+    ending at word boundaries so a changed word is compared as a whole.
+    """
+    limit = min(len(old), len(new))
+    prefix = 0
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    if _WORD_CHAR.match(old, prefix) or _WORD_CHAR.match(new, prefix):
+        word = _WORD_END.search(old, 0, prefix)
+        prefix = word.start() if word else prefix
+    suffix = 0
+    while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+    if suffix and (
+        _WORD_CHAR.match(old, len(old) - suffix - 1, len(old) - suffix)
+        or _WORD_CHAR.match(new, len(new) - suffix - 1, len(new) - suffix)
+    ):
+        word = _WORD_CHAR.match(old, len(old) - suffix)
+        suffix -= word.end() - word.start() if word else 0
+    return prefix, suffix
+
+
+def _refined(old: str, new: str, granularity: Optional[Granularity] = None) -> list[Segment]:
+    """
+    Compare what is left of a pair after its common prefix and suffix, at
+    the given granularity or the one the length of the rest calls for.
+    """
+    prefix, suffix = _common_affixes(old, new)
+    old_rest, new_rest = old[prefix:len(old) - suffix], new[prefix:len(new) - suffix]
+    segments: list[Segment] = []
+    if prefix:
+        segments.append((True, old[:prefix], new[:prefix]))
+    if old_rest and new_rest:
+        segments.extend(diff_segments(
+            old_rest, new_rest, granularity or pick_granularity(old_rest, new_rest), refine=True
+        ))
+    elif old_rest or new_rest:
+        segments.append((False, old_rest, new_rest))
+    if suffix:
+        segments.append((True, old[len(old) - suffix:], new[len(new) - suffix:]))
+    return segments
+
+
+def diff_segments(old_line: str, new_line: str, granularity: Granularity, refine: bool = False) -> list[Segment]:
+    """
+    Compare a line pair at a fixed granularity.
+
+    Args:
+        old_line: The removed line
+        new_line: The line that replaces it
+        granularity: 'char', 'token' or 'chunk'
+        refine: Compare small replaced regions again, one level finer,
+            after stripping what they have in common at either end, unless
+            there are more than REFINE_MAX_REGIONS changed regions
+
+    Returns:
+        The pieces of the pair in order; concatenating the old (new) texts
+        gives the old (new) line back
+    """
+    old_parts = SPLITTERS[granularity](old_line)
+    new_parts = SPLITTERS[granularity](new_line)
+    opcodes = SequenceMatcher(None, old_parts, new_parts).get_opcodes()
+    if refine and sum(tag != "equal" for tag, *_ in opcodes) > REFINE_MAX_REGIONS:
+        refine = False
+    segments: list[Segment] = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        old_part = "".join(old_parts[i1:i2])
+        new_part = "".join(new_parts[j1:j2])
+        if tag == "equal":
+            segments.append((True, old_part, new_part))
+        elif (
+            refine and tag == "replace" and granularity in _FINER
+            and max(len(old_part), len(new_part)) <= REFINE_MAX_CHARS[granularity]
+        ):
+            segments.extend(_refined(old_part, new_part, _FINER[granularity]))
+        else:
+            segments.append((False, old_part, new_part))
+    if granularity == "char":
+        segments = _absorb_short_equals(segments, edges=refine)
+    return segments
+
+
+def adaptive_segments(old_line: str, new_line: str) -> list[Segment]:
+    """
+    Compare a line pair at the granularity its length calls for, refining
+    changed regions only.
+    """
+    # A low upper bound proves the lines share too little to be worth matching
+    # up; short lines are cheaper to just compare
+    long_line = max(len(old_line), len(new_line)) > CHAR_MAX_CHARS
+    if long_line and quick_similarity(old_line, new_line) < MIN_SIMILARITY:
+        return [(False, old_line, new_line)]
+    segments = _absorb_short_equals(_refined(old_line, new_line))
+    # The same bar for what the matcher actually kept unchanged
+    kept = sum(len(old_part) for equal, old_part, _ in segments if equal)
+    if 2 * kept < MIN_SIMILARITY * (len(old_line) + len(new_line)):
+        return [(False, old_line, new_line)]
+    return segments
@@ -0,0 +1,583 @@
+# pyright:basic
+"""
+Pluggable syntax highlighting backends for CharColorizer.
+
+A highlighter turns a line of code into runs of (token type, text). Token
+types are Pygments' own, so every backend is colored by the same Pygments
+styles. Besides the Pygments backend, which is the default, there is a fast
+built-in regex backend for the most common languages, using one precompiled
+combined pattern per language that follows the Pygments lexer's rules.
+
+Highlighters are shared by every thread of a process, so they must not keep
+per-call state on the instance; both built-in backends are stateless.
+"""
+from typing import Callable, Iterable, Iterator, Protocol
+import keyword
+import re
+import threading
+from pygments import lex
+from pygments.lexer import Lexer
+from pygments.token import (
+    Comment,
+    Keyword,
+    Name,
+    Number,
+    Operator,
+    Punctuation,
+    String,
+    Text,
+    _TokenType,
+)
+
+
+class Highlighter(Protocol):
+    def tokens(self, code: str) -> Iterable[tuple[_TokenType, str]]:
+        """Split a line of code into (token type, text) runs."""
+        ...
+
+
+class PygmentsHighlighter:
+    """Highlight with a Pygments lexer. Works for every language."""
+
+    def __init__(self, lexer: Lexer) -> None:
+        self.lexer = lexer
+
+    def tokens(self, code: str) -> Iterable[tuple[_TokenType, str]]:
+        return lex(code, self.lexer)
+
+
+# A rule's token type, or a function splitting its match into typed runs.
+# The function gets the highlighter, so it can lex code embedded in the match.
+RuleAction = _TokenType | Callable[["RegexHighlighter", str], Iterable[tuple[_TokenType, str]]]
+
+
+class RegexHighlighter:
+    """
+    Highlight with a single precompiled regex of named alternatives.
+
+    Identifiers are matched by one generic group and classified with dict
+    lookups afterwards, which is much cheaper than listing every keyword in
+    the pattern. Rules whose match has parts of different types (strings
+    with escapes, import statements) split it with a function of their own.
+    """
+
+    def __init__(
+        self,
+        rules: list[tuple[str, str, RuleAction]],
+        keywords: dict[str, _TokenType],
+        definers: dict[str, _TokenType] | None = None,
+        flags: int = 0,
+        whitespace: _TokenType = Text,
+        declarations: bool = False,
+    ) -> None:
+        self._actions = {name: action for name, _, action in rules}
+        # With declarations, an identifier followed by "(" after a type or
+        # another name is taken to be a function name, as in C and Java
+        call = r"(?P<call>[^\W\d]\w*(?=\s*\())|" if declarations else ""
+        self._pattern = re.compile(
+            "|".join(f"(?P<{name}>{pattern})" for name, pattern, _ in rules)
+            + f"|{call}"
+            + r"(?P<ident>[^\W\d]\w*)|(?P<ws>\s+)|(?P<other>.)",
+            flags | re.DOTALL,
+        )
+        self._keywords = keywords
+        self._definers = definers or {}
+        self._whitespace = whitespace
+
+    def tokens(self, code: str) -> Iterator[tuple[_TokenType, str]]:
+        actions = self._actions
+        keywords = self._keywords
+        definers = self._definers
+        whitespace = self._whitespace
+        pending_def: _TokenType | None = None
+        previous: _TokenType | None = None
+        previous_value = ""
+
+        for match in self._pattern.finditer(code):
+            group = match.lastgroup
+            value = match.group()
+            if group == "ws":
+                # As Pygments does, the space after "def" or "class" is whitespace
+                yield (Text.Whitespace if pending_def is not None else whitespace), value
+                previous_value = value
+                continue
+
+            if group == "ident" or group == "call":
+                known = keywords.get(value)
+                if pending_def is not None:
+                    # A name that has a type of its own, like a magic method
+                    ttype = known if known is not None and known in pending_def else pending_def
+                    pending_def = None
+                else:
+                    pending_def = definers.get(value)
+                    ttype = Name if known is None else known
+                    if group == "call" and ttype is Name and previous in (Keyword.Type, Name):
+                        ttype = Name.Function
+                    elif previous_value == "." and (ttype in Name.Builtin or ttype is Name.Exception):
+                        # An attribute, not the builtin of the same name
+                        ttype = Name
+            else:
+                pending_def = None
+                action = Text if group == "other" else actions[group]
+                if not isinstance(action, _TokenType):
+                    for ttype, part in action(self, value):
+                        previous = ttype
+                        yield ttype, part
+                    previous_value = value
+                    continue
+                ttype = action
+            previous = ttype
+            previous_value = value
+            yield ttype, value
+
+
+def _grouped_rule(name: str, pattern: str, *types: _TokenType) -> tuple[str, str, RuleAction]:
+    """A rule giving each group of its pattern its own token type."""
+    regex = re.compile(pattern, re.DOTALL)
+
+    def split(highlighter: RegexHighlighter, text: str) -> Iterator[tuple[_TokenType, str]]:
+        match = regex.match(text)
+        assert match is not None, "rule matched text its own pattern does not"
+        for ttype, part in zip(types, match.groups()):
+            if part:
+                yield ttype, part
+
+    return name, pattern, split
+
+
+_NUMBER = r"\b(?:0[xX][0-9a-fA-F_']+|0[bB][01_']+|(?:\d[\d_']*)?\.?\d[\d_']*(?:[eE][+-]?\d+)?)[a-zA-Z]*\b"
+# A backslash ending the line continues a string on the next one
+_DQ_STRING = r'"(?:\\.|\\$|[^"\\])*"?'
+_SQ_STRING = r"'(?:\\.|\\$|[^'\\])*'?"
+
+# Escape sequences, and the %- and {}-format fields Pygments marks in strings
+_BYTES_ESCAPE = r"""\\(?:[\\abfnrtv"'\n]|$|x[a-fA-F0-9]{2}|[0-7]{1,3})"""
+_STR_ESCAPE = r"\\(?:N\{.*?\}|u[a-fA-F0-9]{4}|U[a-fA-F0-9]{8})|" + _BYTES_ESCAPE
+_FORMAT_FIELD = (
+    r"%(?:\(\w+\))?[-#0 +]*(?:[0-9]+|[*])?(?:\.(?:[0-9]+|[*]))?[hlL]?[E-GXc-giorsaux%]"
+    r"|\{(?:\w+(?:\.\w+|\[[^\]]+\])*)?(?:![sra])?"
+    r"(?::(?:.?[<>=^])?[-+ ]?#?0?(?:\d+)?,?(?:\.\d+)?[E-GXb-gnosx%]?)?\}"
+)
+
+
+def _string_body(escape: str | None, fstring: bool) -> re.Pattern[str]:
+    """The pattern splitting the inside of a Python string into typed parts."""
+    if fstring:
+        escapes = r"\{\{|\}\}" + (f"|{escape}" if escape else "")
+        parts = [f"(?P<escape>{escapes})", r"(?P<open>\{)", r"(?P<close>\})"]
+    else:
+        parts = ([f"(?P<escape>{escape})"] if escape else []) + [f"(?P<field>{_FORMAT_FIELD})"]
+    return re.compile("|".join(parts + [r"(?P<text>[^\\%{}]+|.)"]), re.DOTALL)
+
+
+def _string_escape(raw: bool, is_bytes: bool, quote: str) -> str | None:
+    """The escapes Pygments marks in a string; in raw ones, a backslash before a backslash or the quote."""
+    if not raw:
+        return _BYTES_ESCAPE if is_bytes else _STR_ESCAPE
+    return None if len(quote) == 3 else rf"\\\\|\\{quote}|\\\n|\\$"
+
+
+# (raw, bytes, f-string, quote) -> pattern of the inside of such a string
+_STRING_BODIES = {
+    (raw, is_bytes, fstring, quote): _string_body(_string_escape(raw, is_bytes, quote), fstring)
+    for raw in (False, True) for is_bytes in (False, True) for fstring in (False, True)
+    for quote in ('"', "'", '"""', "'''")
+}
+_STRING_PARTS = {"escape": String.Escape, "field": String.Interpol, "close": String.Interpol}
+# What ends the expression of an f-string field: its conversion and the ":"
+# before a format spec, or the closing brace
+_FIELD_TAIL = re.compile(r"(?:![sraf])?[:}]")
+
+
+def _field_end(text: str, start: int) -> int:
+    """Where the expression of an f-string field starting at start ends."""
+    depth = 0
+    i = start
+    while i < len(text):
+        char = text[i]
+        if char in "'\"":
+            closing = text.find(char, i + 1)
+            i = len(text) if closing < 0 else closing
+        elif char in "([{":
+            depth += 1
+        elif char in ")]}":
+            if not depth:
+                return i
+            depth -= 1
+        elif not depth and (char == ":" or char == "!" and text[i + 1:i + 2] != "="):
+            return i
+        i += 1
+    return i
+
+
+def _python_string(highlighter: RegexHighlighter, text: str) -> Iterator[tuple[_TokenType, str]]:
+    """Split a Python string literal into prefix, quotes, escapes and fields."""
+    prefix = text[:len(text) - len(text.lstrip("rRbBuUfF"))]
+    rest = text[len(prefix):]
+    quote = rest[:3] if rest[:3] in ('"""', "'''") else rest[:1]
+    ttype = String.Double if quote[0] == '"' else String.Single
+    closed = len(rest) >= 2 * len(quote) and rest.endswith(quote)
+    body = rest[len(quote):len(rest) - len(quote) if closed else len(rest)]
+    flags = prefix.lower()
+    pattern = _STRING_BODIES["r" in flags, "b" in flags, "f" in flags, quote]
+
+    if prefix:
+        yield String.Affix, prefix
+    yield ttype, quote
+    pos = 0
+    while pos < len(body):
+        match = pattern.match(body, pos)
+        assert match is not None, "string body patterns match any character"
+        pos = match.end()
+        if match.lastgroup != "open":
+            yield _STRING_PARTS.get(match.lastgroup or "", ttype), match.group()
+            continue
+        # The expression of an f-string field is code, and lexed as such
+        yield String.Interpol, "{"
+        end = _field_end(body, pos)
+        for code_type, code in highlighter.tokens(body[pos:end]):
+            yield (Text.Whitespace if code_type is Text and code.isspace() else code_type), code
+        tail = _FIELD_TAIL.match(body, end)
+        if tail:
+            yield String.Interpol, tail.group()
+        pos = tail.end() if tail else end
+    if closed:
+        yield ttype, quote
+
+
+def _python_import(highlighter: RegexHighlighter, text: str) -> Iterator[tuple[_TokenType, str]]:
+    """Split "import a.b as c, d" or "from a.b import" into Pygments' token types."""
+    for part in re.findall(r"\s+|\w+|.", text):
+        if part.isspace():
+            yield Text.Whitespace, part
+        elif part in ("import", "from"):
+            yield Keyword.Namespace, part
+        elif part == "as":
+            yield Keyword, part
+        elif part == "None":
+            # "raise error from None"
+            yield Keyword.Constant, part
+        else:
+            yield (Operator if part == "," else Name.Namespace), part
+
+
+_PYTHON_KEYWORDS = {
+    **dict.fromkeys(
+        "as assert async await break class continue def del elif else except finally for "
+        "global if lambda nonlocal pass raise return try while with yield".split(),
+        Keyword,
+    ),
+    **dict.fromkeys("True False None".split(), Keyword.Constant),
+    **dict.fromkeys("and in is not or".split(), Operator.Word),
+    **dict.fromkeys(
+        "__import__ abs aiter all any bin bool bytearray breakpoint bytes callable chr classmethod "
+        "compile complex delattr dict dir divmod enumerate eval filter float format frozenset "
+        "getattr globals hasattr hash hex id input int isinstance issubclass iter len list locals "
+        "map max memoryview min next object oct open ord pow print property range repr reversed "
+        "round set setattr slice sorted staticmethod str sum super tuple type vars zip".split(),
+        Name.Builtin,
+    ),
+    **dict.fromkeys("self cls Ellipsis NotImplemented".split(), Name.Builtin.Pseudo),
+    **dict.fromkeys(
+        "ArithmeticError AssertionError AttributeError BaseException BufferError BytesWarning "
+        "DeprecationWarning EOFError EnvironmentError Exception FloatingPointError FutureWarning "
+        "GeneratorExit IOError ImportError ImportWarning IndentationError IndexError KeyError "
+        "KeyboardInterrupt LookupError MemoryError NameError NotImplementedError OSError "
+        "OverflowError PendingDeprecationWarning ReferenceError ResourceWarning RuntimeError "
+        "RuntimeWarning StopIteration SyntaxError SyntaxWarning SystemError SystemExit TabError "
+        "TypeError UnboundLocalError UnicodeDecodeError UnicodeEncodeError UnicodeError "
+        "UnicodeTranslateError UnicodeWarning UserWarning ValueError VMSError Warning WindowsError "
+        "ZeroDivisionError BlockingIOError ChildProcessError ConnectionError BrokenPipeError "
+        "ConnectionAbortedError ConnectionRefusedError ConnectionResetError FileExistsError "
+        "FileNotFoundError InterruptedError IsADirectoryError NotADirectoryError PermissionError "
+        "ProcessLookupError TimeoutError StopAsyncIteration ModuleNotFoundError RecursionError "
+        "EncodingWarning".split(),
+        Name.Exception,
+    ),
+    **dict.fromkeys(
+        (
+            f"__{name}__" for name in (
+                "abs add aenter aexit aiter and anext await bool bytes call complex contains del "
+                "delattr delete delitem dir divmod enter eq exit float floordiv format ge get getattr "
+                "getattribute getitem gt hash iadd iand ifloordiv ilshift imatmul imod imul index init "
+                "instancecheck int invert ior ipow irshift isub iter itruediv ixor le len length_hint "
+                "lshift lt matmul missing mod mul ne neg new next or pos pow prepare radd rand rdivmod "
+                "repr reversed rfloordiv rlshift rmatmul rmod rmul ror round rpow rrshift rshift rsub "
+                "rtruediv rxor set setattr setitem str sub subclasscheck truediv xor"
+            ).split()
+        ),
+        Name.Function.Magic,
+    ),
+    **dict.fromkeys(
+        (
+            f"__{name}__" for name in (
+                "annotations bases class closure code defaults dict doc file func globals kwdefaults "
+                "module mro name objclass qualname self slots weakref"
+            ).split()
+        ),
+        Name.Variable.Magic,
+    ),
+}
+
+# "match" and "case" are keywords only where they start a statement, and so
+# is a "_" pattern after them
+_SOFT_KEYWORD = (
+    r"^([ \t]*)(match|case)\b(?![ \t]*(?:[:,;=^&|@~)\]}]|(?:"
+    + "|".join(word for word in keyword.kwlist if word[0].islower())
+    + r")\b))(?:(\s+)([^\n_]*)(_\b))?"
+)
+_SOFT_KEYWORD_PARTS = re.compile(_SOFT_KEYWORD)
+
+
+def _python_soft_keyword(highlighter: RegexHighlighter, text: str) -> Iterator[tuple[_TokenType, str]]:
+    """Split "case" or "match" and any "_" pattern after it."""
+    match = _SOFT_KEYWORD_PARTS.match(text)
+    assert match is not None, "rule matched text its own pattern does not"
+    indent, word, space, pattern, wildcard = match.groups()
+    if indent:
+        yield Text, indent
+    yield Keyword, word
+    if wildcard:
+        yield Text.Whitespace, space
+        yield from highlighter.tokens(pattern)
+        yield Keyword, wildcard
+
+
+_PYTHON_RULES: list[tuple[str, str, RuleAction]] = [
+    _grouped_rule(
+        "doc",
+        r'^(\s*)([rRuUbB]{0,2})("""(?:.|\n)*?"""|' + r"'''(?:.|\n)*?''')",
+        Text.Whitespace, String.Affix, String.Doc,
+    ),
+    ("softkeyword", _SOFT_KEYWORD, _python_soft_keyword),
+    ("hashbang", r"^#![^\n]*", Comment.Hashbang),
+    ("comment", r"#[^\n]*", Comment.Single),
+    ("yieldfrom", r"\byield from\b", Keyword),
+    # "import" and "from" are keywords only before whitespace
+    (
+        "import",
+        r"\bimport(?:\s+(?:(?!\d)[\w.]+(?:\s+as\s+\w+)?(?:\s*,\s*[\w.]+(?:\s+as\s+\w+)?)*)?|$)",
+        _python_import,
+    ),
+    ("fromimport", r"\bfrom(?:\s+(?:(?!\d)[\w.]+(?:\s+import\b)?)?|$)", _python_import),
+    (
+        "string",
+        r'[rRbBuUfF]{0,2}(?:"""(?:\\.|\\$|[^\\])*?(?:"""|$)|' + r"'''(?:\\.|\\$|[^\\])*?(?:'''|$)|"
+        + f"{_DQ_STRING}|{_SQ_STRING})",
+        _python_string,
+    ),
+    ("decorator", r"@[^\W\d]\w*", Name.Decorator),
+    # Only "def" or "class" before whitespace starts a definition
+    ("notdefiner", r"\b(?:def|class)\b(?!\s|$)", Name),
+    (
+        "float",
+        r"(?:\d(?:_?\d)*\.(?:\d(?:_?\d)*)?|(?:\d(?:_?\d)*)?\.\d(?:_?\d)*)(?:[eE][+-]?\d(?:_?\d)*)?"
+        r"|\d(?:_?\d)*[eE][+-]?\d(?:_?\d)*j?",
+        Number.Float,
+    ),
+    ("oct", r"0[oO](?:_?[0-7])+", Number.Oct),
+    ("bin", r"0[bB](?:_?[01])+", Number.Bin),
+    ("hex", r"0[xX](?:_?[a-fA-F0-9])+", Number.Hex),
+    ("integer", r"\d(?:_?\d)*", Number.Integer),
+    ("op", r"!=|==|<<|>>|:=|[-~+/*%=<>&^|.@]", Operator),
+    ("punct", r"[]{}:(),;[]", Punctuation),
+]
+
+_C_FAMILY_TYPES = (
+    "bool char double float int long short signed unsigned void size_t ssize_t "
+    "int8_t int16_t int32_t int64_t uint8_t uint16_t uint32_t uint64_t wchar_t"
+)
+
+_C_STRING_BODY = re.compile(
+    r"""(?P<escape>\\(?:[\\abfnrtv"']|x[a-fA-F0-9]{2,4}|u[a-fA-F0-9]{4}|U[a-fA-F0-9]{8}|[0-7]{1,3}))"""
+    r"|(?P<text>[^\\]+|.)",
+    re.DOTALL,
+)
+_C_RAW_STRING = re.compile(r'"([^\\()\s]{0,16})(\()(.*?)(\)\1)"', re.DOTALL)
+
+
+def _c_string(highlighter: RegexHighlighter, text: str) -> Iterator[tuple[_TokenType, str]]:
+    """Split a C or C++ string literal into prefix, escapes and the rest."""
+    prefix = text[:text.index('"')]
+    if prefix:
+        yield String.Affix, prefix
+    if prefix.endswith("R"):
+        # Raw strings have no escapes, but delimited parentheses
+        raw = _C_RAW_STRING.fullmatch(text, len(prefix))
+        if raw is None:
+            yield String, text[len(prefix):]
+            return
+        yield String, '"' + raw.group(1)
+        yield String.Delimiter, "("
+        if raw.group(3):
+            yield String, raw.group(3)
+        yield String.Delimiter, raw.group(4)
+        yield String, '"'
+        return
+    for match in _C_STRING_BODY.finditer(text, len(prefix)):
+        yield (String.Escape if match.lastgroup == "escape" else String), match.group()
+
+
+_CPP_KEYWORDS = {
+    **dict.fromkeys(
+        "alignas alignof asm auto break case catch class const constexpr consteval constinit const_cast "
+        "continue co_await co_return co_yield decltype default delete do dynamic_cast else enum "
+        "explicit export extern for friend goto if mutable namespace new noexcept nullptr operator "
+        "private protected public register reinterpret_cast requires return sizeof static "
+        "static_assert static_cast struct switch template this throw try typedef typeid typename "
+        "union using virtual volatile while concept override final".split(),
+        Keyword,
+    ),
+    **dict.fromkeys(_C_FAMILY_TYPES.split(), Keyword.Type),
+    "inline": Keyword.Reserved,
+    **dict.fromkeys("true false NULL".split(), Name.Builtin),
+}
+
+# As in Pygments, a sign directly before a number is part of it
+_C_DIGITS = r"\d(?:'?\d)*"
+_C_HEX_DIGITS = r"[0-9a-fA-F](?:'?[0-9a-fA-F])*"
+_C_INT_SUFFIX = r"(?:[uU][lL]{0,2}|[lL]{1,2}[uU]?)?"
+_C_NUMBER_RULES: list[tuple[str, str, RuleAction]] = [
+    (
+        "hexfloat",
+        rf"0[xX](?:{_C_HEX_DIGITS}\.{_C_HEX_DIGITS}|\.{_C_HEX_DIGITS}|{_C_HEX_DIGITS})[pP][+-]?{_C_HEX_DIGITS}[lL]?",
+        Number.Float,
+    ),
+    (
+        "float",
+        rf"-?(?:{_C_DIGITS}\.{_C_DIGITS}|\.{_C_DIGITS}|{_C_DIGITS})[eE][+-]?{_C_DIGITS}[fFlL]?"
+        rf"|-?(?:{_C_DIGITS}\.(?:{_C_DIGITS})?|\.{_C_DIGITS})[fFlL]?|{_C_DIGITS}[fFlL]",
+        Number.Float,
+    ),
+    ("hex", rf"-?0[xX]{_C_HEX_DIGITS}{_C_INT_SUFFIX}", Number.Hex),
+    ("bin", rf"-?0[bB][01](?:'?[01])*{_C_INT_SUFFIX}", Number.Bin),
+    ("oct", rf"-?0(?:'?[0-7])+{_C_INT_SUFFIX}", Number.Oct),
+    ("integer", rf"-?{_C_DIGITS}{_C_INT_SUFFIX}", Number.Integer),
+]
+
+_C_FAMILY_RULES: list[tuple[str, str, RuleAction]] = [
+    _grouped_rule("include", r"^(\s*)(#\s*include\b)", Text.Whitespace, Comment.Preproc),
+    ("includefile", r'(?<=include )(?:<[^>\n]*>|"[^"\n]*")', Comment.PreprocFile),
+    _grouped_rule("preproc", r"^(\s*)(#[^\n]*)", Text.Whitespace, Comment.Preproc),
+    _grouped_rule(
+        "label",
+        r"^([ \t]*)(?!(?:public|private|protected|default)\b)([^\W\d]\w*)(\s*)(:)(?!:)",
+        Text.Whitespace, Name.Label, Text.Whitespace, Punctuation,
+    ),
+    ("linecomment", r"//[^\n]*", Comment.Single),
+    ("blockcomment", r"/\*.*?(?:\*/|$)", Comment.Multiline),
+    ("dq", r'(?:u8|[uUL])?R?' + _DQ_STRING, _c_string),
+    _grouped_rule("sq", r"(u8|[uUL])?(" + _SQ_STRING + ")", String.Affix, String.Char),
+    *_C_NUMBER_RULES,
+    ("op", r"[-+*/%=<>!&|^~?:]+", Operator),
+    ("punct", r"[()\[\]{},.;]", Punctuation),
+]
+
+_JAVA_KEYWORDS = {
+    **dict.fromkeys(
+        "abstract assert break case catch class const continue default do else enum extends final "
+        "finally for goto if implements import instanceof interface native new package private "
+        "protected public return static strictfp super switch synchronized this throw throws "
+        "transient try var volatile while record yield sealed permits".split(),
+        Keyword,
+    ),
+    **dict.fromkeys("import package".split(), Keyword.Namespace),
+    **dict.fromkeys("boolean byte char double float int long short void".split(), Keyword.Type),
+    **dict.fromkeys("true false null".split(), Keyword.Constant),
+}
+
+_JAVA_RULES = [
+    ("linecomment", r"//[^\n]*", Comment.Single),
+    ("blockcomment", r"/\*.*?(?:\*/|$)", Comment.Multiline),
+    ("annotation", r"@[^\W\d][\w.]*", Name.Decorator),
+    ("dq", _DQ_STRING, String),
+    ("sq", _SQ_STRING, String.Char),
+    ("number", _NUMBER, Number),
+    ("op", r"[-+*/%=<>!&|^~?\[\]]+", Operator),
+    ("punct", r"[(){},.;:]", Punctuation),
+]
+
+# Pygments lexer alias -> factory of the matching fast highlighter
+_REGEX_LANGUAGES: dict[str, Callable[[], RegexHighlighter]] = {
+    "python": lambda: RegexHighlighter(
+        _PYTHON_RULES, _PYTHON_KEYWORDS, {"def": Name.Function, "class": Name.Class}
+    ),
+    "cpp": lambda: RegexHighlighter(
+        _C_FAMILY_RULES, _CPP_KEYWORDS,
+        {
+            "class": Name.Class, "struct": Name.Class, "union": Name.Class, "typename": Name.Class,
+            "concept": Name.Class, "namespace": Name.Namespace,
+        },
+        re.MULTILINE, Text.Whitespace, declarations=True,
+    ),
+    "c": lambda: RegexHighlighter(
+        _C_FAMILY_RULES, _CPP_KEYWORDS, {"struct": Name.Class, "union": Name.Class},
+        re.MULTILINE, Text.Whitespace, declarations=True,
+    ),
+    "java": lambda: RegexHighlighter(
+        _JAVA_RULES, _JAVA_KEYWORDS, {"class": Name.Class, "interface": Name.Class, "enum": Name.Class},
+        whitespace=Text.Whitespace, declarations=True,
+    ),
+}
+
+
+def _regex_backend(lexer: Lexer) -> Highlighter | None:
+    alias = lexer.aliases[0] if lexer.aliases else None
+    if alias not in _REGEX_LANGUAGES:
+        return None
+    return _REGEX_LANGUAGES[alias]()
+
+
+# Backend name -> factory returning a highlighter for a lexer, or None if the
+# backend does not support that language (Pygments is used instead)
+HIGHLIGHTERS: dict[str, Callable[[Lexer], Highlighter | None]] = {
+    "pygments": PygmentsHighlighter,
+    "regex": _regex_backend,
+}
+
+# (backend name, lexer) -> highlighter. Read without locking; misses and
+# registrations take the lock so every thread ends up with one instance.
+_instances: dict[tuple[str, Lexer], Highlighter] = {}
+_lock = threading.Lock()
+
+
+def register_highlighter(name: str, factory: Callable[[Lexer], Highlighter | None]) -> None:
+    """
+    Register a highlighting backend selectable by name on CharColorizer.
+
+    The factory receives the Pygments lexer chosen for the file and returns a
+    highlighter, or None to fall back to Pygments. Highlighters are shared
+    across threads and must be safe to call concurrently.
+    """
+    global HIGHLIGHTERS, _instances
+    with _lock:
+        # Swap in new dicts rather than mutating, so lock-free readers never
+        # see a registry and an instance cache that disagree
+        HIGHLIGHTERS = {**HIGHLIGHTERS, name: factory}
+        _instances = {}
+
+
+def get_highlighter(name: str, lexer: Lexer) -> Highlighter:
+    """
+    Resolve a backend name to a highlighter for the given lexer.
+
+    ``auto`` prefers the fast regex backend and falls back to Pygments.
+    Highlighters are created once per backend and lexer and then shared.
+
+    Raises:
+        ValueError: If no backend of that name is registered
+    """
+    key = (name, lexer)
+    highlighter = _instances.get(key)
+    if highlighter is not None:
+        return highlighter
+
+    with _lock:
+        highlighter = _instances.get(key)
+        if highlighter is None:
+            backend = "regex" if name == "auto" else name
+            if backend not in HIGHLIGHTERS:
+                raise ValueError(f"Unknown highlighter '{name}', choose from: auto, {', '.join(HIGHLIGHTERS)}")
+            highlighter = HIGHLIGHTERS[backend](lexer) or PygmentsHighlighter(lexer)
+            _instances[key] = highlighter
+        return highlighter
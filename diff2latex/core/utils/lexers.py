@@ -0,0 +1,237 @@
+# pyright:basic
+"""
+Lexer resolution for every Pygments language, by file name and shebang.
+
+Pygments' own get_lexer_for_filename() walks the filename globs of all
+lexers on every call. Here the globs are compiled once into an index of
+exact names, extensions and the few remaining true globs, so a lookup is a
+handful of dict hits. Ambiguities are settled the way Pygments does it,
+by lexer priority with a bonus for exact names.
+
+Building the index imports every lexer module to read its priority. Set
+``DIFF2LATEX_CACHE_DIR`` to persist the index there, keyed by the Pygments
+version and installed lexer plugins, so later processes skip that work.
+
+Everything here is safe to call from many threads: the index and lexer
+instances are built once under a lock and only read afterwards.
+"""
+from functools import lru_cache
+from fnmatch import fnmatchcase
+from importlib import import_module, metadata
+from pydantic import BaseModel, Field
+from pygments.lexer import Lexer
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+
+import pygments
+from pygments.lexers import LEXERS
+from pygments.plugin import find_plugin_lexers
+
+CACHE_DIR_ENV = "DIFF2LATEX_CACHE_DIR"
+
+# Interpreters seen in shebangs that are not a lexer alias themselves
+_INTERPRETERS = {
+    "node": "javascript",
+    "nodejs": "javascript",
+    "deno": "typescript",
+    "python2": "python2",
+    "pypy": "python",
+    "pypy3": "python",
+    "runghc": "haskell",
+    "runhaskell": "haskell",
+    "escript": "erlang",
+}
+
+_GLOB_CHARS = re.compile(r"[*?\[]")
+
+
+class LexerIndex(BaseModel):
+    """
+    Precomputed lookup tables from file names to Pygments lexer classes.
+
+    Candidates are stored as (lexer class name, rating) pairs, where the
+    rating is the lexer priority plus 0.5 for an exact (non-glob) pattern.
+    """
+
+    pygments: str = Field(..., description="Pygments version the index was built from.")
+    plugins: list[str] = Field(default_factory=list, description="Lexer plugin entry points included.")
+    modules: dict[str, str] = Field(default_factory=dict, description="Lexer class name -> module.")
+    names: dict[str, list[tuple[str, float]]] = Field(
+        default_factory=dict, description="Exact file names such as 'Makefile'."
+    )
+    extensions: dict[str, list[tuple[str, float]]] = Field(
+        default_factory=dict, description="Suffixes such as '.py' or '.d.ts'."
+    )
+    globs: list[tuple[str, str, float]] = Field(
+        default_factory=list, description="Remaining patterns as (glob, lexer, rating)."
+    )
+    aliases: dict[str, str] = Field(default_factory=dict, description="Lexer alias -> lexer class name.")
+
+    @classmethod
+    def build(cls) -> "LexerIndex":
+        """Build the index from the installed Pygments and its plugins."""
+        index = cls(pygments=pygments.__version__, plugins=_plugin_names())
+        lexers = [
+            (getattr(import_module(module), name), module)
+            for name, (module, *_rest) in LEXERS.items()
+        ]
+        lexers += [(plugin, plugin.__module__) for plugin in find_plugin_lexers()]
+
+        for lexer, module in lexers:
+            name = lexer.__name__
+            index.modules[name] = module
+            for alias in lexer.aliases:
+                index.aliases.setdefault(alias, name)
+            for pattern in lexer.filenames:
+                bonus = 0.5 if "*" not in pattern else 0
+                rating = lexer.priority + bonus
+                if not _GLOB_CHARS.search(pattern):
+                    index.names.setdefault(pattern, []).append((name, rating))
+                elif pattern.startswith("*.") and not _GLOB_CHARS.search(pattern[1:]):
+                    index.extensions.setdefault(pattern[1:], []).append((name, rating))
+                else:
+                    index.globs.append((pattern, name, rating))
+        return index
+
+    def find(self, filename: str) -> str | None:
+        """
+        Return the name of the best lexer class for a file name, or None.
+        """
+        base = os.path.basename(filename)
+        candidates = list(self.names.get(base, ()))
+        # Every dotted suffix, so both '.d.ts' and '.ts' are considered
+        for pos, char in enumerate(base):
+            if char == ".":
+                candidates.extend(self.extensions.get(base[pos:], ()))
+        for pattern, name, rating in self.globs:
+            if fnmatchcase(base, pattern):
+                candidates.append((name, rating))
+        if not candidates:
+            return None
+        # Same ordering as Pygments: highest rating, then class name
+        return max(candidates, key=lambda candidate: (candidate[1], candidate[0]))[0]
+
+    def find_interpreter(self, first_line: str) -> str | None:
+        """
+        Return the lexer class for a ``#!`` line, or None.
+
+        Handles ``/usr/bin/env`` (with options) and versioned interpreters
+        such as ``python3.12``.
+        """
+        if not first_line.startswith("#!"):
+            return None
+        words = first_line[2:].split()
+        if words and os.path.basename(words[0]) == "env":
+            words = [word for word in words[1:] if not word.startswith("-") and "=" not in word]
+        if not words:
+            return None
+        interpreter = os.path.basename(words[0])
+        for candidate in (interpreter, re.sub(r"[\d.]+$", "", interpreter)):
+            alias = _INTERPRETERS.get(candidate, candidate)
+            if alias in self.aliases:
+                return self.aliases[alias]
+        return None
+
+
+def _plugin_names() -> list[str]:
+    return sorted(entry.value for entry in metadata.entry_points(group="pygments.lexers"))
+
+
+def _cache_path(cache_dir: str) -> str:
+    fingerprint = hashlib.sha1("\n".join(_plugin_names()).encode("utf-8")).hexdigest()[:8]
+    return os.path.join(cache_dir, f"lexer-index-{pygments.__version__}-{fingerprint}.json")
+
+
+def save_lexer_index(index: LexerIndex, path: str) -> None:
+    """Write the index to ``path`` atomically."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(index.model_dump(), f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def load_lexer_index(cache_dir: str | None = None) -> LexerIndex:
+    """
+    Load the index from the cache directory, building (and saving) it if
+    needed. Without a cache directory the index is simply built.
+
+    Args:
+        cache_dir: Directory for the persisted index, defaults to
+            ``$DIFF2LATEX_CACHE_DIR``
+
+    Returns:
+        The lexer index
+    """
+    cache_dir = cache_dir or os.environ.get(CACHE_DIR_ENV)
+    if not cache_dir:
+        return LexerIndex.build()
+
+    path = _cache_path(cache_dir)
+    try:
+        with open(path, "r") as f:
+            index = LexerIndex.model_validate(json.load(f))
+        if index.pygments == pygments.__version__:
+            return index
+    except (OSError, ValueError):
+        pass
+
+    index = LexerIndex.build()
+    try:
+        save_lexer_index(index, path)
+    except OSError:
+        pass  # the cache is an optimisation, an unwritable directory is fine
+    return index
+
+
+_index: LexerIndex | None = None
+_lexers: dict[str, Lexer] = {}
+_lock = threading.Lock()
+
+
+def get_lexer_index() -> LexerIndex:
+    """The process-wide lexer index, loaded on first use."""
+    global _index
+    if _index is None:
+        with _lock:
+            if _index is None:
+                _index = load_lexer_index()
+    return _index
+
+
+@lru_cache(maxsize=4096)
+def find_lexer_name(filename: str | None = None, first_line: str | None = None) -> str | None:
+    """
+    Resolve a file name, falling back to its shebang line, to the name of a
+    Pygments lexer class. Returns None if neither is recognised.
+    """
+    index = get_lexer_index()
+    if filename:
+        name = index.find(filename)
+        if name is None and filename != filename.lower():
+            name = index.find(filename.lower())
+        if name is not None:
+            return name
+    if first_line:
+        return index.find_interpreter(first_line)
+    return None
+
+
+def get_lexer(name: str) -> Lexer:
+    """Return the shared lexer instance for a lexer class name."""
+    lexer = _lexers.get(name)
+    if lexer is None:
+        module = get_lexer_index().modules.get(name, "pygments.lexers")
+        with _lock:
+            lexer = _lexers.get(name)
+            if lexer is None:
+                lexer = _lexers[name] = getattr(import_module(module), name)()
+    return lexer
@@ -0,0 +1,103 @@
+"""
+Detection of moved blocks across a whole diff.
+
+Deleted and added lines are hashed by their whitespace-normalized text, so a
+block that was moved (and possibly re-indented) is found with dict lookups
+instead of comparing every pair of lines. A run of deleted lines that
+reappears as a run of added lines somewhere else is a moved block.
+"""
+from pydantic import BaseModel, Field
+
+# A moved block needs at least this many non-whitespace characters, so lone
+# braces and blank lines are not reported as moves (git uses the same bar)
+MIN_MOVED_CHARS = 20
+
+# Most places a single line is tried as the start of a block. Keeps the pass
+# linear when the same line occurs many times.
+MAX_MOVE_CANDIDATES = 16
+
+
+def normalize_whitespace(line: str) -> str:
+    """The line with all whitespace removed, equal for re-indented lines."""
+    return "".join(line.split())
+
+
+class MovedLines(BaseModel):
+    """
+    Which changed lines belong to a moved block.
+
+    Lines are numbered by their position among all deleted (``old``) or
+    added (``new``) lines of the diff, in order of appearance.
+    """
+
+    old: set[int] = Field(default_factory=set, description="Indices of deleted lines that were moved.")
+    new: set[int] = Field(default_factory=set, description="Indices of added lines they were moved to.")
+
+
+def detect_moves(groups: list[tuple[list[str], list[str]]], min_chars: int = MIN_MOVED_CHARS) -> MovedLines:
+    """
+    Find moved blocks in a diff given as groups of (deletions, additions).
+
+    A deleted line is never matched with the added line it is already
+    paired with in its own group; that is a whitespace-only change, not a
+    move.
+
+    Args:
+        groups: Consecutive deleted and added lines, one entry per change
+        min_chars: Non-whitespace characters a block needs to count as moved
+
+    Returns:
+        The moved lines on both sides
+    """
+    old_keys: list[str] = []
+    new_keys: list[str] = []
+    # Global index of the added line each deletion is paired with, or -1
+    partners: list[int] = []
+    # Added lines are only chained within their own group
+    new_group: list[int] = []
+    for group_nr, (deletions, additions) in enumerate(groups):
+        new_start = len(new_keys)
+        for offset, line in enumerate(deletions):
+            old_keys.append(normalize_whitespace(line))
+            partners.append(new_start + offset if offset < len(additions) else -1)
+        for line in additions:
+            new_keys.append(normalize_whitespace(line))
+            new_group.append(group_nr)
+
+    positions: dict[str, list[int]] = {}
+    for index, key in enumerate(new_keys):
+        if key:
+            occurrences = positions.setdefault(key, [])
+            if len(occurrences) < MAX_MOVE_CANDIDATES:
+                occurrences.append(index)
+
+    moved = MovedLines()
+    old_start = 0
+    for deletions, _ in groups:
+        old_end = old_start + len(deletions)
+        i = old_start
+        while i < old_end:
+            # Blocks matching line i somewhere other than at its partner
+            starts = [pos for pos in positions.get(old_keys[i], ()) if pos != partners[i]]
+            best_length = 0
+            best_start = -1
+            for start in starts:
+                length = 1
+                while (
+                    i + length < old_end
+                    and start + length < len(new_keys)
+                    and new_group[start + length] == new_group[start]
+                    and new_keys[start + length] == old_keys[i + length]
+                    and start + length != partners[i + length]
+                ):
+                    length += 1
+                if length > best_length:
+                    best_length, best_start = length, start
+            if best_length and sum(len(key) for key in old_keys[i:i + best_length]) >= min_chars:
+                moved.old.update(range(i, i + best_length))
+                moved.new.update(range(best_start, best_start + best_length))
+                i += best_length
+            else:
+                i += 1
+        old_start = old_end
+    return moved
@@ -0,0 +1,107 @@
+from pydantic import BaseModel, Field
+import re
+
+_HUNK_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class PatchFile(BaseModel):
+    """
+    The lines of a single file inside a (possibly multi-file) diff.
+    """
+
+    path: str = Field(..., description="Path of the file, taken from its diff headers.")
+    lines: list[str] = Field(default_factory=list, description="Raw diff lines, headers included.")
+
+
+def header_path(line: str) -> str | None:
+    """
+    Extract the file path from a ``---``/``+++`` header line.
+
+    Returns None for ``/dev/null``. Git's ``a/`` and ``b/`` prefixes and the
+    timestamps written by ``diff -u`` are stripped.
+    """
+    path = line[4:].rstrip("\n").split("\t", 1)[0].strip()
+    if path == "/dev/null":
+        return None
+    if path.startswith(("a/", "b/")):
+        path = path[2:]
+    return path
+
+
+def _git_path(line: str) -> str:
+    # diff --git a/<old> b/<new>, good enough until the ---/+++ headers arrive
+    rest = line.rstrip("\n")[len("diff --git "):]
+    idx = rest.rfind(" b/")
+    return rest[idx + 3:] if idx != -1 else rest
+
+
+def parse_hunk_header(line: str) -> tuple[int, int, int, int] | None:
+    """
+    Parse ``@@ -a,b +c,d @@`` into (old_start, old_len, new_start, new_len).
+
+    Returns None if the line is not a hunk header.
+    """
+    match = _HUNK_RE.match(line)
+    if not match:
+        return None
+    old_start, old_len, new_start, new_len = match.groups()
+    return (
+        int(old_start),
+        int(old_len) if old_len is not None else 1,
+        int(new_start),
+        int(new_len) if new_len is not None else 1,
+    )
+
+
+def split_files(lines: list[str]) -> list[PatchFile]:
+    """
+    Split diff lines into one PatchFile per file.
+
+    Git diffs are split on ``diff --git`` lines, plain unified diffs on
+    ``---`` headers directly followed by a ``+++`` header. Hunk lengths are
+    honoured, so removed lines that happen to look like headers stay put.
+    Anything before the first file (e.g. a commit message) is dropped.
+    """
+    git_style = any(line.startswith("diff --git ") for line in lines)
+    files: list[PatchFile] = []
+    current: PatchFile | None = None
+    old_left = new_left = 0
+
+    for i, line in enumerate(lines):
+        if old_left > 0 or new_left > 0:
+            # Inside a hunk body
+            if current is not None:
+                current.lines.append(line)
+            if line.startswith("-"):
+                old_left -= 1
+            elif line.startswith("+"):
+                new_left -= 1
+            elif not line.startswith("\\"):
+                old_left -= 1
+                new_left -= 1
+            continue
+
+        starts_file = (
+            line.startswith("diff --git ")
+            if git_style
+            else line.startswith("--- ") and i + 1 < len(lines) and lines[i + 1].startswith("+++ ")
+        )
+        if starts_file:
+            current = PatchFile(path=_git_path(line) if git_style else "")
+            files.append(current)
+        if current is None:
+            continue
+
+        current.lines.append(line)
+        header = parse_hunk_header(line)
+        if header:
+            old_left, new_left = header[1], header[3]
+        elif line.startswith("+++ "):
+            path = header_path(line)
+            if path is None:  # deleted file, fall back to the old name
+                old = next((l for l in current.lines if l.startswith("--- ")), None)
+                path = header_path(old) if old else None
+            if path:
+                current.path = path
+
+    return files
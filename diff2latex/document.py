@@ -0,0 +1,177 @@
+"""
+Document templates that wrap rendered table rows.
+
+A template is read and checked once, then split at its ``$content``
+placeholder into a prologue and an epilogue. Documents are written as
+prologue, rows, epilogue, so the rendered body is streamed to the file
+instead of being substituted into one more full copy of itself.
+
+Templates use ``string.Template`` syntax. Besides ``$content`` they may use
+``$font`` and ``$fontsize``, and ``$columns`` and ``$header`` for the column
+specification and heading row of the table layout; anything else is
+rejected when the template is loaded, before any rendering work is done.
+"""
+
+from typing import Iterable, Optional, TextIO
+from string import Template
+import os
+import threading
+
+from pydantic import BaseModel, Field
+
+DEFAULT_TEMPLATE = "default"
+PLACEHOLDERS = ("font", "fontsize", "content", "columns", "header")
+
+# Table layout -> (tabularx column specification, heading row)
+LAYOUTS: dict[str, tuple[str, str]] = {
+    "split": (
+        "r Y r Y",
+        "\\multicolumn{1}{c}{\\textbf{\\#}} & \\multicolumn{1}{c}{\\textbf{Old Code}} &\n"
+        "\\multicolumn{1}{c}{\\textbf{\\#}} & \\multicolumn{1}{c}{\\textbf{New Code}} \\\\",
+    ),
+    "unified": (
+        "r r Y",
+        "\\multicolumn{1}{c}{\\textbf{Old}} & \\multicolumn{1}{c}{\\textbf{New}} & "
+        "\\multicolumn{1}{c}{\\textbf{Code}} \\\\",
+    ),
+}
+
+# Template name -> path of the .tex file
+TEMPLATES: dict[str, str] = {
+    DEFAULT_TEMPLATE: os.path.join(os.path.dirname(__file__), "templates", "template.tex"),
+}
+
+
+class DocumentTemplate(BaseModel):
+    """
+    A validated template, split around its ``$content`` placeholder.
+    """
+
+    path: str = Field(..., description="File the template was loaded from.")
+    prologue: str = Field(..., description="Template text before $content.")
+    epilogue: str = Field(..., description="Template text after $content.")
+
+    @classmethod
+    def parse(cls, text: str, path: str = "<string>") -> "DocumentTemplate":
+        """
+        Check a template's placeholders and split it.
+
+        Raises:
+            ValueError: If a placeholder is unknown or malformed, or
+                ``$content`` does not occur exactly once
+        """
+        content = []
+        for match in Template.pattern.finditer(text):
+            name = match.group("named") or match.group("braced")
+            if match.group("invalid") is not None:
+                line = text.count("\n", 0, match.start()) + 1
+                raise ValueError(f"{path}:{line}: invalid placeholder, write $$ for a literal $")
+            if name is None:
+                continue
+            if name not in PLACEHOLDERS:
+                line = text.count("\n", 0, match.start()) + 1
+                raise ValueError(
+                    f"{path}:{line}: unknown placeholder ${name}, expected one of "
+                    + ", ".join(f"${p}" for p in PLACEHOLDERS)
+                )
+            if name == "content":
+                content.append(match)
+        if len(content) != 1:
+            raise ValueError(f"{path}: $content must occur exactly once, found {len(content)}")
+        return cls(path=path, prologue=text[:content[0].start()], epilogue=text[content[0].end():])
+
+    @staticmethod
+    def _fill(text: str, font_family: str, font_size: str, layout: str) -> str:
+        columns, header = LAYOUTS[layout]
+        return Template(text).substitute(font=font_family, fontsize=font_size, columns=columns, header=header)
+
+    def head(self, font_family: str, font_size: str, layout: str = "split") -> str:
+        """The prologue with fonts and table layout filled in."""
+        return self._fill(self.prologue, font_family, font_size, layout)
+
+    def tail(self, font_family: str, font_size: str, layout: str = "split") -> str:
+        """The epilogue with fonts and table layout filled in."""
+        return self._fill(self.epilogue, font_family, font_size, layout)
+
+    def content_line(self, font_family: str, font_size: str, layout: str = "split") -> int:
+        """The line of the document (counted from 1) where the rows start."""
+        return self.head(font_family, font_size, layout).count("\n") + 1
+
+    def render(
+        self, content: str, font_family: str = "Fira Code", font_size: str = "10pt", layout: str = "split"
+    ) -> str:
+        """The complete document around the given rows."""
+        return self.head(font_family, font_size, layout) + content + self.tail(font_family, font_size, layout)
+
+    def write(
+        self,
+        f: TextIO,
+        rows: Iterable[str],
+        font_family: str = "Fira Code",
+        font_size: str = "10pt",
+        layout: str = "split",
+    ) -> None:
+        """Stream the document to a file, rows joined by newlines."""
+        f.write(self.head(font_family, font_size, layout))
+        for n, row in enumerate(rows):
+            if n:
+                f.write("\n")
+            f.write(row)
+        f.write(self.tail(font_family, font_size, layout))
+
+
+_loaded: dict[str, tuple[int, DocumentTemplate]] = {}
+_lock = threading.Lock()
+
+
+def register_template(name: str, path: str) -> None:
+    """
+    Make a template file selectable by name. It is validated right away.
+
+    Raises:
+        ValueError: If the template is invalid
+        OSError: If the file cannot be read
+    """
+    load_template(path)
+    with _lock:
+        TEMPLATES[name] = path
+
+
+def load_template(path: str) -> DocumentTemplate:
+    """
+    Load and validate a template file, once per process while it is unchanged.
+
+    Raises:
+        ValueError: If the template is invalid
+        OSError: If the file cannot be read
+    """
+    path = os.path.abspath(path)
+    mtime_ns = os.stat(path).st_mtime_ns
+    cached = _loaded.get(path)
+    if cached is not None and cached[0] == mtime_ns:
+        return cached[1]
+    with open(path, "r") as f:
+        template = DocumentTemplate.parse(f.read(), path)
+    with _lock:
+        _loaded[path] = (mtime_ns, template)
+    return template
+
+
+def get_template(name: Optional[str] = None) -> DocumentTemplate:
+    """
+    Resolve a registered template name or a path to a ``.tex`` file.
+
+    Args:
+        name: Template name or path; the package template if None
+
+    Raises:
+        ValueError: If there is no such template or it is invalid
+    """
+    path = TEMPLATES.get(name or DEFAULT_TEMPLATE, name)
+    assert path is not None
+    if not os.path.isfile(path):
+        raise ValueError(f"Unknown template '{name}', choose from {', '.join(TEMPLATES)} or give a .tex file")
+    try:
+        return load_template(path)
+    except OSError as e:
+        raise ValueError(f"Cannot read template {path}: {e}")
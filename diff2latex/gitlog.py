@@ -0,0 +1,286 @@
+"""
+Rendering of commit ranges straight from ``git log -p``.
+
+The log is read through a pipe and split on commit boundaries while it
+streams, so no patch files are written and the first commits are rendered
+while git is still producing the rest. Every commit is rendered by a warm
+DiffProcessor, either in this process or across a worker pool; at most a
+few commits per worker are in flight at any time.
+"""
+
+from typing import Callable, Iterable, Iterator, Optional
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from pydantic import BaseModel, Field
+
+from .api import DiffProcessor, compile_latex
+from .core.models import Banner
+from .document import get_template
+
+# Starts the header line of every commit. Diff lines never begin with \x01.
+_COMMIT_MARK = "\x01"
+_LOG_FORMAT = "%x01%H%x00%an%x00%aI%x00%s"
+
+# Commits queued per worker before waiting for the oldest one
+_IN_FLIGHT_PER_WORKER = 2
+
+
+class Commit(BaseModel):
+    """One commit of a streamed ``git log -p``."""
+
+    sha: str = Field(..., description="Full commit hash.")
+    author: str = Field(default="", description="Author name.")
+    date: str = Field(default="", description="Author date, ISO 8601.")
+    subject: str = Field(default="", description="First line of the commit message.")
+    lines: list[str] = Field(default_factory=list, description="The commit's patch, as diff lines.")
+
+    @property
+    def title(self) -> str:
+        """Header text naming the commit."""
+        return f"{self.sha[:12]} {self.subject} ({self.author}, {self.date[:10]})"
+
+
+class LogResult(BaseModel):
+    """Outcome of rendering one commit."""
+
+    commit: str = Field(..., description="Full commit hash.")
+    output: Optional[str] = Field(default=None, description="Output path, relative to the output directory.")
+    status: str = Field(..., description="One of 'ok', 'empty' or 'failed'.")
+    seconds: float = Field(default=0.0, description="Wall time spent rendering.")
+    error: Optional[str] = Field(default=None, description="Error message for failed commits.")
+
+
+class LogSummary(BaseModel):
+    """Totals for a rendered commit range."""
+
+    rendered: int = 0
+    empty: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+
+
+def _parse_header(line: str) -> Commit:
+    sha, author, date, subject = (line[len(_COMMIT_MARK):].rstrip("\n").split("\x00") + ["", "", ""])[:4]
+    return Commit(sha=sha, author=author, date=date, subject=subject)
+
+
+def split_commits(lines: Iterable[str]) -> Iterator[Commit]:
+    """Split the output of ``git log -p --format=<_LOG_FORMAT>`` into commits."""
+    commit: Optional[Commit] = None
+    for line in lines:
+        if line.startswith(_COMMIT_MARK):
+            if commit is not None:
+                yield commit
+            commit = _parse_header(line)
+        elif commit is not None and (commit.lines or line.strip()):
+            commit.lines.append(line)
+    if commit is not None:
+        yield commit
+
+
+def iter_commits(
+    revision_range: str,
+    repo: Optional[str] = None,
+    paths: Iterable[str] = (),
+    reverse: bool = False,
+) -> Iterator[Commit]:
+    """
+    Stream the commits of a range, with their patches, from ``git log -p``.
+
+    Args:
+        revision_range: Anything git log accepts, e.g. ``v1.0..HEAD``
+        repo: Repository directory, the current one if None
+        paths: Only show changes to these paths
+        reverse: Oldest commit first
+
+    Raises:
+        RuntimeError: If git is not found in PATH
+        ValueError: If git log fails, e.g. for an unknown revision
+    """
+    if shutil.which("git") is None:
+        raise RuntimeError("git not found in PATH. Please install it.")
+
+    command = [
+        "git", "log", "-p", "--no-color", "--no-ext-diff", f"--format={_LOG_FORMAT}",
+        *(["--reverse"] if reverse else []), revision_range, "--", *paths,
+    ]
+    # stderr goes to a file, so a chatty git cannot block on a full pipe
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(
+            command, cwd=repo, stdout=subprocess.PIPE, stderr=stderr,
+            text=True, encoding="utf-8", errors="replace",
+        )
+        try:
+            assert process.stdout is not None
+            yield from split_commits(process.stdout)
+        finally:
+            if process.poll() is None:
+                process.kill()
+            process.stdout.close()  # type: ignore[union-attr]
+            returncode = process.wait()
+        if returncode != 0:
+            stderr.seek(0)
+            message = stderr.read().decode("utf-8", errors="replace").strip()
+            raise ValueError(f"git log {revision_range} failed: {message or f'exit code {returncode}'}")
+
+
+def commit_output_name(position: int, commit: Commit, ext: str) -> str:
+    """Numbered like format-patch output: ``0001-<short sha>.tex``."""
+    return f"{position:04d}-{commit.sha[:12]}{ext}"
+
+
+_processor: Optional[DiffProcessor] = None
+_pdf_output = False
+
+
+def _init_worker(settings: dict) -> None:
+    """Build the per-worker processor (and its colorizer) once."""
+    global _processor, _pdf_output
+    _pdf_output = settings.get("pdf_output", False)
+    _processor = DiffProcessor.from_settings(settings)
+
+
+def _render_commit(commit: Commit, output_path: Optional[str]) -> tuple[LogResult, str]:
+    """Render one commit to its own document, or to rows if output_path is None."""
+    assert _processor is not None, "worker not initialised"
+    start = time.perf_counter()
+    rows = ""
+    try:
+        diff_content = "".join(commit.lines)
+        if output_path is None:
+            rows = _processor.process(diff_content, standalone=False)
+        elif _pdf_output:
+            _processor.create_pdf(diff_content, output_path)
+        else:
+            _processor.process(diff_content, output_path)
+    except Exception as e:
+        return LogResult(
+            commit=commit.sha, status="failed", seconds=time.perf_counter() - start, error=str(e)
+        ), rows
+    return LogResult(commit=commit.sha, status="ok", seconds=time.perf_counter() - start), rows
+
+
+def render_log(
+    commits: Iterable[Commit],
+    output_dir: str,
+    settings: dict,
+    jobs: int = 1,
+    combined: bool = False,
+    base_name: str = "diff_output",
+    progress: Optional[Callable[[LogResult, int], None]] = None,
+) -> LogSummary:
+    """
+    Render every commit of a stream, as it arrives.
+
+    Args:
+        commits: Commits as yielded by iter_commits()
+        output_dir: Directory receiving the documents
+        settings: Rendering settings, a DiffProcessor.settings() dict plus
+            pdf_output
+        jobs: Number of worker processes; 1 renders in the calling process
+        combined: Write one document with a header row per commit instead
+            of one document per commit; needs a split or unified layout
+        base_name: File name (without extension) of the combined document
+        progress: Called as progress(result, done) after each commit
+
+    Returns:
+        A LogSummary with the totals of the run
+
+    Raises:
+        ValueError: If commits are combined with the 'auto' layout
+    """
+    layout = settings.get("layout", "split")
+    if combined and layout == "auto":
+        raise ValueError("Commits in one document need one layout, choose split or unified")
+    os.makedirs(output_dir, exist_ok=True)
+    ext = ".pdf" if settings.get("pdf_output") else ".tex"
+    summary = LogSummary()
+    start = time.perf_counter()
+    done = 0
+
+    def record(result: LogResult) -> None:
+        nonlocal done
+        done += 1
+        if result.status == "ok":
+            summary.rendered += 1
+        elif result.status == "empty":
+            summary.empty += 1
+        else:
+            summary.failed += 1
+        if progress:
+            progress(result, done)
+
+    def rendered() -> Iterator[tuple[Commit, LogResult, str]]:
+        """Render the commits in order, with a bounded number queued ahead."""
+        pool = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(settings,)) if jobs > 1 else None
+        if pool is None:
+            _init_worker(settings)
+        queue: deque[tuple[Commit, Optional[str], Future]] = deque()
+        try:
+            for position, commit in enumerate(commits, 1):
+                output = None if combined else commit_output_name(position, commit, ext)
+                output_path = os.path.join(output_dir, output) if output else None
+                if not commit.lines:
+                    # Merges and commits without a textual change have no patch
+                    future: Future = Future()
+                    future.set_result((LogResult(commit=commit.sha, status="empty"), ""))
+                elif pool is None:
+                    future = Future()
+                    future.set_result(_render_commit(commit, output_path))
+                else:
+                    future = pool.submit(_render_commit, commit, output_path)
+                queue.append((commit, output, future))
+                while queue and (queue[0][2].done() or len(queue) > jobs * _IN_FLIGHT_PER_WORKER):
+                    yield _finish(*queue.popleft())
+            while queue:
+                yield _finish(*queue.popleft())
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+    if not combined:
+        for commit, result, _ in rendered():
+            record(result)
+    else:
+        document = get_template(settings.get("template"))
+        fonts = (settings["font_family"], settings["font_size"])
+
+        def rows() -> Iterator[str]:
+            for commit, result, commit_rows in rendered():
+                record(result)
+                if result.status == "ok":
+                    yield Banner(text=commit.title).to_latex(3 if layout == "unified" else 4)
+                    yield commit_rows
+
+        if settings.get("pdf_output"):
+            compile_latex(
+                document.render("\n".join(rows()), *fonts, layout), os.path.join(output_dir, base_name + ext)
+            )
+        else:
+            # Written aside and moved into place, so a failing git leaves no half document
+            output_path = os.path.join(output_dir, base_name + ext)
+            tmp_path = f"{output_path}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+                    document.write(f, rows(), *fonts, layout)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            os.replace(tmp_path, output_path)
+
+    summary.seconds = time.perf_counter() - start
+    return summary
+
+
+def _finish(commit: Commit, output: Optional[str], future: Future) -> tuple[Commit, LogResult, str]:
+    result, rows = future.result()
+    if result.status != "empty":
+        result.output = output
+    return commit, result, rows
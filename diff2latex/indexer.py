@@ -0,0 +1,266 @@
+"""
+Byte-level index of large diffs.
+
+The diff is memory-mapped and scanned for ``diff --git`` and ``@@`` lines
+without decoding it; every body line of a unified diff starts with " ", "-",
+"+" or "\\", so these boundaries are unambiguous. The resulting offsets let
+single files or hunks be decoded and rendered without touching the rest of
+the input. An index can be saved next to the diff as a sidecar and is reused
+while the diff is unchanged.
+"""
+
+from typing import Iterator, Optional
+from fnmatch import fnmatchcase
+import bisect
+import mmap
+import os
+
+from pydantic import BaseModel, Field
+
+from .core.utils.patch import _git_path, header_path, parse_hunk_header
+
+INDEX_VERSION = 1
+SIDECAR_SUFFIX = ".d2l-index.json"
+
+
+class HunkEntry(BaseModel):
+    """
+    Byte range of one hunk, from its ``@@`` line to the next boundary.
+    """
+
+    start: int = Field(..., description="Offset of the @@ line.")
+    end: int = Field(..., description="Offset just past the hunk.")
+    old_start: int = Field(..., description="First old line number from the @@ header.")
+    old_len: int = Field(..., description="Number of old lines from the @@ header.")
+    new_start: int = Field(..., description="First new line number from the @@ header.")
+    new_len: int = Field(..., description="Number of new lines from the @@ header.")
+
+
+class FileEntry(BaseModel):
+    """
+    Byte range of one file of the diff and its hunks.
+    """
+
+    path: str = Field(..., description="Path of the file, taken from its diff headers.")
+    start: int = Field(..., description="Offset of the first header line.")
+    end: int = Field(..., description="Offset just past the file's last hunk.")
+    hunks: list[HunkEntry] = Field(default_factory=list)
+
+    @property
+    def header_end(self) -> int:
+        """Offset where the headers end and the first hunk begins."""
+        return self.hunks[0].start if self.hunks else self.end
+
+
+class DiffIndex(BaseModel):
+    """
+    Offsets of every file and hunk in a diff, plus what is needed to tell
+    whether the diff changed since the index was built.
+    """
+
+    version: int = Field(default=INDEX_VERSION)
+    size: int = Field(..., description="Size of the indexed diff in bytes.")
+    mtime_ns: int = Field(..., description="Modification time of the indexed diff.")
+    files: list[FileEntry] = Field(default_factory=list)
+
+    def is_current(self, path: str) -> bool:
+        """Whether the index still describes the diff at ``path``."""
+        st = os.stat(path)
+        return self.version == INDEX_VERSION and self.size == st.st_size and self.mtime_ns == st.st_mtime_ns
+
+
+def _line_starts(mm: mmap.mmap, prefix: bytes) -> Iterator[int]:
+    """Offsets of all lines starting with prefix, found with plain byte searches."""
+    if mm[:len(prefix)] == prefix:
+        yield 0
+    needle = b"\n" + prefix
+    pos = mm.find(needle)
+    while pos != -1:
+        yield pos + 1
+        pos = mm.find(needle, pos + 1)
+
+
+def _line_at(mm: mmap.mmap, offset: int) -> str:
+    end = mm.find(b"\n", offset)
+    return mm[offset:end if end != -1 else len(mm)].decode("utf-8", errors="replace")
+
+
+def _previous_line(mm: mmap.mmap, offset: int) -> Optional[int]:
+    """Offset of the line before the one starting at offset, if any."""
+    if offset == 0:
+        return None
+    return mm.rfind(b"\n", 0, offset - 1) + 1
+
+
+def _header_start(mm: mmap.mmap, hunk_start: int) -> Optional[int]:
+    """Offset of a ``---``/``+++`` pair directly above a hunk, if any."""
+    plus = _previous_line(mm, hunk_start)
+    minus = _previous_line(mm, plus) if plus is not None else None
+    if minus is not None and mm[plus:plus + 4] == b"+++ " and mm[minus:minus + 4] == b"--- ":
+        return minus
+    return None
+
+
+def _header_line(mm: mmap.mmap, prefix: bytes, start: int, end: int) -> Optional[str]:
+    if mm[start:start + len(prefix)] == prefix:
+        return _line_at(mm, start)
+    pos = mm.find(b"\n" + prefix, start, end)
+    return _line_at(mm, pos + 1) if pos != -1 else None
+
+
+def _file_path(mm: mmap.mmap, start: int, header_end: int) -> str:
+    for prefix in (b"+++ ", b"--- "):
+        line = _header_line(mm, prefix, start, header_end)
+        path = header_path(line) if line else None
+        if path:
+            return path
+    first = _line_at(mm, start)
+    return _git_path(first) if first.startswith("diff --git ") else "?"
+
+
+def build_index(path: str) -> DiffIndex:
+    """
+    Scan a diff for file and hunk boundaries.
+
+    Args:
+        path: Path of the diff
+
+    Returns:
+        The byte offset index
+    """
+    st = os.stat(path)
+    index = DiffIndex(size=st.st_size, mtime_ns=st.st_mtime_ns)
+    if st.st_size == 0:
+        return index
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        hunk_starts = list(_line_starts(mm, b"@@ -"))
+        file_starts = list(_line_starts(mm, b"diff --git "))
+        if not file_starts:
+            # Plain unified diffs: a file starts at the ---/+++ pair above a hunk
+            file_starts = sorted({
+                start for start in (_header_start(mm, hunk) for hunk in hunk_starts) if start is not None
+            })
+        if not file_starts or (hunk_starts and hunk_starts[0] < file_starts[0]):
+            file_starts.insert(0, 0)
+
+        boundaries = sorted(set(file_starts) | set(hunk_starts)) + [st.st_size]
+        files = [FileEntry(path="?", start=start, end=st.st_size) for start in file_starts]
+        for file, next_file in zip(files, file_starts[1:]):
+            file.end = next_file
+
+        for hunk_start in hunk_starts:
+            numbers = parse_hunk_header(_line_at(mm, hunk_start))
+            if numbers is None:
+                continue
+            end = boundaries[bisect.bisect_right(boundaries, hunk_start)]
+            file = files[bisect.bisect_right(file_starts, hunk_start) - 1]
+            file.hunks.append(HunkEntry(start=hunk_start, end=end, **dict(zip(
+                ("old_start", "old_len", "new_start", "new_len"), numbers
+            ))))
+
+        for file in files:
+            file.path = _file_path(mm, file.start, file.header_end)
+    index.files = files
+    return index
+
+
+def sidecar_path(path: str) -> str:
+    """``changes.diff`` -> ``changes.diff.d2l-index.json``."""
+    return path + SIDECAR_SUFFIX
+
+
+def save_index(index: DiffIndex, path: str) -> None:
+    """Atomically write an index to ``path``."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(index.model_dump_json())
+    os.replace(tmp_path, path)
+
+
+def load_index(path: str, sidecar: bool = True) -> DiffIndex:
+    """
+    Return the index of a diff, from its sidecar if that is still current.
+
+    Args:
+        path: Path of the diff
+        sidecar: Read and write the sidecar next to the diff
+
+    Returns:
+        The byte offset index
+    """
+    if sidecar:
+        try:
+            with open(sidecar_path(path), "r") as f:
+                index = DiffIndex.model_validate_json(f.read())
+            if index.is_current(path):
+                return index
+        except (OSError, ValueError):
+            pass
+
+    index = build_index(path)
+    if sidecar:
+        try:
+            save_index(index, sidecar_path(path))
+        except OSError:
+            pass  # read-only location, the index is simply not kept
+    return index
+
+
+def parse_hunk_ranges(spec: str) -> list[tuple[int, Optional[int]]]:
+    """
+    Parse a hunk selection such as ``1-3,7,10-`` (1-based, inclusive).
+
+    Raises:
+        ValueError: If the specification is malformed
+    """
+    ranges: list[tuple[int, Optional[int]]] = []
+    for part in spec.split(","):
+        part = part.strip()
+        try:
+            if "-" in part:
+                low, high = part.split("-", 1)
+                ranges.append((int(low) if low else 1, int(high) if high else None))
+            else:
+                ranges.append((int(part), int(part)))
+        except ValueError:
+            raise ValueError(f"Invalid hunk range '{part}', expected e.g. 1-3,7,10-")
+        if ranges[-1][0] < 1 or (ranges[-1][1] is not None and ranges[-1][1] < ranges[-1][0]):
+            raise ValueError(f"Invalid hunk range '{part}'")
+    return ranges
+
+
+def select(
+    index: DiffIndex,
+    files: Optional[list[str]] = None,
+    hunks: Optional[list[tuple[int, Optional[int]]]] = None,
+) -> list[tuple[FileEntry, list[HunkEntry]]]:
+    """
+    Pick files whose path matches any of the glob patterns, and of those the
+    hunks (numbered from 1 within each file) in any of the ranges.
+    """
+    selection = []
+    for file in index.files:
+        if files and not any(fnmatchcase(file.path, pattern) for pattern in files):
+            continue
+        chosen = [
+            hunk for number, hunk in enumerate(file.hunks, 1)
+            if not hunks or any(low <= number and (high is None or number <= high) for low, high in hunks)
+        ]
+        if chosen:
+            selection.append((file, chosen))
+    return selection
+
+
+def read_selection(path: str, selection: list[tuple[FileEntry, list[HunkEntry]]]) -> list[str]:
+    """
+    Decode only the selected files' headers and hunks into diff lines.
+    """
+    lines: list[str] = []
+    if not selection:
+        return lines
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for file, hunks in selection:
+            for start, end in [(file.start, file.header_end)] + [(hunk.start, hunk.end) for hunk in hunks]:
+                lines.extend(mm[start:end].decode("utf-8", errors="replace").splitlines(keepends=True))
+    return lines
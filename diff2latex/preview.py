@@ -0,0 +1,105 @@
+"""
+Self-contained HTML previews of diffs.
+
+The rows come from the same model as the LaTeX output (Line.to_html() and
+friends), so parsing, highlighting, moves and folding are shared; this
+module only wraps them in a page. Background colors are read from the
+``\\definecolor`` lines of the LaTeX template, so a preview shows the colors
+the PDF will have, without waiting for lualatex.
+"""
+
+from typing import Iterable, TextIO
+import re
+
+from pydantic import BaseModel, Field
+
+from .document import DocumentTemplate
+
+_DEFINECOLOR = re.compile(r"\\definecolor\{(\w+)\}\{RGB\}\{\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*\}")
+
+_STYLE = """\
+body {{ margin: 2em; font-family: {font}, monospace; font-size: {fontsize}; }}
+table {{ border-collapse: collapse; width: 100%; table-layout: fixed; }}
+col.nr {{ width: 4em; }}
+thead th {{ border-bottom: 1px solid #000; }}
+tbody {{ border-bottom: 1px solid #000; }}
+td {{ vertical-align: top; padding: 0 .3em; }}
+td.nr {{ text-align: right; white-space: nowrap; }}
+td.code, td.banner {{ white-space: pre-wrap; overflow-wrap: anywhere; }}
+{colors}"""
+
+# Table layout -> column groups and heading row, see document.LAYOUTS
+_LAYOUTS = {
+    "split": (
+        '<col class="nr"><col><col class="nr"><col>',
+        "<th>#</th><th>Old Code</th><th>#</th><th>New Code</th>",
+    ),
+    "unified": (
+        '<col class="nr"><col class="nr"><col>',
+        "<th>Old</th><th>New</th><th>Code</th>",
+    ),
+}
+
+
+def template_colors(template: DocumentTemplate) -> dict[str, str]:
+    """The ``\\definecolor{name}{RGB}{r,g,b}`` colors of a template, as CSS."""
+    return {
+        name: f"#{int(r):02x}{int(g):02x}{int(b):02x}"
+        for name, r, g, b in _DEFINECOLOR.findall(template.prologue)
+    }
+
+
+class HtmlDocument(BaseModel):
+    """
+    The page around HTML rows, the counterpart of DocumentTemplate.
+    """
+
+    colors: dict[str, str] = Field(default_factory=dict, description="Background color classes, name -> CSS color.")
+
+    @classmethod
+    def from_template(cls, template: DocumentTemplate) -> "HtmlDocument":
+        """A page using the colors defined by a LaTeX template."""
+        return cls(colors=template_colors(template))
+
+    def head(self, font_family: str, font_size: str, layout: str = "split") -> str:
+        """Everything up to the first row."""
+        colors = "".join(f".{name} {{ background: {color}; }}\n" for name, color in self.colors.items())
+        # <style> is raw text: entities are not decoded there, so drop what could end the rule or the element
+        style = _STYLE.format(
+            font='"' + re.sub(r'["<>;{}\\]', "", font_family) + '"',
+            fontsize=re.sub(r"[^\w.%]", "", font_size),
+            colors=colors,
+        )
+        columns, header = _LAYOUTS[layout]
+        return (
+            "<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n<title>diff2latex preview</title>\n"
+            f"<style>\n{style}</style>\n</head>\n<body>\n<table>\n"
+            f"<colgroup>{columns}</colgroup>\n"
+            f"<thead><tr>{header}</tr></thead>\n<tbody>\n"
+        )
+
+    def tail(self) -> str:
+        """Everything after the last row."""
+        return "\n</tbody>\n</table>\n</body>\n</html>\n"
+
+    def render(
+        self, content: str, font_family: str = "Fira Code", font_size: str = "10pt", layout: str = "split"
+    ) -> str:
+        """The complete page around the given rows."""
+        return self.head(font_family, font_size, layout) + content + self.tail()
+
+    def write(
+        self,
+        f: TextIO,
+        rows: Iterable[str],
+        font_family: str = "Fira Code",
+        font_size: str = "10pt",
+        layout: str = "split",
+    ) -> None:
+        """Stream the page to a file, rows joined by newlines."""
+        f.write(self.head(font_family, font_size, layout))
+        for n, row in enumerate(rows):
+            if n:
+                f.write("\n")
+            f.write(row)
+        f.write(self.tail())
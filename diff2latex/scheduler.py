@@ -0,0 +1,302 @@
+"""
+Cost-model scheduling of many lualatex compilations.
+
+Compile time is dominated by the document, not by the order of submission:
+one long table submitted last keeps a pool busy long after every other job
+has finished. Each document is therefore measured when it is queued (table
+rows, highlighted runs, longest line), its compile time predicted from a
+linear cost model, and the jobs are started longest first across a bounded
+number of concurrent lualatex processes. Predicted and measured times are
+reported side by side, so the model can be fitted to real runs.
+"""
+
+from typing import Callable, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
+import shutil
+import tempfile
+import time
+
+from pydantic import BaseModel, Field
+
+from .compiler import compile_tex
+from .core.models import RowSource
+
+# Commands that typeset one highlighted run of code
+_RUN_COMMANDS = ("\\code{", "\\boxx{")
+
+
+class CompileCost(BaseModel):
+    """What a document costs lualatex, measured on its source."""
+
+    rows: int = Field(default=0, description="Table rows, i.e. lines ending in \\\\.")
+    runs: int = Field(default=0, description="Highlighted runs of code, each one colored box or text.")
+    longest_line: int = Field(default=0, description="Characters in the longest source line.")
+
+    @classmethod
+    def of(cls, latex_content: str) -> "CompileCost":
+        """Measure a LaTeX document."""
+        cost = cls(runs=sum(latex_content.count(command) for command in _RUN_COMMANDS))
+        for line in latex_content.splitlines():
+            cost.longest_line = max(cost.longest_line, len(line))
+            if line.endswith("\\\\"):
+                cost.rows += 1
+        return cost
+
+
+# Coefficients of CostModel, in the order of the features they multiply
+_COEFFICIENTS = ("base_seconds", "row_seconds", "run_seconds", "char_seconds")
+
+
+def _solve(matrix: list[list[float]], vector: list[float]) -> Optional[list[float]]:
+    """Solve a small linear system by Gaussian elimination; None if it is singular."""
+    n = len(vector)
+    rows = [list(row) + [value] for row, value in zip(matrix, vector)]
+    largest = max(abs(row[i]) for i, row in enumerate(rows))
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(rows[r][col]))
+        if abs(rows[pivot][col]) <= 1e-10 * largest:
+            return None
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        for r in range(col + 1, n):
+            factor = rows[r][col] / rows[col][col]
+            for c in range(col, n + 1):
+                rows[r][c] -= factor * rows[col][c]
+    solution = [0.0] * n
+    for r in reversed(range(n)):
+        solution[r] = (rows[r][n] - sum(rows[r][c] * solution[c] for c in range(r + 1, n))) / rows[r][r]
+    return solution
+
+
+def _nnls(features: list[list[float]], targets: list[float]) -> list[float]:
+    """
+    Non-negative least squares for a handful of coefficients.
+
+    The optimum is the unconstrained least-squares fit on the coefficients
+    it leaves positive, so with four of them trying the fit on every subset
+    and keeping the best non-negative one is exact and cheap.
+    """
+    n = len(features[0])
+    # Columns scaled to at most 1, rows and runs are orders of magnitude apart
+    scales = [max(abs(row[j]) for row in features) or 1.0 for j in range(n)]
+    scaled = [[x / scale for x, scale in zip(row, scales)] for row in features]
+
+    def error(coefficients: list[float]) -> float:
+        return sum((sum(c * x for c, x in zip(coefficients, row)) - t) ** 2 for row, t in zip(scaled, targets))
+
+    best = [0.0] * n
+    best_error = error(best)
+    for mask in range(1, 1 << n):
+        active = [j for j in range(n) if mask >> j & 1]
+        gram = [[sum(row[i] * row[j] for row in scaled) for j in active] for i in active]
+        moments = [sum(row[i] * t for row, t in zip(scaled, targets)) for i in active]
+        solution = _solve(gram, moments)
+        if solution is None or min(solution) < 0:
+            continue
+        coefficients = [0.0] * n
+        for j, value in zip(active, solution):
+            coefficients[j] = value
+        fit_error = error(coefficients)
+        if fit_error < best_error:
+            best, best_error = coefficients, fit_error
+    return [c / scale for c, scale in zip(best, scales)]
+
+
+class CostModel(BaseModel):
+    """
+    Linear model of the wall time of one compilation, all passes included.
+
+    The defaults are rough figures for a two-pass lualatex run; use
+    calibrated() to fit them to the measured times of a previous run.
+    """
+
+    base_seconds: float = Field(default=2.0, description="Startup and preamble, independent of the table.")
+    row_seconds: float = Field(default=2e-3, description="Per table row; tabularx sets every row on each pass.")
+    run_seconds: float = Field(default=2e-4, description="Per highlighted run.")
+    char_seconds: float = Field(default=5e-4, description="Per character of the longest line, which sets the column width.")
+
+    def predict(self, cost: CompileCost) -> float:
+        """Predicted seconds to compile a document of the given cost."""
+        return (
+            self.base_seconds
+            + self.row_seconds * cost.rows
+            + self.run_seconds * cost.runs
+            + self.char_seconds * cost.longest_line
+        )
+
+    def calibrated(self, results: list["CompileResult"]) -> "CostModel":
+        """
+        The model fitted to the measured times of the successful results.
+
+        The coefficients are fitted jointly by non-negative least squares
+        over the costs of the documents, so the fit can change which
+        documents are predicted to take longest. A coefficient the results
+        cannot separate (e.g. all documents have the same longest line), or
+        that would be negative, is set to 0. With fewer successful results
+        than coefficients the model is returned unchanged.
+        """
+        timed = [r for r in results if r.status == "ok"]
+        if len(timed) < len(_COEFFICIENTS):
+            return self.model_copy()
+        features = [[1.0, r.cost.rows, r.cost.runs, r.cost.longest_line] for r in timed]
+        fitted = _nnls(features, [r.seconds for r in timed])
+        return CostModel(**dict(zip(_COEFFICIENTS, fitted)))
+
+
+class CompileResult(BaseModel):
+    """Outcome of one scheduled compilation."""
+
+    output: str = Field(..., description="Path of the PDF.")
+    cost: CompileCost
+    predicted: float = Field(default=0.0, description="Seconds predicted by the cost model.")
+    seconds: float = Field(default=0.0, description="Measured wall time of the compilation.")
+    status: str = Field(..., description="One of 'ok' or 'failed'.")
+    error: Optional[str] = Field(default=None, description="Error message for failed jobs.")
+
+
+class ScheduleReport(BaseModel):
+    """Predicted against actual times of a scheduled run."""
+
+    workers: int = Field(..., description="Concurrent lualatex processes.")
+    predicted_seconds: float = Field(default=0.0, description="Predicted wall time of the whole run.")
+    seconds: float = Field(default=0.0, description="Measured wall time of the whole run.")
+    results: list[CompileResult] = Field(default_factory=list, description="Jobs in submission order.")
+
+
+class _Job(BaseModel):
+    position: int
+    tex_path: str
+    output: str
+    cost: CompileCost
+    predicted: float
+    source_map: Optional[dict[int, RowSource]] = None
+
+
+def _makespan(predicted: list[float], workers: int) -> float:
+    """Wall time of running jobs in the given order on the first free worker."""
+    finish = [0.0] * workers
+    for seconds in predicted:
+        i = finish.index(min(finish))
+        finish[i] += seconds
+    return max(finish, default=0.0)
+
+
+class CompileScheduler:
+    """
+    Queue LaTeX documents, then compile them longest first.
+
+    Queued documents are written to a private temporary directory right
+    away, so only their costs and source maps are held in memory until
+    run().
+
+    Example:
+        >>> with CompileScheduler(workers=4) as scheduler:
+        ...     for diff_content, pdf_path in jobs:
+        ...         scheduler.add(diff_to_latex(diff_content), pdf_path)
+        ...     report = scheduler.run()
+    """
+
+    def __init__(self, workers: Optional[int] = None, model: Optional[CostModel] = None, passes: int = 2) -> None:
+        """
+        Args:
+            workers: Concurrent lualatex processes, defaults to the CPU count
+            model: Cost model ordering the jobs, the default one if None
+            passes: lualatex runs per document
+        """
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.model = model or CostModel()
+        self.passes = passes
+        self._jobs: list[_Job] = []
+        self._tmpdir = tempfile.TemporaryDirectory(prefix="diff2latex-")
+
+    def __enter__(self) -> "CompileScheduler":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Remove the queued documents."""
+        self._tmpdir.cleanup()
+
+    def add(
+        self,
+        latex_content: str,
+        output_pdf_path: str,
+        source_map: Optional[dict[int, RowSource]] = None,
+    ) -> CompileCost:
+        """
+        Queue a complete LaTeX document for compilation to output_pdf_path.
+
+        Returns:
+            The measured cost of the document
+        """
+        position = len(self._jobs)
+        # Every job gets its own directory, lualatex names its files after the .tex
+        workdir = os.path.join(self._tmpdir.name, f"{position:05d}")
+        os.mkdir(workdir)
+        tex_path = os.path.join(workdir, "temp.tex")
+        with open(tex_path, "w", encoding="utf-8", newline="") as f:
+            f.write(latex_content)
+        cost = CompileCost.of(latex_content)
+        job = _Job(
+            position=position, tex_path=tex_path, output=output_pdf_path,
+            cost=cost, predicted=self.model.predict(cost), source_map=source_map,
+        )
+        self._jobs.append(job)
+        return cost
+
+    def _compile(self, job: _Job) -> CompileResult:
+        start = time.perf_counter()
+        try:
+            pdf_path = compile_tex(job.tex_path, self.passes, job.source_map)
+            shutil.move(pdf_path, job.output)
+        except Exception as e:
+            return CompileResult(
+                output=job.output, cost=job.cost, predicted=job.predicted,
+                seconds=time.perf_counter() - start, status="failed", error=str(e),
+            )
+        finally:
+            shutil.rmtree(os.path.dirname(job.tex_path), ignore_errors=True)
+        return CompileResult(
+            output=job.output, cost=job.cost, predicted=job.predicted,
+            seconds=time.perf_counter() - start, status="ok",
+        )
+
+    def run(self, progress: Optional[Callable[[CompileResult, int, int], None]] = None) -> ScheduleReport:
+        """
+        Compile every queued document, longest predicted first.
+
+        A failing document does not stop the others; its error is recorded
+        in the report.
+
+        Args:
+            progress: Called as progress(result, done, total) after each job
+
+        Returns:
+            A ScheduleReport with predicted and measured times per job
+
+        Raises:
+            RuntimeError: If lualatex is not found in PATH
+        """
+        if shutil.which("lualatex") is None:
+            raise RuntimeError("lualatex not found in PATH. Please install it.")
+        # Longest processing time first keeps the pool busy until the end
+        order = sorted(self._jobs, key=lambda job: job.predicted, reverse=True)
+        report = ScheduleReport(
+            workers=self.workers, predicted_seconds=_makespan([job.predicted for job in order], self.workers)
+        )
+        results: dict[int, CompileResult] = {}
+        start = time.perf_counter()
+        # lualatex runs as a subprocess, so threads are enough to keep it busy
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self._compile, job): job for job in order}
+            for future in as_completed(futures):
+                result = future.result()
+                results[futures[future].position] = result
+                if progress:
+                    progress(result, len(results), len(order))
+        report.seconds = time.perf_counter() - start
+        report.results = [results[job.position] for job in self._jobs]
+        self._jobs = []
+        return report
@@ -0,0 +1,220 @@
+"""
+Deterministic sharding of diff2latex work across machines.
+
+Work items are assigned to shards by a stable hash of their relative path,
+so independent runners agree on the split without a coordinator. Every
+shard writes a result manifest; merge_manifests() combines the shard
+outputs into the final document.
+"""
+
+from typing import Optional
+from pathlib import Path
+import hashlib
+import os
+
+from .api import DiffProcessor, compile_latex
+from .document import get_template
+from .batch import BatchInput, MANIFEST_VERSION, load_manifest, save_manifest
+from .core.models import Banner
+from .core.utils import split_files
+
+PARTS_SUFFIX = ".parts"
+
+
+def parse_shard(spec: str) -> tuple[int, int]:
+    """
+    Parse a shard specification of the form ``i/N``.
+
+    Raises:
+        ValueError: If the specification is malformed or out of range
+    """
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{spec}', expected INDEX/COUNT such as 0/4")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard '{spec}', index must be in [0, {count})")
+    return index, count
+
+
+def shard_of(key: str, count: int) -> int:
+    """Return the shard a key belongs to. Stable across processes and machines."""
+    digest = hashlib.sha1(key.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count
+
+
+def shard_manifest_name(base: str, index: int, count: int) -> str:
+    """``batch-manifest.json`` -> ``batch-manifest.shard-1-of-4.json``."""
+    stem, ext = os.path.splitext(base)
+    return f"{stem}.shard-{index}-of-{count}{ext}"
+
+
+def select_shard(inputs: list[BatchInput], index: int, count: int) -> list[BatchInput]:
+    """Keep the batch inputs that belong to shard ``index`` of ``count``."""
+    return [
+        item for item in inputs
+        if shard_of(Path(item.output).with_suffix("").as_posix(), count) == index
+    ]
+
+
+def build_shard(
+    diff_lines: list[str],
+    output_dir: str,
+    index: int,
+    count: int,
+    settings: dict,
+    base_name: str = "diff_output",
+) -> str:
+    """
+    Render the files of a multi-file diff that belong to one shard.
+
+    Each selected file is written as a table fragment under
+    ``<output_dir>/<base_name>.parts/`` and listed in a shard manifest.
+
+    Args:
+        diff_lines: Lines of the whole diff
+        output_dir: Directory receiving fragments and the manifest
+        index: Shard index
+        count: Total number of shards
+        settings: Rendering settings, a DiffProcessor.settings() dict
+        base_name: Base name for the fragment directory and manifest
+
+    Returns:
+        Path of the written shard manifest
+    """
+    processor = DiffProcessor.from_settings(settings)
+    parts_dir = os.path.join(output_dir, base_name + PARTS_SUFFIX)
+    os.makedirs(parts_dir, exist_ok=True)
+
+    files = split_files(diff_lines)
+    entries = {}
+    for position, patch_file in enumerate(files):
+        if shard_of(patch_file.path, count) != index:
+            continue
+        output = f"{base_name}{PARTS_SUFFIX}/{position:06d}.tex"
+        processor.process(
+            "".join(patch_file.lines), os.path.join(output_dir, output), standalone=False
+        )
+        entries[output] = {"label": patch_file.path, "status": "ok"}
+
+    manifest_path = os.path.join(output_dir, shard_manifest_name(f"{base_name}.json", index, count))
+    save_manifest(manifest_path, {
+        "version": MANIFEST_VERSION,
+        "settings": dict(settings, fragments=True),
+        "shard": {"index": index, "count": count},
+        "entries": entries,
+        "finished": True,
+    })
+    return manifest_path
+
+
+def _check_shards(manifests: list[dict], paths: list[str]) -> None:
+    shards = [m.get("shard") for m in manifests]
+    if not any(shards):
+        return
+    if not all(shards):
+        raise ValueError("Cannot merge sharded and unsharded manifests")
+    counts = {s["count"] for s in shards}
+    if len(counts) != 1:
+        raise ValueError(f"Manifests come from different shard counts: {sorted(counts)}")
+    count = counts.pop()
+    indices = [s["index"] for s in shards]
+    duplicates = sorted({i for i in indices if indices.count(i) > 1})
+    if duplicates:
+        raise ValueError(f"Shard(s) {duplicates} given more than once")
+    missing = sorted(set(range(count)) - set(indices))
+    if missing:
+        raise ValueError(f"Missing shard(s) {missing} of {count}")
+    unfinished = [p for p, m in zip(paths, manifests) if not m.get("finished")]
+    if unfinished:
+        raise ValueError(f"Shard run(s) did not finish: {', '.join(unfinished)}")
+
+
+def _pdf_merge_document(pdf_paths: list[str]) -> str:
+    pages = "\n".join(f"\\includepdf[pages=-]{{{Path(p).resolve().as_posix()}}}" for p in pdf_paths)
+    return (
+        "\\documentclass{article}\n"
+        "\\usepackage{pdfpages}\n"
+        "\\begin{document}\n"
+        f"{pages}\n"
+        "\\end{document}\n"
+    )
+
+
+def merge_manifests(
+    manifest_paths: list[str],
+    output_path: str,
+    font_family: str = "Fira Code",
+    font_size: str = "10pt",
+    pdf_output: bool = False,
+    template: Optional[str] = None,
+) -> str:
+    """
+    Combine shard outputs into a single document.
+
+    Fragments (from ``batch --fragments`` or ``build --shard``) are joined
+    into one table, each preceded by a header row naming its source. Per-file
+    PDFs are concatenated with pdfpages. Entries are ordered by their output
+    path, so the result does not depend on how the work was sharded.
+
+    Args:
+        manifest_paths: Result manifests of all shards
+        output_path: Path of the merged ``.tex`` (or ``.pdf``) file
+        font_family: Font family for a merged LaTeX document
+        font_size: Font size for a merged LaTeX document
+        pdf_output: Compile merged fragments to PDF
+        template: Template name or path for a merged LaTeX document
+
+    Returns:
+        The path of the written file
+
+    Raises:
+        ValueError: If shards are missing, duplicated, failed or inconsistent
+        RuntimeError: If a PDF is requested and lualatex is not found in PATH
+    """
+    document = get_template(template)
+    manifests = [load_manifest(path) for path in manifest_paths]
+    for path, manifest in zip(manifest_paths, manifests):
+        if not manifest["entries"] and not manifest.get("shard"):
+            raise ValueError(f"{path} is not a diff2latex result manifest")
+    _check_shards(manifests, manifest_paths)
+
+    settings = [m["settings"] for m in manifests]
+    if any(s != settings[0] for s in settings):
+        raise ValueError("Manifests were produced with different settings")
+
+    items: list[tuple[str, str, str]] = []
+    failed: list[str] = []
+    for path, manifest in zip(manifest_paths, manifests):
+        base = os.path.dirname(os.path.abspath(path))
+        for output, entry in manifest["entries"].items():
+            if entry.get("status") != "ok":
+                failed.append(entry.get("label", output))
+            items.append((output, entry.get("label", output), os.path.join(base, output)))
+    if failed:
+        raise ValueError(f"Cannot merge failed entries: {', '.join(failed)}")
+    items.sort()
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+    if settings and settings[0].get("pdf_output"):
+        compile_latex(_pdf_merge_document([p for _, _, p in items]), output_path, passes=1)
+        return output_path
+    if settings and not settings[0].get("fragments"):
+        raise ValueError("Only fragments or PDFs can be merged, rerun batch with --fragments")
+
+    layout = settings[0].get("layout", "split") if settings else "split"
+    if layout == "auto":
+        raise ValueError("Fragments rendered with the 'auto' layout cannot be merged, choose split or unified")
+    rows: list[str] = []
+    for _, label, fragment_path in items:
+        rows.append(Banner(text=label).to_latex(3 if layout == "unified" else 4))
+        with open(fragment_path, "r", encoding="utf-8", newline="") as f:
+            rows.append(f.read())
+
+    if pdf_output:
+        compile_latex(document.render("\n".join(rows), font_family, font_size, layout), output_path)
+    else:
+        with open(output_path, "w", encoding="utf-8", newline="") as f:
+            document.write(f, rows, font_family, font_size, layout)
+    return output_path
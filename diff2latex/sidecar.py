@@ -0,0 +1,177 @@
+"""
+Machine-readable sidecar of a rendered document.
+
+While the rows are streamed into the output, the byte range each hunk
+occupies in it is recorded; together with the line ranges and counts read
+off the parsed model and the render budget's degradations, this is written
+next to the output as JSON. Dashboards and indexers get per-file and
+per-hunk statistics, and can seek into or slice the generated document,
+without parsing the diff (or the LaTeX) again.
+"""
+
+from typing import Iterable, Iterator, Optional
+import os
+import re
+
+from pydantic import BaseModel, Field
+
+from .core.diff2latex import Diff2Latex
+from .core.models import HunkSummary, RowSource
+
+SIDECAR_VERSION = 1
+SIDECAR_SUFFIX = ".d2l.json"
+
+# (path, hunk number) -> [first byte, end byte] of the hunk's rows
+ByteRanges = dict[tuple[Optional[str], Optional[int]], list[int]]
+# (path, hunk number) -> (macro key, first byte, end byte of its \dhdef) of
+# a hunk typeset from a reused macro
+MacroRanges = dict[tuple[Optional[str], Optional[int]], tuple[str, int, int]]
+
+# Definition and use of a reused hunk's macro, see Diff2Latex.to_latex()
+_MACRO = re.compile(r"\\dh(def|use)\{(\w+)\}")
+
+
+class HunkRecord(HunkSummary):
+    """
+    A hunk of the sidecar: its summary plus where its rows are in the output.
+
+    A hunk that is repeated in the diff may be typeset by a single \\dhuse of
+    a macro defined elsewhere; slicing the output needs the definition too.
+    """
+
+    offset: Optional[int] = Field(default=None, description="Byte offset of the hunk's first row in the output.")
+    length: Optional[int] = Field(default=None, description="Bytes from the first row to the end of the last one.")
+    degraded: list[str] = Field(default_factory=list, description="Budget actions taken on the hunk's lines.")
+    macro: Optional[str] = Field(default=None, description="Key of the macro a reused hunk is typeset from.")
+    definition_offset: Optional[int] = Field(default=None, description="Byte offset of the macro's \\dhdef.")
+    definition_length: Optional[int] = Field(default=None, description="Bytes of the macro's \\dhdef.")
+
+
+class FileRecord(BaseModel):
+    """
+    A file of the sidecar, with totals over its hunks.
+    """
+
+    path: Optional[str] = Field(default=None, description="Path of the file, if known.")
+    added: int = Field(default=0, description="Added lines without a removed partner.")
+    removed: int = Field(default=0, description="Removed lines without an added partner.")
+    changed: int = Field(default=0, description="Removed lines shown next to their replacement.")
+    offset: Optional[int] = Field(default=None, description="Byte offset of the file's first row in the output.")
+    length: Optional[int] = Field(default=None, description="Bytes from the first row to the end of the last one.")
+    degraded: list[str] = Field(default_factory=list, description="Budget actions taken on the file's lines.")
+    hunks: list[HunkRecord] = Field(default_factory=list)
+
+
+class RenderSidecar(BaseModel):
+    """
+    Everything downstream tools need to know about a rendered diff.
+    """
+
+    version: int = Field(default=SIDECAR_VERSION)
+    output: str = Field(..., description="File name of the document the offsets refer to.")
+    layout: str = Field(..., description="Table layout of the document, 'split' or 'unified'.")
+    deadline_hit: bool = Field(default=False, description="Whether the render deadline expired.")
+    files: list[FileRecord] = Field(default_factory=list)
+
+
+def render_sidecar_path(output_path: str) -> str:
+    """``diff_output.tex`` -> ``diff_output.tex.d2l.json``."""
+    return output_path + SIDECAR_SUFFIX
+
+
+def track_offsets(
+    rows: Iterable[tuple[str, list[Optional[RowSource]]]],
+    first_offset: int,
+    ranges: ByteRanges,
+    macros: Optional[MacroRanges] = None,
+) -> Iterator[tuple[str, list[Optional[RowSource]]]]:
+    """
+    Pass sourced row chunks through (they are joined by newlines, starting
+    at byte first_offset of the output) while recording the byte range of
+    every hunk in ranges, and the macro definition of reused hunks in macros.
+    """
+    offset = first_offset
+    definitions: dict[str, tuple[int, int]] = {}
+    for n, (chunk, sources) in enumerate(rows):
+        if n:
+            offset += 1
+        end = offset + len(chunk.encode("utf-8"))
+        macro = _MACRO.match(chunk)
+        if macro and macro.group(1) == "def":
+            definitions[macro.group(2)] = (offset, end)
+        elif macro and macro.group(2) in definitions and macros is not None:
+            for source in sources:
+                if source is not None and source.hunk is not None:
+                    macros[(source.path, source.hunk)] = (macro.group(2), *definitions[macro.group(2)])
+        for source in sources:
+            if source is not None and source.hunk is not None:
+                span = ranges.setdefault((source.path, source.hunk), [offset, end])
+                span[0] = min(span[0], offset)
+                span[1] = max(span[1], end)
+        offset = end
+        yield chunk, sources
+
+
+def build_sidecar(
+    differ: Diff2Latex,
+    output: str,
+    ranges: Optional[ByteRanges] = None,
+    macros: Optional[MacroRanges] = None,
+) -> RenderSidecar:
+    """
+    Assemble the sidecar of a rendered diff.
+
+    Args:
+        differ: The model the document was rendered from
+        output: File name of the document
+        ranges: Byte ranges recorded by track_offsets(); offsets are left
+            out without them, e.g. for compiled PDFs
+        macros: Macro definitions recorded by track_offsets()
+    """
+    sidecar = RenderSidecar(output=output, layout=differ.table_layout, deadline_hit=differ.report.deadline_hit)
+    files: dict[Optional[str], FileRecord] = {}
+    file_spans: dict[Optional[str], list[int]] = {}
+    for summary in differ.hunk_summaries():
+        hunk = HunkRecord(**summary.model_dump())
+        span = (ranges or {}).get((hunk.path, hunk.number))
+        if span is not None:
+            hunk.offset, hunk.length = span[0], span[1] - span[0]
+            file_span = file_spans.setdefault(hunk.path, list(span))
+            file_span[0] = min(file_span[0], span[0])
+            file_span[1] = max(file_span[1], span[1])
+        macro = (macros or {}).get((hunk.path, hunk.number))
+        if macro is not None:
+            hunk.macro, hunk.definition_offset = macro[0], macro[1]
+            hunk.definition_length = macro[2] - macro[1]
+        file = files.get(hunk.path)
+        if file is None:
+            file = files[hunk.path] = FileRecord(path=hunk.path)
+            sidecar.files.append(file)
+        file.hunks.append(hunk)
+        file.added += hunk.added
+        file.removed += hunk.removed
+        file.changed += hunk.changed
+    for path, (start, end) in file_spans.items():
+        files[path].offset, files[path].length = start, end - start
+
+    for degradation in differ.report.degradations:
+        file = files.get(degradation.file)
+        if file is None:
+            continue
+        if degradation.action not in file.degraded:
+            file.degraded.append(degradation.action)
+        for hunk in file.hunks:
+            start, count = (hunk.old_start, hunk.old_lines) if degradation.side == "old" else (hunk.new_start, hunk.new_lines)
+            if degradation.line is not None and start <= degradation.line < start + count:
+                if degradation.action not in hunk.degraded:
+                    hunk.degraded.append(degradation.action)
+                break
+    return sidecar
+
+
+def write_sidecar(sidecar: RenderSidecar, path: str) -> None:
+    """Atomically write a sidecar to ``path``."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(sidecar.model_dump_json(indent=2))
+    os.replace(tmp_path, path)
@@ -0,0 +1,99 @@
+"""
+Opening of diff inputs: plain or compressed files, or standard input.
+
+Compression is recognised by its magic bytes rather than the file name, and
+the stdlib codecs decompress incrementally while the diff is read, so an
+archived diff is never unpacked to disk or held in memory in compressed and
+decompressed form at once.
+"""
+
+from typing import BinaryIO, Iterator, Optional, TextIO
+from contextlib import contextmanager
+import bz2
+import gzip
+import io
+import lzma
+import sys
+
+# Path meaning standard input (or output)
+STDIO = "-"
+
+# Magic bytes of the supported codecs
+_MAGIC = {
+    "gzip": b"\x1f\x8b",
+    "xz": b"\xfd7zXZ\x00",
+    "bz2": b"BZh",
+}
+_MAGIC_LEN = max(len(magic) for magic in _MAGIC.values())
+
+
+def detect_compression(head: bytes) -> Optional[str]:
+    """The codec ('gzip', 'xz' or 'bz2') whose magic bytes start head, if any."""
+    for name, magic in _MAGIC.items():
+        if head.startswith(magic):
+            return name
+    return None
+
+
+def file_compression(path: str) -> Optional[str]:
+    """The codec a file on disk is compressed with, if any."""
+    with open(path, "rb") as f:
+        return detect_compression(f.read(_MAGIC_LEN))
+
+
+class _Replay(io.RawIOBase):
+    """A raw stream returning some already consumed bytes before the rest."""
+
+    def __init__(self, head: bytes, rest: BinaryIO) -> None:
+        self._head = head
+        self._rest = rest
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:  # type: ignore[override]
+        if self._head:
+            n = min(len(b), len(self._head))
+            b[:n] = self._head[:n]
+            self._head = self._head[n:]
+            return n
+        data = self._rest.read1(len(b)) if hasattr(self._rest, "read1") else self._rest.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+
+@contextmanager
+def open_diff(path: str) -> Iterator[TextIO]:
+    """
+    Open a diff for reading as text, decompressing it on the fly.
+
+    Args:
+        path: A plain, gzip, xz or bz2 compressed file, or "-" for
+            standard input (which is not closed afterwards)
+
+    Raises:
+        OSError: If the file cannot be opened
+    """
+    raw: BinaryIO = sys.stdin.buffer if path == STDIO else open(path, "rb")
+    try:
+        # Pipes may deliver the magic bytes in pieces, so read until we have them
+        head = b""
+        while len(head) < _MAGIC_LEN:
+            chunk = raw.read1(_MAGIC_LEN - len(head)) if hasattr(raw, "read1") else raw.read(_MAGIC_LEN - len(head))
+            if not chunk:
+                break
+            head += chunk
+        stream: BinaryIO = io.BufferedReader(_Replay(head, raw))
+        codec = detect_compression(head)
+        if codec == "gzip":
+            stream = gzip.GzipFile(fileobj=stream, mode="rb")  # type: ignore[assignment]
+        elif codec == "xz":
+            stream = lzma.LZMAFile(stream)  # type: ignore[assignment]
+        elif codec == "bz2":
+            stream = bz2.BZ2File(stream)  # type: ignore[assignment]
+        # Closing the wrappers leaves raw open, it is closed below (or is stdin)
+        with io.TextIOWrapper(stream, encoding="utf-8", errors="replace") as text:
+            yield text
+    finally:
+        if path != STDIO:
+            raw.close()
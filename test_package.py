@@ -155,6 +155,1108 @@ def test_basic_functionality():
         if 'diff_file' in locals():
             os.unlink(diff_file)
 
+def test_batch_command():
+    """Test batch rendering of a directory and resuming it."""
+    diff_template = """--- a.txt
++++ a.txt
+@@ -1,2 +1,2 @@
+-old {n}
++new {n}
+"""
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_dir = os.path.join(tmpdir, "diffs")
+            output_dir = os.path.join(tmpdir, "out")
+            os.makedirs(os.path.join(input_dir, "nested"))
+            for name in ("one.diff", "two.patch", os.path.join("nested", "three.diff")):
+                with open(os.path.join(input_dir, name), "w") as f:
+                    f.write(diff_template.format(n=name))
+
+            command = [sys.executable, "-m", "diff2latex", "batch", input_dir, output_dir, "-j", "2"]
+            first = subprocess.run(command, capture_output=True, text=True)
+            second = subprocess.run(command, capture_output=True, text=True)
+
+            expected = ["one.tex", "two.tex", os.path.join("nested", "three.tex"), "batch-manifest.json"]
+            missing = [p for p in expected if not os.path.exists(os.path.join(output_dir, p))]
+            if first.returncode != 0 or missing:
+                print(f"✗ Batch command failed: {first.stderr or missing}")
+                return False
+            if "3 up to date" not in second.stdout:
+                print(f"✗ Batch command did not skip up-to-date outputs: {second.stdout}")
+                return False
+            print("✓ Batch command works")
+            return True
+    except Exception as e:
+        print(f"✗ Batch command test failed: {e}")
+        return False
+
+def test_sharded_batch_merge():
+    """Test that shards run as separate processes merge into the unsharded result."""
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_dir = os.path.join(tmpdir, "diffs")
+            os.makedirs(input_dir)
+            for n in range(6):
+                with open(os.path.join(input_dir, f"change{n}.diff"), "w") as f:
+                    f.write(f"--- a.txt\n+++ a.txt\n@@ -1 +1 @@\n-old {n}\n+new {n}\n")
+
+            def run(*args):
+                return subprocess.run([sys.executable, "-m", "diff2latex", *args], capture_output=True, text=True)
+
+            shards = [
+                subprocess.Popen(
+                    [sys.executable, "-m", "diff2latex", "batch", input_dir,
+                     os.path.join(tmpdir, "sharded"), "--fragments", "--shard", f"{i}/3", "-j", "1"],
+                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                )
+                for i in range(3)
+            ]
+            if any(p.wait() != 0 for p in shards):
+                print("✗ A shard process failed")
+                return False
+            run("batch", input_dir, os.path.join(tmpdir, "single"), "--fragments", "--shard", "0/1", "-j", "1")
+
+            manifests = [
+                os.path.join(tmpdir, "sharded", f"batch-manifest.shard-{i}-of-3.json") for i in range(3)
+            ]
+            sharded = os.path.join(tmpdir, "sharded.tex")
+            single = os.path.join(tmpdir, "single.tex")
+            merged = run("merge", *manifests, sharded)
+            run("merge", os.path.join(tmpdir, "single", "batch-manifest.shard-0-of-1.json"), single)
+            incomplete = run("merge", *manifests[:2], os.path.join(tmpdir, "incomplete.tex"))
+
+            if merged.returncode != 0:
+                print(f"✗ Merge failed: {merged.stderr}")
+                return False
+            with open(sharded) as a, open(single) as b:
+                if a.read() != b.read():
+                    print("✗ Sharded merge differs from the unsharded result")
+                    return False
+            if incomplete.returncode == 0:
+                print("✗ Merge accepted a missing shard")
+                return False
+            print("✓ Sharded batch and merge work")
+            return True
+    except Exception as e:
+        print(f"✗ Sharded batch test failed: {e}")
+        return False
+
+def test_compare_trees():
+    """Test comparing two directory trees without an intermediate diff."""
+    try:
+        import diff2latex
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            old_dir = os.path.join(tmpdir, "old")
+            new_dir = os.path.join(tmpdir, "new")
+            for d in (old_dir, new_dir):
+                os.makedirs(os.path.join(d, "pkg"))
+            with open(os.path.join(old_dir, "pkg", "mod.py"), "w") as f:
+                f.write("x = 1\n\ny = 2\n")
+            with open(os.path.join(new_dir, "pkg", "mod.py"), "w") as f:
+                f.write("x = 1\ny = 3\n")
+            with open(os.path.join(new_dir, "added.txt"), "w") as f:
+                f.write("hello\n")
+            for d in (old_dir, new_dir):
+                with open(os.path.join(d, "same.txt"), "w") as f:
+                    f.write("unchanged\n")
+                with open(os.path.join(d, "img.bin"), "wb") as f:
+                    f.write(b"\x89PNG\0\1\2")
+
+            latex = diff2latex.compare_to_latex(old_dir, new_dir, jobs=2, standalone=False)
+
+            if "pkg/mod.py" not in latex or "added.txt" not in latex or "same.txt" in latex:
+                print("✗ Tree comparison picked the wrong files")
+                return False
+            if "img.bin" in latex or "Binary" in latex:
+                print("✗ Unchanged binary file was reported")
+                return False
+            from diff2latex.compare import compare_files
+            same_bin = [os.path.join(d, "img.bin") for d in (old_dir, new_dir)]
+            if compare_files(*same_bin, diff2latex.CharColorizer(style_name=None)) is not None:
+                print("✗ Unchanged binary file pair was not treated as unchanged")
+                return False
+            if "\\linenr{3}" not in latex:
+                print("✗ Removed blank line was not kept")
+                return False
+
+            old_file, new_file = os.path.join(old_dir, "long.py"), os.path.join(new_dir, "long.py")
+            with open(old_file, "w") as f:
+                f.write("".join(f"v{i} = {i}\n" for i in range(10)))
+            with open(new_file, "w") as f:
+                f.write("".join(f"v{i} = {i + (i in (2, 7))}\n" for i in range(10)))
+            full = diff2latex.compare_to_latex(old_file, new_file, standalone=False)
+            folded = diff2latex.compare_to_latex(old_file, new_file, standalone=False, fold_context=0)
+            if "unchanged" in full or "4\\ unchanged\\ lines" not in folded:
+                print("✗ fold_context does not fold compared files")
+                return False
+
+            # The same change across a tree is emitted once, like in a diff
+            for name in ("a.py", "b.py", "c.py"):
+                for d, year in ((old_dir, 2020), (new_dir, 2021)):
+                    with open(os.path.join(d, "pkg", name), "w") as f:
+                        f.write(f"# Copyright {year}\nimport os\n")
+            reused = diff2latex.compare_to_latex(old_dir, new_dir, jobs=2, standalone=False)
+            collapsed = diff2latex.compare_to_latex(old_dir, new_dir, standalone=False, repeated_hunks="collapse")
+            definition = next((line for line in reused.splitlines() if line.startswith("\\dhdef")), "")
+            if reused.count("\\dhdef") != 1 or reused.count("\\dhuse") != 3 or "pkg/" in definition:
+                print("✗ Hunks repeated across the tree were not reused")
+                return False
+            if "Same\\ change\\ 2\\ more\\ time(s)\\ in\\ pkg/b.py,\\ pkg/c.py" not in collapsed:
+                print("✗ Hunks repeated across the tree were not collapsed")
+                return False
+
+            # One budget across the tree, with one report of every file
+            import json
+            from diff2latex.core.utils import RenderBudget
+            report_path = os.path.join(tmpdir, "report.json")
+            diff2latex.compare_to_latex(
+                old_dir, new_dir, jobs=2, standalone=False, budget=RenderBudget(max_line_chars=8), report_path=report_path,
+            )
+            with open(report_path) as f:
+                report = json.load(f)
+            if {d["file"] for d in report["degradations"]} != {"pkg/a.py", "pkg/b.py", "pkg/c.py"}:
+                print(f"✗ Budget report does not cover the tree: {report}")
+                return False
+            result = subprocess.run(
+                [sys.executable, "-m", "diff2latex", "compare", "--deadline", "0", "--budget-report", report_path,
+                 old_dir, new_dir, os.path.join(tmpdir, "out")],
+                capture_output=True, text=True,
+            )
+            with open(report_path) as f:
+                report = json.load(f)
+            if result.returncode != 0 or not report["deadline_hit"] or report["degradations"][0]["reason"] != "deadline":
+                print(f"✗ compare has no shared deadline or report: {result.stderr}")
+                return False
+            print("✓ Tree comparison works")
+            return True
+    except Exception as e:
+        print(f"✗ Tree comparison test failed: {e}")
+        return False
+
+def test_render_budget():
+    """Test that the render budget degrades long lines and reports it."""
+    try:
+        from io import StringIO
+        from diff2latex import Diff2Latex, CharColorizer
+        from diff2latex.core.utils import RenderBudget
+
+        blob = "x" * 5000
+        diff_content = f"--- a/data.json\n+++ b/data.json\n@@ -1,2 +1,2 @@\n-{blob}1\n+{blob}2\n-a = 1\n+a = 2\n"
+        budget = RenderBudget(max_inline_chars=1000, max_highlight_chars=2000, max_line_chars=3000)
+        differ = Diff2Latex.build(
+            StringIO(diff_content), colorizer=CharColorizer(style_name="default"), budget=budget
+        )
+        latex = differ.to_latex()
+        actions = sorted({(d.side, d.action) for d in differ.report.degradations})
+
+        if "characters]" not in latex or "diffchargreen" not in latex:
+            print("✗ Budget did not truncate the long line or dropped the short line's inline diff")
+            return False
+        expected = [(side, action) for side in ("new", "old") for action in ("no_highlight", "no_inline", "truncated")]
+        if actions != expected or differ.report.degradations[0].file != "data.json":
+            print(f"✗ Unexpected budget report: {actions}")
+            return False
+        print("✓ Render budget works")
+        return True
+    except Exception as e:
+        print(f"✗ Render budget test failed: {e}")
+        return False
+
+def test_regex_highlighter():
+    """Test that the built-in highlighter matches Pygments' colors."""
+    try:
+        from diff2latex import CharColorizer
+
+        samples = {
+            ".py": [
+                "#!/usr/bin/env python3",
+                "import os.path, sys as system",
+                "from typing import Optional, List as L",
+                "from . import utils",
+                "@dataclass(frozen=True)",
+                "class Point(Base):",
+                '    """A point."""',
+                "    def __init__(self, x: int = 0, *args, **kw) -> None:",
+                "        name = f\"{self.x!r:>{width}} {kw['a']}\\n\"",
+                "        msg = '%(n)s has %5.2f%%' % {'n': name} + '{0}'.format(1)",
+                "        if x is not None and x > 1e-3 or not args:",
+                "            print(os.path.join(r'a\\\\b', b'\\x00'), len(args), 0x1F, 0o7, 1_000j)",
+                "        match command:",
+                "            case [first, _]:",
+                "                raise ValueError(\"bad\") from None",
+                "        return lambda y: y ** 2  # squared",
+            ],
+            ".cpp": [
+                "#include <vector>",
+                '  #include "point.h"',
+                "#define MAX 10",
+                "namespace geo {",
+                "template <typename T, class U = int>",
+                "struct Point : public Base<T> {",
+                "    double scale(double f) const { return x * f; }",
+                "};",
+                "static std::vector<T> make(size_t n, const char* name) {",
+                "    /* fill it */ for (size_t i = 0; i < n; ++i) out[i] = T(i);",
+                "    auto c = L'c'; unsigned long big = 0xFFul; float f = -1.5f; int b = 0b101;",
+                '    std::string s = "hi\\n\\x41" + u8"\\u00e9" + R"x(raw\\n)x";',
+                "    if (name == nullptr) return flag ? a : b;",
+                "done:",
+                "    inline_call(); return out;",
+                "}  // namespace geo",
+            ],
+        }
+        for style in ("default", "monokai"):
+            for ext, lines in samples.items():
+                fast = CharColorizer(style_name=style, ext=ext, highlighter="regex")
+                slow = CharColorizer(style_name=style, ext=ext, highlighter="pygments")
+                for line in lines:
+                    fast_colors = fast.get_colormap(line).root
+                    if "".join(char for char, _ in fast_colors) != line:
+                        print(f"✗ Regex highlighter lost characters of {line!r}")
+                        return False
+                    if fast_colors != slow.get_colormap(line).root:
+                        print(f"✗ Regex highlighter colors differ from Pygments ({style}): {line!r}")
+                        return False
+
+        # Pygments is the default; the regex backend is opt-in
+        if CharColorizer(style_name="default", ext=".py").highlighter != "pygments":
+            print("✗ Default highlighter is not Pygments")
+            return False
+
+        # The backend reaches processors and the batch, log and compare workers
+        from diff2latex import DiffProcessor
+        from diff2latex import batch, compare, gitlog
+        processor = DiffProcessor(highlight_style="default", highlighter="regex", fold_context=2)
+        settings = processor.settings()
+        if DiffProcessor.from_settings({**settings, "pdf_output": True}).settings() != settings:
+            print("✗ Processor settings do not round-trip")
+            return False
+        batch._init_worker(settings)
+        gitlog._init_worker(settings)
+        compare._init_worker(settings)
+        backends = [
+            processor.colorizer.highlighter,
+            processor._settings({"highlight_style": "monokai"})["colorizer"].highlighter,
+            batch._processor.colorizer.highlighter,
+            gitlog._processor.colorizer.highlighter,
+            compare._worker_processor.colorizer.highlighter,
+        ]
+        if backends != ["regex"] * 5:
+            print(f"✗ Highlighter setting was dropped: {backends}")
+            return False
+        print("✓ Regex highlighter works")
+        return True
+    except Exception as e:
+        print(f"✗ Regex highlighter test failed: {e}")
+        return False
+
+def test_lexer_index():
+    """Test lexer resolution by file name and shebang, and per-file lexers."""
+    try:
+        from diff2latex import CharColorizer, Diff2Latex
+        from diff2latex.core.utils import find_lexer_name
+        from pygments.lexers import get_lexer_for_filename
+
+        for name in ["main.go", "lib.rs", "app.ts", "types.d.ts", "ci.yaml", "Makefile", "x.m", "CMakeLists.txt"]:
+            expected = type(get_lexer_for_filename(name)).__name__
+            if find_lexer_name(name) != expected:
+                print(f"✗ {name} resolved to {find_lexer_name(name)}, expected {expected}")
+                return False
+        if find_lexer_name("deploy", "#!/usr/bin/env -S python3.12 -u") != "PythonLexer":
+            print("✗ Shebang not recognised")
+            return False
+
+        diff = [
+            "--- a/main.go\n", "+++ b/main.go\n", "@@ -1 +1 @@\n", "-var x = 1\n", "+var x = 2\n",
+            "--- a/notes.txt\n", "+++ b/notes.txt\n", "@@ -1 +1 @@\n", "-var x = 1\n", "+var x = 2\n",
+        ]
+        differ = Diff2Latex(colorizer=CharColorizer(style_name="default"))
+        differ.parse(diff)
+        go_row, text_row = differ.to_latex().splitlines()
+        if go_row == text_row:
+            print("✗ Files in one diff were not highlighted with their own lexers")
+            return False
+        print("✓ Lexer index works")
+        return True
+    except Exception as e:
+        print(f"✗ Lexer index test failed: {e}")
+        return False
+
+def test_thread_safety():
+    """Test that concurrent renders from cold caches match sequential ones."""
+    try:
+        import threading
+        from diff2latex import DiffProcessor
+        from diff2latex.core.utils import highlighters, lexers
+
+        diffs = [
+            f"--- a/{name}\n+++ b/{name}\n@@ -1,2 +1,2 @@\n context {i}\n-old = {i} # x\n+new = {i} // y\n"
+            for i, name in enumerate(["a.py", "b.go", "c.rs", "d.c", "e.yaml", "f.java", "deploy", "g.ts"])
+        ]
+        processor = DiffProcessor(highlight_style="monokai")
+        expected = [processor.process(diff, standalone=False) for diff in diffs]
+
+        # Start from cold process-wide caches so the threads race to fill them
+        lexers._index = None
+        lexers._lexers.clear()
+        highlighters._instances = {}
+
+        threads = 8
+        barrier = threading.Barrier(threads)
+        failures = []
+
+        def worker(offset):
+            barrier.wait()
+            for round_nr in range(20):
+                i = (offset + round_nr) % len(diffs)
+                if processor.process(diffs[i], standalone=False) != expected[i]:
+                    failures.append(i)
+
+        pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+
+        if failures:
+            print(f"✗ {len(failures)} concurrent renders differed from sequential output")
+            return False
+        print("✓ Concurrent rendering is thread-safe")
+        return True
+    except Exception as e:
+        print(f"✗ Thread safety test failed: {e}")
+        return False
+
+def test_moved_blocks():
+    """Test that moved and whitespace-only changes are recognised."""
+    try:
+        from diff2latex import diff_to_latex
+
+        diff = (
+            "--- a/m.py\n+++ b/m.py\n@@ -1,6 +1,6 @@\n"
+            "-def helper(value):\n-    return compute_something(value) * 2\n"
+            " def main():\n-    x = run(1)\n+        x = run(1)\n     y = run(2)\n"
+            "+def helper(value):\n+    return compute_something(value) * 2\n"
+        )
+        latex = diff_to_latex(diff, standalone=False)
+        for color in ("movedfrom", "movedto", "wsonly"):
+            if color not in latex:
+                print(f"✗ No {color} rows in output")
+                return False
+        if "diffchar" in latex or "remred" in latex or "addgreen" in latex:
+            print("✗ Moved or re-indented lines were diffed as changes")
+            return False
+
+        hidden = diff_to_latex(diff, standalone=False, hide_whitespace=True)
+        if "wsonly" in hidden or "movedto" not in hidden:
+            print("✗ Whitespace-only change was not hidden")
+            return False
+        print("✓ Moved block detection works")
+        return True
+    except Exception as e:
+        print(f"✗ Moved block test failed: {e}")
+        return False
+
+def test_repeated_hunks():
+    """Test that a hunk repeated across files is emitted once."""
+    try:
+        from diff2latex import diff_to_latex
+
+        diff = "".join(
+            f"diff --git a/m{i}.py b/m{i}.py\n--- a/m{i}.py\n+++ b/m{i}.py\n@@ -{i + 10},2 +{i + 10},2 @@\n"
+            " # Copyright (c) 2020\n-from old_pkg import thing\n+from new_pkg import thing\n"
+            for i in range(20)
+        )
+        expanded = diff_to_latex(diff, standalone=False, repeated_hunks="expand")
+        reused = diff_to_latex(diff, standalone=False)
+        collapsed = diff_to_latex(diff, standalone=False, repeated_hunks="collapse")
+
+        if "\\linenr{29}" not in expanded or "diff --git" in expanded:
+            print("✗ Line numbers do not follow the hunk headers")
+            return False
+        if reused.count("\\dhdef") != 1 or reused.count("\\dhuse") != 20:
+            print("✗ Repeated hunk was not defined once and reused")
+            return False
+        if "19 more time(s)" not in collapsed.replace("\\ ", " ") or len(collapsed) * 10 > len(expanded):
+            print("✗ Repeated hunks were not collapsed")
+            return False
+        print("✓ Repeated hunks are deduplicated")
+        return True
+    except Exception as e:
+        print(f"✗ Repeated hunks test failed: {e}")
+        return False
+
+def test_diff_indexer():
+    """Test indexing a multi-file diff and rendering a selection of it."""
+    try:
+        from diff2latex.indexer import build_index, load_index, read_selection, select, sidecar_path
+
+        diff = "".join(
+            f"diff --git a/src/f{i}.py b/src/f{i}.py\nindex 1..2 100644\n--- a/src/f{i}.py\n+++ b/src/f{i}.py\n"
+            f"@@ -1,2 +1,2 @@\n-old_{i} = 1\n+new_{i} = 1\n keep\n"
+            f"@@ -20,1 +20,1 @@\n-tail_{i}\n+tail_{i}()\n"
+            for i in range(5)
+        )
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "big.diff")
+            with open(path, "w") as f:
+                f.write(diff)
+
+            index = load_index(path)
+            if [file.path for file in index.files] != [f"src/f{i}.py" for i in range(5)]:
+                print(f"✗ Indexer found the wrong files: {[file.path for file in index.files]}")
+                return False
+            if any(len(file.hunks) != 2 for file in index.files) or not os.path.exists(sidecar_path(path)):
+                print("✗ Indexer did not find every hunk or save the sidecar")
+                return False
+
+            lines = read_selection(path, select(index, ["*/f3.py"], [(2, 2)]))
+            file_lines = diff.splitlines(keepends=True)[33:44]
+            if lines != file_lines[:4] + file_lines[8:]:
+                print(f"✗ Selection decoded the wrong lines: {lines}")
+                return False
+
+            with open(path, "a") as f:
+                f.write("diff --git a/extra b/extra\n--- a/extra\n+++ b/extra\n@@ -1 +1 @@\n-a\n+b\n")
+            if len(load_index(path).files) != 6 or build_index(path).files[-1].path != "extra":
+                print("✗ Stale sidecar was reused after the diff changed")
+                return False
+
+            output_dir = os.path.join(tmpdir, "out")
+            result = subprocess.run(
+                [sys.executable, "-m", "diff2latex", "build", path, output_dir, "--files", "src/f1.py", "--hunks", "1"],
+                capture_output=True, text=True,
+            )
+            with open(os.path.join(output_dir, "diff_output.tex")) as f:
+                latex = f.read()
+            if result.returncode != 0 or "old\\_1" not in latex or "tail" in latex or "old\\_2" in latex:
+                print(f"✗ Filtered build rendered the wrong hunks: {result.stderr}")
+                return False
+        print("✓ Diff indexer selects files and hunks")
+        return True
+    except Exception as e:
+        print(f"✗ Diff indexer test failed: {e}")
+        return False
+
+def test_document_templates():
+    """Test user templates, their validation and streamed output."""
+    try:
+        from io import StringIO
+        from diff2latex import diff_to_latex
+        from diff2latex.document import DocumentTemplate, get_template
+
+        diff = "--- a.py\n+++ a.py\n@@ -1 +1 @@\n-x = 1\n+x = 2\n"
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "mine.tex")
+            with open(path, "w") as f:
+                f.write("% $font costs $$5\nBEGIN\n${content}\nEND\n")
+            latex = diff_to_latex(diff, template=path, font_family="Iosevka")
+            if not latex.startswith("% Iosevka costs $5\nBEGIN\n") or not latex.endswith("\nEND\n"):
+                print(f"✗ User template was not applied: {latex[:60]}")
+                return False
+
+            for bad in ("no rows here", "$content $content", "$content $colour"):
+                try:
+                    DocumentTemplate.parse(bad)
+                    print(f"✗ Invalid template accepted: {bad}")
+                    return False
+                except ValueError:
+                    pass
+
+            streamed = StringIO()
+            get_template().write(streamed, iter(["row 1", "row 2"]), "Fira Code", "10pt")
+            if streamed.getvalue() != get_template().render("row 1\nrow 2", "Fira Code", "10pt"):
+                print("✗ Streamed document differs from the rendered one")
+                return False
+
+            result = subprocess.run(
+                [sys.executable, "-m", "diff2latex", "--template", "missing.tex", "build", "x.diff", tmpdir],
+                capture_output=True, text=True,
+            )
+            if result.returncode == 0 or "--template" not in result.stderr:
+                print("✗ Unknown template was not rejected up front")
+                return False
+        print("✓ Document templates work")
+        return True
+    except Exception as e:
+        print(f"✗ Document template test failed: {e}")
+        return False
+
+def test_context_folding():
+    """Test that long unchanged runs are folded into one row."""
+    try:
+        import re
+        from diff2latex import diff_to_latex
+
+        body = [f" line {i}\n" for i in range(1, 101)]
+        body[49] = "-line 50\n+line fifty\n"
+        diff = "--- a/f.txt\n+++ b/f.txt\n@@ -1,100 +1,100 @@\n" + "".join(body)
+
+        full = diff_to_latex(diff, standalone=False)
+        folded = diff_to_latex(diff, standalone=False, fold_context=2)
+        numbers = re.findall(r"\\linenr\{(\d+)\}", folded)
+        if "unchanged" in full or full.count("\\linenr") != 200:
+            print("✗ Lines were folded without fold_context")
+            return False
+        if folded.count("47\\ unchanged\\ lines") != 1 or folded.count("48\\ unchanged\\ lines") != 1:
+            print("✗ Unchanged runs were not folded")
+            return False
+        if numbers != [n for n in ["48", "49", "50", "51", "52"] for _ in range(2)]:
+            print(f"✗ Folding broke line numbers: {numbers}")
+            return False
+
+        # A reused hunk may start with a fold row, which must begin its table
+        # row: \dhdef goes between rows and \dhuse only expands to the body
+        header = "".join(f" # line {i}\n" for i in range(1, 4))
+        repeated = "".join(
+            f"--- a/m{i}.py\n+++ b/m{i}.py\n@@ -1,4 +1,4 @@\n{header}-# (c) 2020\n+# (c) 2021\n" for i in range(3)
+        )
+        reused = diff_to_latex(repeated, standalone=False, fold_context=0)
+        definition = re.search(r"\\dhdef\{\w+\}\{(.*)", reused)
+        if definition is None or not definition.group(1).startswith("\\multicolumn{4}{l}{") or reused.count("\\dhuse") != 3:
+            print("✗ Folded repeated hunk was not reused with its fold row first")
+            return False
+        template = diff_to_latex(repeated, fold_context=0)
+        if "\\newcommand{\\dhdef}[2]{\\noalign{" not in template or "\\gdef\\dhold" in template:
+            print("✗ Reused hunks cannot start with a fold row")
+            return False
+        print("✓ Context folding works")
+        return True
+    except Exception as e:
+        print(f"✗ Context folding test failed: {e}")
+        return False
+
+def test_multiple_styles():
+    """Test rendering one diff in several styles with a single parse."""
+    try:
+        from diff2latex import diff_to_latex, diff_to_latex_styles
+        from diff2latex.core.utils import CharColorizer
+
+        diff = "--- a/x.py\n+++ b/x.py\n@@ -1,2 +1,2 @@\n def f(x):\n-    return x + 1  # old\n+    return x + 2  # new\n"
+        calls = []
+        original = CharColorizer.get_tokens
+        CharColorizer.get_tokens = lambda self, code: calls.append(code) or original(self, code)
+        try:
+            styled = diff_to_latex_styles(diff, ["default", "monokai", "bw"], standalone=False)
+        finally:
+            CharColorizer.get_tokens = original
+
+        if len(calls) != 3:
+            print(f"✗ Diff was lexed {len(calls)} times instead of once per line")
+            return False
+        for style, latex in styled.items():
+            if latex != diff_to_latex(diff, highlight_style=style, standalone=False):
+                print(f"✗ Restyled output for {style} differs from a fresh render")
+                return False
+        if styled["default"] == styled["monokai"]:
+            print("✗ Styles were not applied")
+            return False
+        print("✓ Multiple styles render from one parse")
+        return True
+    except Exception as e:
+        print(f"✗ Multiple styles test failed: {e}")
+        return False
+
+def test_html_preview():
+    """Test that the HTML preview shows the same rows and colors as LaTeX."""
+    try:
+        import re
+        from diff2latex import diff_to_html, diff_to_latex
+
+        diff = "--- a/x.py\n+++ b/x.py\n@@ -1,2 +1,2 @@\n if a < b:\n-    return 1\n+    return 2\n"
+        latex = diff_to_latex(diff, highlight_style="monokai", standalone=False)
+        html = diff_to_html(diff, highlight_style="monokai")
+
+        latex_colors = re.findall(r"\\(?:code|boxx)\{([0-9a-f]{6})\}", latex)
+        html_colors = re.findall(r'color:#([0-9a-f]{6})', html)
+        if html.count("<tr><td") != 2 or "if a &lt; b:" not in re.sub(r"<[^>]+>", "", html):
+            print("✗ HTML preview rows are wrong")
+            return False
+        if sorted(set(latex_colors)) != sorted(set(html_colors)):
+            print("✗ HTML preview colors differ from LaTeX")
+            return False
+        if ".diffchargreen { background: #b4fab4; }" not in html or 'class="code addgreen"' not in html:
+            print("✗ HTML preview lacks the template background colors")
+            return False
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            diff_path = os.path.join(tmpdir, "x.diff")
+            with open(diff_path, "w") as f:
+                f.write(diff)
+            result = subprocess.run(
+                [sys.executable, "-m", "diff2latex", "--format", "html", "build", diff_path, tmpdir],
+                capture_output=True, text=True,
+            )
+            if result.returncode != 0 or not os.path.exists(os.path.join(tmpdir, "diff_output.html")):
+                print(f"✗ --format html did not write a preview: {result.stderr}")
+                return False
+        print("✓ HTML preview works")
+        return True
+    except Exception as e:
+        print(f"✗ HTML preview test failed: {e}")
+        return False
+
+def test_compile_error_mapping():
+    """Test that TeX errors are traced back to the diff row they came from."""
+    try:
+        from unittest import mock
+        from diff2latex import diff_to_latex
+        from diff2latex.compiler import CompileError, compile_tex, parse_log
+
+        log = "(./temp.tex\n./temp.tex:57: Undefined control sequence.\nl.57 \\foo\n"
+        if parse_log(log, "temp.tex") != ("Undefined control sequence.", 57, "\\foo"):
+            print(f"✗ TeX log parsed wrongly: {parse_log(log, 'temp.tex')}")
+            return False
+
+        diff = (
+            "--- a/x.py\n+++ b/x.py\n@@ -1,2 +1,2 @@\n a = 1\n-b = 2\n+b = 3\n"
+            "@@ -10,1 +10,1 @@\n-c = 4\n+c = 5\n"
+        )
+        source_map = {}
+        latex = diff_to_latex(diff, source_map=source_map)
+        lines = latex.split("\n")
+        rows = {n: lines[n - 1] for n in source_map}
+        last = max(source_map)
+        if not all(r"\\" in row for row in rows.values()) or len(source_map) != 3:
+            print(f"✗ Source map does not point at the table rows: {source_map}")
+            return False
+        source = source_map[last]
+        if (source.path, source.hunk, source.old_line, source.new_line) != ("x.py", 2, 10, 10):
+            print(f"✗ Wrong diff row for the last line: {source}")
+            return False
+
+        error = CompileError("Undefined control sequence.", last, source)
+        if "x.py, hunk 2" not in str(error):
+            print(f"✗ Compile error does not name the diff row: {error}")
+            return False
+
+        with mock.patch("shutil.which", return_value=None):
+            try:
+                compile_tex("missing.tex")
+                print("✗ compile_tex should require lualatex")
+                return False
+            except RuntimeError:
+                pass
+        print("✓ Compile error mapping works")
+        return True
+    except Exception as e:
+        print(f"✗ Compile error mapping test failed: {e}")
+        return False
+
+def test_git_log_range():
+    """Test rendering a commit range from a streamed git log -p."""
+    try:
+        from diff2latex.gitlog import iter_commits, render_log
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            repo = os.path.join(tmpdir, "repo")
+            os.makedirs(repo)
+
+            def git(*args):
+                subprocess.run(
+                    ["git", "-c", "user.name=Test", "-c", "user.email=test@example.com", *args],
+                    cwd=repo, check=True, capture_output=True,
+                )
+
+            git("init", "-q")
+            with open(os.path.join(repo, "a.py"), "w") as f:
+                f.write("x = 1\n")
+            git("add", "a.py")
+            git("commit", "-q", "-m", "Add a")
+            with open(os.path.join(repo, "a.py"), "w") as f:
+                f.write("x = 2\n")
+            git("commit", "-q", "-am", "Change a")
+            git("commit", "-q", "--allow-empty", "-m", "Nothing")
+
+            commits = list(iter_commits("HEAD", repo=repo, reverse=True))
+            if [c.subject for c in commits] != ["Add a", "Change a", "Nothing"] or commits[2].lines:
+                print(f"✗ Commits split wrongly: {[(c.subject, len(c.lines)) for c in commits]}")
+                return False
+
+            settings = {"font_family": "Fira Code", "font_size": "10pt", "highlight_style": None}
+            out = os.path.join(tmpdir, "out")
+            summary = render_log(iter_commits("HEAD", repo=repo, reverse=True), out, settings)
+            outputs = sorted(os.listdir(out))
+            if (summary.rendered, summary.empty) != (2, 1) or len(outputs) != 2 or not outputs[0].startswith("0001-"):
+                print(f"✗ Wrong per-commit outputs: {summary} {outputs}")
+                return False
+            with open(os.path.join(out, outputs[1])) as f:
+                if "\\documentclass" not in f.read():
+                    print("✗ Per-commit output is not a document")
+                    return False
+
+            result = subprocess.run(
+                [sys.executable, "-m", "diff2latex", "log", "-C", repo, "-j", "2", "--combined", "HEAD", out],
+                capture_output=True, text=True,
+            )
+            with open(os.path.join(out, "diff_output.tex")) as f:
+                combined = f.read()
+            if result.returncode != 0 or combined.index("Change\\ a") > combined.index("Add\\ a"):
+                print(f"✗ Combined log document is wrong: {result.stderr}")
+                return False
+
+            # A git failure midway leaves the previous combined document alone
+            def failing():
+                yield from iter_commits("HEAD", repo=repo, reverse=True)
+                raise ValueError("git log failed")
+            try:
+                render_log(failing(), out, settings, combined=True)
+                print("✗ Git failure not reported")
+                return False
+            except ValueError:
+                pass
+            with open(os.path.join(out, "diff_output.tex")) as f:
+                if f.read() != combined or os.path.exists(os.path.join(out, "diff_output.tex.tmp")):
+                    print("✗ Failed combined log left a partial document")
+                    return False
+
+            try:
+                list(iter_commits("no-such-rev", repo=repo))
+                print("✗ Unknown revision not reported")
+                return False
+            except ValueError:
+                pass
+        print("✓ Git log rendering works")
+        return True
+    except Exception as e:
+        print(f"✗ Git log rendering test failed: {e}")
+        return False
+
+def test_unified_layout():
+    """Test the single-column unified layout and its automatic selection."""
+    try:
+        from diff2latex import diff_to_latex, diff_to_html
+
+        diff = (
+            "--- a/x.py\n+++ b/x.py\n@@ -1,4 +1,4 @@\n keep_this = 1\n"
+            "-a = 1\n-b = 2\n+a = 10\n+b = 20\n also_kept = 2\n"
+        )
+        rows = diff_to_latex(diff, layout="unified", standalone=False).split("\n")
+        if not all(row.count(" & ") == 2 for row in rows) or len(rows) != 6:
+            print(f"✗ Unified rows do not have three columns: {rows}")
+            return False
+        if sum("keep\\_this" in row for row in rows) != 1:
+            print("✗ Unchanged line typeset more than once")
+            return False
+        colors = [row.split("}")[0] for row in rows[1:5]]
+        if colors != ["\\cellcolor{remred"] * 2 + ["\\cellcolor{addgreen"] * 2:
+            print(f"✗ Removed lines are not shown before added ones: {colors}")
+            return False
+        if "\\linenr{1} & \\linenr{1}" not in rows[0] or "\\linenr{ } & \\cellcolor{addgreen}\\linenr{3}" not in rows[4]:
+            print(f"✗ Unified line numbers are wrong: {rows}")
+            return False
+
+        document = diff_to_latex(diff, layout="unified")
+        if "{r r Y}" not in document or "{r Y r Y}" in document:
+            print("✗ Unified document has the wrong table columns")
+            return False
+
+        added = "--- /dev/null\n+++ b/new.py\n@@ -0,0 +1,2 @@\n+x = 1\n+y = 2\n"
+        if "{r r Y}" not in diff_to_latex(added, layout="auto") or "{r Y r Y}" not in diff_to_latex(diff, layout="auto"):
+            print("✗ Automatic layout picked the wrong table")
+            return False
+        html = diff_to_html(added, layout="auto")
+        if "<th>Code</th>" not in html or html.count('<td class="nr') != 4:
+            print("✗ Unified HTML preview is wrong")
+            return False
+
+        repeated = diff + diff.replace("x.py", "y.py")
+        reused = diff_to_latex(repeated, layout="unified", standalone=False)
+        if reused.count("\\dhuse") != 2 or "\\linenr{ } & \\cellcolor{addgreen}\\linenr{\\the\\numexpr#2+1" not in reused:
+            print("✗ Repeated hunks are not reused in the unified layout")
+            return False
+        print("✓ Unified layout works")
+        return True
+    except Exception as e:
+        print(f"✗ Unified layout test failed: {e}")
+        return False
+
+def test_compressed_input():
+    """Test compressed and stdin diff input and output to stdout."""
+    try:
+        import bz2
+        import gzip
+        import lzma
+        from diff2latex import Diff2Latex, CharColorizer
+        from diff2latex.streams import open_diff
+
+        diff = "--- a/x.py\n+++ b/x.py\n@@ -1,2 +1,2 @@\n a = 1\n-b = 2\n+b = 3\n"
+        with tempfile.TemporaryDirectory() as tmpdir:
+            plain = os.path.join(tmpdir, "x.diff")
+            with open(plain, "w") as f:
+                f.write(diff)
+            for ext, compress in (("gz", gzip.compress), ("xz", lzma.compress), ("bz2", bz2.compress)):
+                # Named .bin so the codec has to be found from the magic bytes
+                path = os.path.join(tmpdir, f"x-{ext}.bin")
+                with open(path, "wb") as f:
+                    f.write(compress(diff.encode()))
+                with open_diff(path) as f:
+                    if f.read() != diff:
+                        print(f"✗ {ext} input decoded wrongly")
+                        return False
+
+            expected = subprocess.run(
+                [sys.executable, "-m", "diff2latex", "build", plain, tmpdir], capture_output=True, text=True
+            )
+            with open(os.path.join(tmpdir, "diff_output.tex")) as f:
+                expected_tex = f.read()
+            result = subprocess.run(
+                [sys.executable, "-m", "diff2latex", "build", "-", "-"],
+                input=gzip.compress(diff.encode()), capture_output=True,
+            )
+            if expected.returncode != 0 or result.returncode != 0 or result.stdout.decode() != expected_tex:
+                print(f"✗ Piped gzip input did not give the same document: {result.stderr.decode()}")
+                return False
+
+            # Streamed input is built without the move pre-pass unless asked for
+            moved = "--- a/x.py\n+++ b/x.py\n@@ -1,3 +1,3 @@\n-total_count = compute(1)\n a\n+total_count = compute(1)\n"
+            for args, marked in ((["build", "-", "-"], False), (["--moves", "build", "-", "-"], True)):
+                result = subprocess.run(
+                    [sys.executable, "-m", "diff2latex", *args],
+                    input=gzip.compress(moved.encode()), capture_output=True,
+                )
+                if result.returncode != 0 or ("\\cellcolor{movedto}" in result.stdout.decode()) != marked:
+                    print(f"✗ Moves {'not ' if marked else ''}marked on piped input with {args}")
+                    return False
+
+        # Without move detection the parser consumes the lines in one pass
+        differ = Diff2Latex(colorizer=CharColorizer(style_name=None), detect_moves=False)
+        differ.parse(line for line in diff.splitlines(keepends=True))
+        if "{diffchargreen}{3}" not in differ.to_latex():
+            print("✗ Streamed lines were not parsed")
+            return False
+        print("✓ Compressed and stdin input works")
+        return True
+    except Exception as e:
+        print(f"✗ Compressed input test failed: {e}")
+        return False
+
+def test_render_sidecar():
+    """Test the sidecar of hunk statistics and byte offsets."""
+    try:
+        import json
+        from diff2latex import diff_to_latex
+        from diff2latex.core.utils import RenderBudget
+
+        diff = (
+            "--- a/x.py\n+++ b/x.py\n@@ -1,2 +1,2 @@\n a = 1\n-b = 2\n+b = 3\n"
+            "@@ -10,2 +10,3 @@\n c = 4\n+d = 5\n e = 6\n"
+            "--- a/y.py\n+++ b/y.py\n@@ -1 +1 @@\n-" + "x" * 80 + "\n+" + "y" * 80 + "\n"
+        )
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tex_path = os.path.join(tmpdir, "out.tex")
+            json_path = tex_path + ".d2l.json"
+            diff_to_latex(
+                diff, tex_path, budget=RenderBudget(max_line_chars=40), sidecar_path=json_path,
+            )
+            with open(json_path) as f:
+                sidecar = json.load(f)
+            with open(tex_path, "rb") as f:
+                tex = f.read()
+
+            x, y = sidecar["files"]
+            if (x["path"], x["changed"], x["added"], y["changed"]) != ("x.py", 1, 1, 1):
+                print(f"✗ Wrong file statistics: {x} {y}")
+                return False
+            first, second = x["hunks"]
+            if (second["new_start"], second["new_lines"], second["old_lines"]) != (10, 3, 2):
+                print(f"✗ Wrong hunk ranges: {second}")
+                return False
+            if b"e\\ =\\ 6" in tex[first["offset"]:first["offset"] + first["length"]]:
+                print("✗ Hunk offset points at the wrong rows")
+                return False
+            if b"{diffchargreen}{3}" not in tex[first["offset"]:first["offset"] + first["length"]]:
+                print("✗ Hunk byte range does not hold its rows")
+                return False
+            if b"e\\ =\\ 6" not in tex[second["offset"]:second["offset"] + second["length"]]:
+                print("✗ Second hunk byte range does not hold its rows")
+                return False
+            if x["degraded"] or not y["degraded"] or not y["hunks"][0]["degraded"]:
+                print(f"✗ Degradations not mapped to their hunk: {x['degraded']} {y['degraded']}")
+                return False
+
+            result = subprocess.run(
+                [sys.executable, "-m", "diff2latex", "build", "--sidecar", "-", tmpdir],
+                input=diff, capture_output=True, text=True,
+            )
+            with open(os.path.join(tmpdir, "diff_output.tex.d2l.json")) as f:
+                if result.returncode != 0 or len(json.load(f)["files"]) != 2:
+                    print(f"✗ CLI sidecar not written: {result.stderr}")
+                    return False
+
+            # Offsets are UTF-8 byte offsets whatever the locale's encoding
+            accented = '--- a/x.py\n+++ b/x.py\n@@ -1,2 +1,2 @@\n a = "é"\n-b = "ü"\n+b = "ö"\n'
+            env = {**os.environ, "LC_ALL": "C", "PYTHONUTF8": "0", "PYTHONCOERCECLOCALE": "0"}
+            result = subprocess.run(
+                [sys.executable, "-m", "diff2latex", "build", "--sidecar", "-", tmpdir],
+                input=accented.encode(), capture_output=True, env=env,
+            )
+            if result.returncode != 0:
+                print(f"✗ CLI build failed outside a UTF-8 locale: {result.stderr.decode(errors='replace')}")
+                return False
+            with open(os.path.join(tmpdir, "diff_output.tex.d2l.json")) as f:
+                record = json.load(f)["files"][0]["hunks"][0]
+            with open(os.path.join(tmpdir, "diff_output.tex"), "rb") as f:
+                rows = f.read()[record["offset"]:record["offset"] + record["length"]]
+            if not rows.startswith(b"\\linenr{1}") or "ö".encode() not in rows:
+                print("✗ Hunk byte range is off for non-ASCII rows")
+                return False
+
+            # A repeated hunk is typeset from a macro defined before its first use
+            hunk = "@@ -1,2 +1,2 @@\n a = 1\n-b = 2\n+b = 3\n"
+            repeated = f"--- a/x.py\n+++ b/x.py\n{hunk}--- a/y.py\n+++ b/y.py\n{hunk}"
+            diff_to_latex(repeated, tex_path, sidecar_path=json_path)
+            with open(json_path) as f:
+                hunks = [file["hunks"][0] for file in json.load(f)["files"]]
+            with open(tex_path, "rb") as f:
+                tex = f.read()
+            for record in hunks:
+                use = tex[record["offset"]:record["offset"] + record["length"]]
+                start = record["definition_offset"] or 0
+                definition = tex[start:start + (record["definition_length"] or 0)]
+                key = (record["macro"] or "").encode()
+                if not key or use != b"\\dhuse{%s}{1}{1}" % key or not definition.startswith(b"\\dhdef{%s}" % key):
+                    print(f"✗ Reused hunk has no macro definition in the sidecar: {record}")
+                    return False
+                if b"{diffchargreen}{3}" not in definition:
+                    print("✗ Macro definition range does not hold the hunk's rows")
+                    return False
+        print("✓ Render sidecar works")
+        return True
+    except Exception as e:
+        print(f"✗ Render sidecar test failed: {e}")
+        return False
+
+def test_compile_scheduler():
+    """Test that compilations are scheduled longest first and timed."""
+    try:
+        from diff2latex import create_diff_pdfs
+        from diff2latex.scheduler import CompileCost, CompileResult, CostModel
+
+        small = "--- a/x.py\n+++ b/x.py\n@@ -1 +1 @@\n-a = 1\n+a = 2\n"
+        large = "--- a/y.py\n+++ b/y.py\n@@ -0,0 +1,400 @@\n" + "".join(f"+v{i} = {i}\n" for i in range(400))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            # A stand-in lualatex that logs which job starts when
+            fake = os.path.join(tmpdir, "lualatex")
+            with open(fake, "w") as f:
+                f.write('#!/bin/sh\nbasename "$PWD" >> "$D2L_STARTS"\ntouch temp.pdf\n')
+            os.chmod(fake, 0o755)
+            starts = os.path.join(tmpdir, "starts")
+            old_path = os.environ["PATH"]
+            os.environ["PATH"] = tmpdir + os.pathsep + old_path
+            os.environ["D2L_STARTS"] = starts
+            try:
+                outputs = [os.path.join(tmpdir, f"{name}.pdf") for name in ("a", "b", "c")]
+                report = create_diff_pdfs(zip([small, small, large], outputs), workers=1)
+            finally:
+                os.environ["PATH"] = old_path
+                del os.environ["D2L_STARTS"]
+            with open(starts) as f:
+                order = list(dict.fromkeys(f.read().split()))
+
+            if order[0] != "00002" or [r.output for r in report.results] != outputs:
+                print(f"✗ Largest document not compiled first: {order}")
+                return False
+            if not all(r.status == "ok" and os.path.exists(r.output) for r in report.results):
+                print(f"✗ Scheduled compilations failed: {report.results}")
+                return False
+            if report.results[2].cost.rows < 400 or report.results[2].predicted <= report.results[0].predicted:
+                print(f"✗ Cost model does not rank the documents: {report.results[2]}")
+                return False
+            # Times that follow a known model, with no cost per run: the fit
+            # must find each coefficient on its own and keep them non-negative
+            truth = CostModel(base_seconds=1.5, row_seconds=0.01, run_seconds=0.0, char_seconds=0.004)
+            costs = [CompileCost(rows=rows, runs=runs, longest_line=chars) for rows, runs, chars in
+                     [(10, 300, 40), (800, 20, 120), (2500, 9000, 80), (40, 15000, 300), (1200, 700, 200)]]
+            timed = [CompileResult(output=f"{n}.pdf", cost=cost, seconds=truth.predict(cost), status="ok")
+                     for n, cost in enumerate(costs)]
+            model = CostModel().calibrated(timed)
+            pairs = zip(model.model_dump().values(), truth.model_dump().values())
+            if any(abs(got - want) > 1e-9 for got, want in pairs):
+                print(f"✗ Calibrated model does not recover the coefficients: {model}")
+                return False
+            if CostModel().calibrated(timed[:3]) != CostModel():
+                print("✗ Too few results changed the model")
+                return False
+        print("✓ Compile scheduler works")
+        return True
+    except Exception as e:
+        print(f"✗ Compile scheduler test failed: {e}")
+        return False
+
+def test_inline_granularity():
+    """Test the adaptive inline diff granularity."""
+    try:
+        from diff2latex import Diff2Latex, CharColorizer
+        from diff2latex.core.utils.granularity import (
+            REFINE_MAX_REGIONS, adaptive_segments, pick_granularity
+        )
+
+        def render(old: str, new: str, granularity: str) -> str:
+            differ = Diff2Latex(colorizer=CharColorizer(style_name=None), inline_granularity=granularity)
+            differ.parse(f"--- a/x.py\n+++ b/x.py\n@@ -1 +1 @@\n-{old}\n+{new}\n".splitlines(keepends=True))
+            return differ.to_latex()
+
+        # Short lines are compared by character, so only the digit is marked
+        short = render("total = value_3 + 1", "total = value_4 + 1", "auto")
+        if "{diffchargreen}{4}" not in short or "{diffchargreen}{value\\_4}" not in render(
+            "total = value_3 + 1", "total = value_4 + 1", "token"
+        ):
+            print(f"✗ Short line not diffed by character: {short}")
+            return False
+
+        # Long lines are matched by chunk, then refined down to the changed digit
+        old = "call(" + ", ".join(f"arg{i}" for i in range(80)) + ")"
+        new = old.replace("arg41,", "arg42,")
+        segments = adaptive_segments(old, new)
+        changed = [(o, n) for equal, o, n in segments if not equal]
+        if pick_granularity(old, new) != "chunk" or changed != [("1", "2")]:
+            print(f"✗ Long line not refined to the changed word: {changed}")
+            return False
+        if "".join(o for _, o, _ in segments) != old or "".join(n for _, _, n in segments) != new:
+            print("✗ Segments do not add up to the lines")
+            return False
+
+        # Changed all over, the chunks are not refined one matcher run each
+        names = "call(" + ", ".join(f"argument_value_{i}" for i in range(40)) + ")"
+        once = names.replace("value_7,", "valve_7,")
+        dense = once
+        for i in range(0, 40, 4):
+            dense = dense.replace(f"value_{i},", f"valve_{i},")
+        if [(o, n) for equal, o, n in adaptive_segments(names, once) if not equal] != [("u", "v")]:
+            print("✗ Single change in a long line was not refined")
+            return False
+        changed = [(o, n) for equal, o, n in adaptive_segments(names, dense) if not equal]
+        if len(changed) <= REFINE_MAX_REGIONS or not all("argument_" in o for o, _ in changed):
+            print(f"✗ Line changed all over was refined: {changed}")
+            return False
+
+        # Unrelated lines are marked as a whole, without matching stray letters
+        if adaptive_segments("return result", "yield 42;") != [(False, "return result", "yield 42;")]:
+            print("✗ Unrelated lines were matched up")
+            return False
+
+        # compare diffs files in-process at the same granularity
+        with tempfile.TemporaryDirectory() as tmpdir:
+            old_file, new_file = os.path.join(tmpdir, "old.py"), os.path.join(tmpdir, "new.py")
+            with open(old_file, "w") as f:
+                f.write("total = value_3 + 1\n")
+            with open(new_file, "w") as f:
+                f.write("total = value_4 + 1\n")
+            result = subprocess.run(
+                [sys.executable, "-m", "diff2latex", "--inline-diff", "char", "compare", old_file, new_file, "-"],
+                capture_output=True, text=True,
+            )
+            if result.returncode != 0 or "{diffchargreen}{4}" not in result.stdout:
+                print(f"✗ compare ignores --inline-diff: {result.stderr}")
+                return False
+        print("✓ Adaptive inline diff granularity works")
+        return True
+    except Exception as e:
+        print(f"✗ Inline granularity test failed: {e}")
+        return False
+
 def main():
     """Run all tests."""
     print("🧪 Running diff2latex smoke tests...\n")
@@ -165,6 +1267,27 @@ def main():
         test_class_based_processor,
         test_cli_help,
         test_basic_functionality,
+        test_batch_command,
+        test_sharded_batch_merge,
+        test_compare_trees,
+        test_render_budget,
+        test_regex_highlighter,
+        test_lexer_index,
+        test_thread_safety,
+        test_moved_blocks,
+        test_repeated_hunks,
+        test_diff_indexer,
+        test_document_templates,
+        test_context_folding,
+        test_multiple_styles,
+        test_html_preview,
+        test_compile_error_mapping,
+        test_git_log_range,
+        test_unified_layout,
+        test_compressed_input,
+        test_render_sidecar,
+        test_compile_scheduler,
+        test_inline_granularity,
     ]
     
     passed = 0